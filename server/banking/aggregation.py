@@ -0,0 +1,95 @@
+import asyncio
+import os
+from typing import Dict, List
+from banking.transactions import TransactionSync
+from tracing import span
+
+# Per-item limit on each Plaid round trip; a slow bank is reported, not waited on
+ITEM_TIMEOUT = float(os.getenv("BANKING_ITEM_TIMEOUT", "10"))
+REALTIME_BALANCES = os.getenv("BANKING_REALTIME_BALANCES", "false").lower() in ("1", "true", "yes")
+
+# Plaid account types whose balances are owed rather than held
+LIABILITY_TYPES = ("credit", "loan")
+
+
+def _balance(account: Dict) -> float:
+    balances = account.get("balances") or {}
+    value = balances.get("current")
+    if value is None:
+        value = balances.get("available")
+    return float(value or 0.0)
+
+
+def _account_type(account: Dict) -> str:
+    # SDK enums serialise as their value in to_dict(), local stand-ins use plain strings
+    return str(account.get("type") or "other")
+
+
+class BankingAggregator:
+    """Net worth and recent transactions across all of a user's linked items.
+
+    Every item's balance fetch and transaction sync runs concurrently on worker
+    threads, each bounded by ``timeout``; items that fail or time out are listed
+    under ``items`` with their error and the rest of the summary is still returned.
+    A timed-out call is abandoned, not interrupted, so its thread finishes in the
+    background.
+    """
+
+    def __init__(self, api, sync: TransactionSync, timeout: float = ITEM_TIMEOUT,
+                 realtime: bool = REALTIME_BALANCES):
+        self.api = api
+        self.sync = sync
+        self.timeout = timeout
+        self.realtime = realtime
+
+    async def _call(self, fn, *args):
+        return await asyncio.wait_for(asyncio.to_thread(fn, *args), self.timeout)
+
+    async def _fetch_item(self, item: Dict) -> Dict:
+        result = {"item_id": item["item_id"], "institution_id": item["institution_id"], "accounts": [], "error": None}
+        balances, synced = await asyncio.gather(
+            self._call(self.api.accounts_get, item["access_token"], self.realtime),
+            self._call(self.sync.ensure_fresh, [item["item_id"]]),
+            return_exceptions=True
+        )
+        errors = []
+        for name, outcome in (("balances", balances), ("transactions", synced)):
+            if isinstance(outcome, asyncio.TimeoutError):
+                errors.append(f"{name}: timed out after {self.timeout}s")
+            elif isinstance(outcome, Exception):
+                errors.append(f"{name}: {outcome}")
+        if errors:
+            result["error"] = "; ".join(errors)
+            print(f"Banking fetch for item {item['item_id']} incomplete: {result['error']}")
+        if not isinstance(balances, BaseException):
+            result["accounts"] = [
+                {**account, "item_id": item["item_id"], "institution_id": item["institution_id"]}
+                for account in balances.get("accounts", [])
+            ]
+        return result
+
+    async def summary(self, user_id: str, recent: int = 10, start_date=None, end_date=None) -> Dict:
+        items = await asyncio.to_thread(self.sync.store.items_for_user, user_id)
+        with span("banking_fetch"):
+            fetched: List[Dict] = await asyncio.gather(*(self._fetch_item(item) for item in items))
+
+        accounts = [account for entry in fetched for account in entry["accounts"]]
+        assets = sum(_balance(a) for a in accounts if _account_type(a) not in LIABILITY_TYPES)
+        liabilities = sum(_balance(a) for a in accounts if _account_type(a) in LIABILITY_TYPES)
+        page = await asyncio.to_thread(
+            self.sync.store.query, [item["item_id"] for item in items], start_date, end_date, recent, 0
+        )
+        return {
+            "user_id": user_id,
+            "net_worth": round(assets - liabilities, 2),
+            "assets": round(assets, 2),
+            "liabilities": round(liabilities, 2),
+            "accounts": accounts,
+            "recent_transactions": page["transactions"],
+            "transaction_count": page["total"],
+            "items": [
+                {"item_id": entry["item_id"], "institution_id": entry["institution_id"],
+                 "status": "error" if entry["error"] else "ok", "error": entry["error"]}
+                for entry in fetched
+            ],
+        }
@@ -0,0 +1,238 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+import numpy as np
+import pandas as pd
+from banking.transactions import TransactionStore
+from tracing import span
+
+ANALYTICS_CACHE_USERS = int(os.getenv("ANALYTICS_CACHE_USERS", "256"))
+TOP_N = 20
+DAILY_DAYS = 90
+# Median gap (days) of each recurring period and the relative slack allowed around it
+PERIODS = {"weekly": 7, "biweekly": 14, "monthly": 30.4, "quarterly": 91, "yearly": 365}
+PERIOD_TOLERANCE = 0.2
+RECURRING_MIN_COUNT = 3
+RECURRING_MAX_AMOUNT_CV = 0.25
+# Robust z-score above which a charge is flagged, against its category's median and MAD
+ANOMALY_Z = 3.5
+ANOMALY_MIN_AMOUNT = float(os.getenv("ANALYTICS_ANOMALY_MIN_AMOUNT", "50"))
+ANOMALY_MIN_HISTORY = 5
+
+
+def merchant_keys(frame: pd.DataFrame) -> pd.Series:
+    """Normalised merchant per row: merchant name, else the description, lowercased without digits/punctuation"""
+    names = frame["merchant_name"].where(frame["merchant_name"].notna() & (frame["merchant_name"] != ""),
+                                         frame["name"]).fillna("unknown")
+    keys = names.str.lower().str.replace(r"[^a-z&' ]+", " ", regex=True).str.replace(r"\s+", " ", regex=True)
+    keys = keys.str.strip()
+    return keys.where(keys != "", "unknown")
+
+
+def prepare(frame: pd.DataFrame) -> pd.DataFrame:
+    """Analytics columns: Plaid amounts are positive for money out, negative for money in"""
+    frame = frame.copy()
+    frame["category"] = frame["category"].fillna("UNCATEGORIZED")
+    frame["merchant"] = merchant_keys(frame)
+    frame["spend"] = frame["amount"].clip(lower=0)
+    frame["income"] = (-frame["amount"]).clip(lower=0)
+    return frame[["transaction_id", "date", "amount", "spend", "income", "category", "merchant", "name"]]
+
+
+def daily_partials(frame: pd.DataFrame) -> pd.DataFrame:
+    """Per (date, category, merchant) spend, income and count; the unit incremental updates replace"""
+    if frame.empty:
+        return pd.DataFrame(columns=["date", "category", "merchant", "spend", "income", "count"])
+    return (frame.groupby(["date", "category", "merchant"], sort=False, observed=True)
+            .agg(spend=("spend", "sum"), income=("income", "sum"), count=("amount", "size"))
+            .reset_index())
+
+
+def rollup(partials: pd.DataFrame, by: str, top: int = TOP_N) -> List[Dict]:
+    grouped = partials.groupby(by, sort=False).agg(spend=("spend", "sum"), count=("count", "sum"))
+    grouped = grouped[grouped["spend"] > 0].sort_values("spend", ascending=False)
+    total = grouped["spend"].sum()
+    grouped["share"] = grouped["spend"] / total if total else 0.0
+    grouped = grouped.head(top).round({"spend": 2, "share": 4})
+    return [{by: key, "spend": float(row["spend"]), "count": int(row["count"]), "share": float(row["share"])}
+            for key, row in grouped.iterrows()]
+
+
+def spend_series(partials: pd.DataFrame, days: int = DAILY_DAYS) -> Dict:
+    """Dense daily spend with 7/30-day rolling sums, and monthly spend/income/net"""
+    if partials.empty:
+        return {"daily": [], "monthly": []}
+    daily = partials.groupby("date").agg(spend=("spend", "sum"), income=("income", "sum")).sort_index()
+    daily = daily.reindex(pd.date_range(daily.index.min(), daily.index.max(), freq="D"), fill_value=0.0)
+    daily["rolling_7d"] = daily["spend"].rolling(7, min_periods=1).sum()
+    daily["rolling_30d"] = daily["spend"].rolling(30, min_periods=1).sum()
+    monthly = daily[["spend", "income"]].resample("MS").sum()
+    monthly["net"] = monthly["income"] - monthly["spend"]
+    recent = daily.tail(days).round(2)
+    monthly = monthly.round(2)
+    return {
+        "daily": [{"date": d.strftime('%Y-%m-%d'), "spend": float(r.spend), "rolling_7d": float(r.rolling_7d),
+                   "rolling_30d": float(r.rolling_30d)} for d, r in recent.iterrows()],
+        "monthly": [{"month": d.strftime('%Y-%m'), "spend": float(r.spend), "income": float(r.income),
+                     "net": float(r.net)} for d, r in monthly.iterrows()],
+    }
+
+
+def detect_recurring(frame: pd.DataFrame) -> pd.DataFrame:
+    """Merchants charged at a steady interval for a steady amount, one row per merchant"""
+    columns = ["period", "interval_days", "amount", "count", "last_date", "next_date"]
+    charges = frame.loc[frame["spend"] > 0, ["merchant", "date", "spend"]].sort_values(["merchant", "date"])
+    if charges.empty:
+        return pd.DataFrame(columns=columns)
+    charges["gap"] = charges.groupby("merchant")["date"].diff().dt.days
+    stats = charges.groupby("merchant").agg(
+        count=("spend", "size"), amount=("spend", "mean"), amount_std=("spend", "std"),
+        interval_days=("gap", "median"), gap_std=("gap", "std"), last_date=("date", "max")
+    )
+    stats = stats[(stats["count"] >= RECURRING_MIN_COUNT) & (stats["interval_days"] > 0)]
+    steady = ((stats["amount_std"].fillna(0) / stats["amount"]) <= RECURRING_MAX_AMOUNT_CV) & \
+             ((stats["gap_std"].fillna(0) / stats["interval_days"]) <= PERIOD_TOLERANCE)
+    stats = stats[steady].copy()
+    if stats.empty:
+        return pd.DataFrame(columns=columns)
+    # Nearest named period for every merchant at once, kept only if within tolerance
+    targets = np.array(list(PERIODS.values()))
+    error = np.abs(stats["interval_days"].to_numpy()[:, None] / targets[None, :] - 1)
+    nearest = error.argmin(axis=1)
+    stats["period"] = np.array(list(PERIODS))[nearest]
+    stats = stats[error[np.arange(len(stats)), nearest] <= PERIOD_TOLERANCE]
+    stats["next_date"] = stats["last_date"] + pd.to_timedelta(stats["interval_days"], unit="D")
+    return stats[columns]
+
+
+def detect_anomalies(frame: pd.DataFrame) -> pd.DataFrame:
+    """Charges far above their category's typical amount by robust (median/MAD) z-score"""
+    charges = frame[frame["spend"] > 0]
+    if charges.empty:
+        return charges.assign(z_score=pd.Series(dtype=float), typical=pd.Series(dtype=float))
+    grouped = charges.groupby("category")["spend"]
+    median = grouped.transform("median")
+    deviation = (charges["spend"] - median).abs()
+    mad = deviation.groupby(charges["category"]).transform("median")
+    # A category of identical amounts has MAD 0; fall back to the mean absolute deviation
+    mad = mad.where(mad > 0, deviation.groupby(charges["category"]).transform("mean"))
+    z = 0.6745 * (charges["spend"] - median) / mad.replace(0, np.nan)
+    flagged = (z > ANOMALY_Z) & (charges["spend"] >= ANOMALY_MIN_AMOUNT) & \
+              (grouped.transform("size") >= ANOMALY_MIN_HISTORY)
+    return charges[flagged].assign(z_score=z[flagged].round(2), typical=median[flagged].round(2))
+
+
+def _concat(frames: List[pd.DataFrame], **kwargs) -> pd.DataFrame:
+    """``pd.concat`` that skips empty pieces, so an empty side never changes column dtypes"""
+    parts = [frame for frame in frames if not frame.empty]
+    return pd.concat(parts, **kwargs) if parts else frames[0]
+
+
+class _UserState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.item_ids: Optional[tuple] = None
+        self.seq = 0
+        self.frame: Optional[pd.DataFrame] = None
+        self.partials: Optional[pd.DataFrame] = None
+        self.recurring: Optional[pd.DataFrame] = None
+        self.anomalies: Optional[pd.DataFrame] = None
+        self.result: Optional[Dict] = None
+
+
+class SpendingAnalytics:
+    """Per-user spending analytics over the local transaction store.
+
+    Each user's prepared transactions and per-day partial sums are cached. On the
+    next call only days the store's change log marks as touched since then are
+    reloaded; rollups and the spend series are rebuilt from the partials, and
+    recurring charges and anomalies are recomputed just for the merchants and
+    categories seen on those days.
+    """
+
+    def __init__(self, store: TransactionStore, max_users: int = ANALYTICS_CACHE_USERS):
+        self.store = store
+        self.max_users = max_users
+        self._users: "OrderedDict[str, _UserState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _state(self, user_id: str) -> _UserState:
+        with self._lock:
+            state = self._users.pop(user_id, None) or _UserState()
+            self._users[user_id] = state
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+            return state
+
+    def summary(self, user_id: str) -> Dict:
+        state = self._state(user_id)
+        with state.lock:
+            item_ids = tuple(sorted(item["item_id"] for item in self.store.items_for_user(user_id)))
+            seq = self.store.change_seq()
+            if state.result is not None and state.item_ids == item_ids and state.seq == seq:
+                return state.result
+            with span("spending_analytics"):
+                if state.frame is None or state.item_ids != item_ids:
+                    self._rebuild(state, list(item_ids))
+                else:
+                    dirty = self.store.changed_dates(list(item_ids), state.seq)
+                    if dirty:
+                        self._update(state, list(item_ids), dirty)
+                state.item_ids = item_ids
+                state.seq = seq
+                state.result = self._render(user_id, state, seq)
+            return state.result
+
+    def _rebuild(self, state: _UserState, item_ids: List[str]):
+        state.frame = prepare(self.store.frame(item_ids))
+        state.partials = daily_partials(state.frame)
+        state.recurring = detect_recurring(state.frame)
+        state.anomalies = detect_anomalies(state.frame)
+
+    def _update(self, state: _UserState, item_ids: List[str], dirty: Set[str]):
+        days = pd.to_datetime(sorted(dirty))
+        fresh = prepare(self.store.frame(item_ids, dirty))
+        stale = state.frame["date"].isin(days)
+        merchants = set(state.frame.loc[stale, "merchant"]) | set(fresh["merchant"])
+        categories = set(state.frame.loc[stale, "category"]) | set(fresh["category"])
+
+        state.frame = _concat([state.frame[~stale], fresh], ignore_index=True)
+        state.partials = _concat(
+            [state.partials[~state.partials["date"].isin(days)], daily_partials(fresh)], ignore_index=True
+        )
+        affected = state.frame["merchant"].isin(merchants)
+        state.recurring = _concat([
+            state.recurring[~state.recurring.index.isin(merchants)], detect_recurring(state.frame[affected])
+        ])
+        affected = state.frame["category"].isin(categories)
+        state.anomalies = _concat([
+            state.anomalies[~state.anomalies["category"].isin(categories)], detect_anomalies(state.frame[affected])
+        ], ignore_index=True)
+
+    def _render(self, user_id: str, state: _UserState, seq: int) -> Dict:
+        partials = state.partials
+        recurring = state.recurring.sort_values("amount", ascending=False)
+        anomalies = state.anomalies.sort_values("z_score", ascending=False).head(TOP_N * 2)
+        return {
+            "user_id": user_id,
+            "as_of_change": seq,
+            "transactions": int(len(state.frame)),
+            "total_spend": round(float(partials["spend"].sum()), 2) if len(partials) else 0.0,
+            "total_income": round(float(partials["income"].sum()), 2) if len(partials) else 0.0,
+            "categories": rollup(partials, "category") if len(partials) else [],
+            "merchants": rollup(partials, "merchant") if len(partials) else [],
+            **spend_series(partials),
+            "recurring": [
+                {"merchant": merchant, "period": row.period, "interval_days": round(float(row.interval_days), 1),
+                 "amount": round(float(row.amount), 2), "count": int(row["count"]),
+                 "last_date": row.last_date.strftime('%Y-%m-%d'), "next_date": row.next_date.strftime('%Y-%m-%d')}
+                for merchant, row in recurring.iterrows()
+            ],
+            "anomalies": [
+                {"transaction_id": row.transaction_id, "date": row.date.strftime('%Y-%m-%d'), "name": row["name"],
+                 "category": row.category, "amount": round(float(row.spend), 2), "typical": float(row.typical),
+                 "z_score": float(row.z_score)}
+                for _, row in anomalies.iterrows()
+            ],
+        }
@@ -1,14 +1,22 @@
 import os
+import threading
 from dotenv import load_dotenv
-from plaid.api_client import ApiClient
-from plaid.configuration import Configuration
-from plaid.api import plaid_api
-from plaid.model import *
 
 load_dotenv()
 
+# Concurrent HTTPS connections kept open to Plaid, shared by every request in the process
+PLAID_POOL_SIZE = int(os.getenv("PLAID_POOL_SIZE", "20"))
+
+_client = None
+_client_lock = threading.Lock()
+
+
 class PlaidClient:
-    def __init__(self):
+    def __init__(self, pool_size: int = PLAID_POOL_SIZE):
+        from plaid.api_client import ApiClient
+        from plaid.configuration import Configuration
+        from plaid.api import plaid_api
+
         PLAID_CLIENT_ID = os.getenv("PLAID_CLIENT_ID")
         PLAID_SECRET = os.getenv("PLAID_SECRET")
         PLAID_ENV = os.getenv("PLAID_ENV", "sandbox").lower()
@@ -27,8 +35,17 @@ class PlaidClient:
                 'secret': PLAID_SECRET
             }
         )
+        # urllib3 pool size; calls made from worker threads reuse these connections
+        configuration.connection_pool_maxsize = pool_size
 
         api_client = ApiClient(configuration)
         self.client = plaid_api.PlaidApi(api_client)
 
-plaid_client = PlaidClient().client
\ No newline at end of file
+
+def get_plaid_client():
+    """The process-wide pooled Plaid client, created on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = PlaidClient().client
+        return _client
@@ -0,0 +1,484 @@
+import hashlib
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+import pandas as pd
+from tracing import span
+
+TRANSACTIONS_DB_PATH = os.getenv("BANKING_DB_PATH", os.path.join("cache", "banking.sqlite"))
+# Reads serve the local store; an item older than this is re-synced in the background
+SYNC_INTERVAL = float(os.getenv("BANKING_SYNC_INTERVAL", "300"))
+SYNC_PAGE_SIZE = int(os.getenv("BANKING_SYNC_PAGE_SIZE", "500"))
+SYNC_RESTARTS = 3
+MAX_PAGE_LIMIT = 500
+SESSION_TTL = int(os.getenv("BANKING_SESSION_TTL", "3600"))
+
+
+class SyncRestart(Exception):
+    """The item's transactions changed mid-pagination; sync must restart from the saved cursor"""
+
+
+def _day(value) -> Optional[str]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y-%m-%d')
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").strftime('%Y-%m-%d')
+
+
+def _category(transaction: Dict) -> Optional[str]:
+    category = transaction.get("personal_finance_category")
+    if isinstance(category, dict) and category.get("primary"):
+        return category["primary"]
+    legacy = transaction.get("category")
+    return legacy[0] if legacy else None
+
+
+class PlaidAPI:
+    """The Plaid SDK client behind the plain dict-in, dict-out calls the banking layer makes"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def transactions_sync(self, access_token: str, cursor: Optional[str] = None, count: int = SYNC_PAGE_SIZE) -> Dict:
+        from plaid.exceptions import ApiException
+        from plaid.model.transactions_sync_request import TransactionsSyncRequest
+        from plaid.model.transactions_sync_request_options import TransactionsSyncRequestOptions
+        kwargs = {"access_token": access_token, "count": count,
+                  "options": TransactionsSyncRequestOptions(include_personal_finance_category=True)}
+        if cursor:
+            kwargs["cursor"] = cursor
+        try:
+            return self.client.transactions_sync(TransactionsSyncRequest(**kwargs)).to_dict()
+        except ApiException as e:
+            if "TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION" in str(e.body):
+                raise SyncRestart() from e
+            raise
+
+    def item_get(self, access_token: str) -> Dict:
+        from plaid.model.item_get_request import ItemGetRequest
+        return self.client.item_get(ItemGetRequest(access_token=access_token)).to_dict()
+
+    def accounts_get(self, access_token: str, realtime: bool = False) -> Dict:
+        """Accounts with balances; ``realtime`` asks the bank instead of using Plaid's cached balances"""
+        if realtime:
+            from plaid.model.accounts_balance_get_request import AccountsBalanceGetRequest
+            return self.client.accounts_balance_get(AccountsBalanceGetRequest(access_token=access_token)).to_dict()
+        from plaid.model.accounts_get_request import AccountsGetRequest
+        return self.client.accounts_get(AccountsGetRequest(access_token=access_token)).to_dict()
+
+
+class TransactionStore:
+    """SQLite store of synced Plaid transactions plus each item's sync cursor.
+
+    A sync's pages are applied in one write transaction together with the new
+    cursor, so a crash never leaves the cursor ahead of the stored rows. Reads are
+    indexed on (item_id, date).
+    """
+
+    def __init__(self, path: str = TRANSACTIONS_DB_PATH):
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS items (
+                item_id TEXT PRIMARY KEY,
+                user_id TEXT,
+                access_token TEXT NOT NULL UNIQUE,
+                institution_id TEXT,
+                cursor TEXT,
+                synced_at REAL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_items_user ON items(user_id);
+            CREATE TABLE IF NOT EXISTS transactions (
+                transaction_id TEXT PRIMARY KEY,
+                item_id TEXT NOT NULL,
+                account_id TEXT,
+                date TEXT NOT NULL,
+                amount REAL NOT NULL,
+                name TEXT,
+                merchant_name TEXT,
+                category TEXT,
+                pending INTEGER NOT NULL DEFAULT 0,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_transactions_item_date ON transactions(item_id, date);
+            CREATE TABLE IF NOT EXISTS changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                item_id TEXT NOT NULL,
+                date TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sessions (
+                token_hash TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def upsert_item(self, item_id: str, access_token: str, user_id: Optional[str] = None,
+                    institution_id: Optional[str] = None) -> Dict:
+        """Register an item, keeping its cursor when it is already known.
+
+        Raises ``PermissionError`` when the item or the token is already linked to another user.
+        """
+        with self._lock:
+            owners = self._conn.execute("SELECT user_id FROM items WHERE (item_id = ? OR access_token = ?) "
+                                        "AND user_id IS NOT NULL", (item_id, access_token)).fetchall()
+            if any(owner[0] != user_id for owner in owners):
+                raise PermissionError(f"Item {item_id} is linked to another user")
+            # Older versions stored tokens first seen without their item id under a placeholder id; move it over
+            previous = self._conn.execute("SELECT item_id FROM items WHERE access_token = ? AND item_id != ?",
+                                          (access_token, item_id)).fetchone()
+            if previous is not None and self._conn.execute("SELECT 1 FROM items WHERE item_id = ?",
+                                                           (item_id,)).fetchone() is None:
+                self._conn.execute("UPDATE items SET item_id = ? WHERE item_id = ?", (item_id, previous[0]))
+                self._conn.execute("UPDATE transactions SET item_id = ? WHERE item_id = ?", (item_id, previous[0]))
+            elif previous is not None:
+                self._conn.execute("DELETE FROM items WHERE item_id = ?", (previous[0],))
+                self._conn.execute("DELETE FROM transactions WHERE item_id = ?", (previous[0],))
+            self._conn.execute(
+                "INSERT INTO items (item_id, user_id, access_token, institution_id, created_at) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT(item_id) DO UPDATE SET "
+                "access_token = excluded.access_token, "
+                "user_id = excluded.user_id, "
+                "institution_id = COALESCE(excluded.institution_id, items.institution_id)",
+                (item_id, user_id, access_token, institution_id, time.time())
+            )
+            self._conn.commit()
+        return self.item(item_id)
+
+    def item(self, item_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM items WHERE item_id = ?", (item_id,)).fetchone()
+        return dict(row) if row else None
+
+    def item_for_token(self, access_token: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM items WHERE access_token = ?", (access_token,)).fetchone()
+        return dict(row) if row else None
+
+    def items_for_user(self, user_id: str) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM items WHERE user_id = ? ORDER BY created_at",
+                                      (user_id,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def create_session(self, user_id: str, ttl: int = SESSION_TTL) -> str:
+        """New random session token for ``user_id``; only its hash is stored"""
+        token = secrets.token_urlsafe(32)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+            self._conn.execute("INSERT INTO sessions (token_hash, user_id, expires_at) VALUES (?, ?, ?)",
+                               (hashlib.sha256(token.encode("utf-8")).hexdigest(), user_id, now + ttl))
+            self._conn.commit()
+        return token
+
+    def session_user(self, token: Optional[str]) -> Optional[str]:
+        """The user a live session token belongs to, else None"""
+        if not token:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT user_id FROM sessions WHERE token_hash = ? AND expires_at >= ?",
+                (hashlib.sha256(token.encode("utf-8")).hexdigest(), time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def apply_sync(self, item_id: str, added: List[Dict], modified: List[Dict], removed: List[str],
+                   cursor: str) -> Set[str]:
+        """Write one complete sync and its cursor atomically; returns every date whose rows changed"""
+        rows = [
+            (t["transaction_id"], item_id, t.get("account_id"), _day(t.get("date")), float(t["amount"]),
+             t.get("name"), t.get("merchant_name"), _category(t), int(bool(t.get("pending"))),
+             json.dumps(t, default=str))
+            for t in list(added) + list(modified)
+        ]
+        ids = [row[0] for row in rows] + list(removed)
+        with self._lock:
+            dates = set()
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                dates.update(row[0] for row in self._conn.execute(
+                    f"SELECT date FROM transactions WHERE transaction_id IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ))
+            dates.update(row[3] for row in rows)
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO transactions (transaction_id, item_id, account_id, date, amount, "
+                    "name, merchant_name, category, pending, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._conn.executemany("DELETE FROM transactions WHERE transaction_id = ? AND item_id = ?",
+                                       [(transaction_id, item_id) for transaction_id in removed])
+                self._conn.execute("UPDATE items SET cursor = ?, synced_at = ? WHERE item_id = ?",
+                                   (cursor, time.time(), item_id))
+                # Change log of touched days, read by incremental consumers such as the analytics cache
+                self._conn.executemany("INSERT INTO changes (item_id, date) VALUES (?, ?)",
+                                       [(item_id, day) for day in sorted(dates)])
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return dates
+
+    def change_seq(self) -> int:
+        """Sequence number of the latest change log entry"""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def changed_dates(self, item_ids: List[str], since_seq: int) -> Set[str]:
+        """Days of these items touched by syncs after ``since_seq``"""
+        if not item_ids:
+            return set()
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT DISTINCT date FROM changes WHERE seq > ? AND item_id IN ({','.join('?' * len(item_ids))})",
+                [since_seq] + list(item_ids)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def frame(self, item_ids: List[str], dates: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Flat columns of the items' transactions (optionally only on ``dates``) for analytics"""
+        columns = ["transaction_id", "item_id", "account_id", "date", "amount", "name", "merchant_name",
+                   "category", "pending"]
+        if not item_ids:
+            return pd.DataFrame(columns=columns)
+        select = f"SELECT {', '.join(columns)} FROM transactions WHERE item_id IN ({','.join('?' * len(item_ids))})"
+        with self._lock:
+            if dates is None:
+                rows = self._conn.execute(select, list(item_ids)).fetchall()
+            else:
+                dates, rows = sorted(dates), []
+                for i in range(0, len(dates), 500):
+                    chunk = dates[i:i + 500]
+                    rows.extend(self._conn.execute(
+                        f"{select} AND date IN ({','.join('?' * len(chunk))})", list(item_ids) + chunk
+                    ).fetchall())
+        frame = pd.DataFrame([tuple(row) for row in rows], columns=columns)
+        frame["date"] = pd.to_datetime(frame["date"])
+        frame["amount"] = frame["amount"].astype(np.float64)
+        return frame
+
+    def _where(self, item_ids: List[str], start_date=None, end_date=None) -> Tuple[str, List]:
+        clauses = [f"item_id IN ({','.join('?' * len(item_ids))})"]
+        params: List = list(item_ids)
+        if start_date:
+            clauses.append("date >= ?")
+            params.append(_day(start_date))
+        if end_date:
+            clauses.append("date <= ?")
+            params.append(_day(end_date))
+        return " AND ".join(clauses), params
+
+    def query(self, item_ids: List[str], start_date=None, end_date=None, limit: int = 100,
+              offset: int = 0) -> Dict:
+        """One page of transactions, newest first, with the total matching count"""
+        limit = max(1, min(limit, MAX_PAGE_LIMIT))
+        if not item_ids:
+            return {"transactions": [], "total": 0, "limit": limit, "offset": offset, "next_offset": None}
+        where, params = self._where(item_ids, start_date, end_date)
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM transactions WHERE {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT data FROM transactions WHERE {where} ORDER BY date DESC, transaction_id LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return {
+            "transactions": [json.loads(row["data"]) for row in rows],
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "next_offset": offset + limit if offset + limit < total else None,
+        }
+
+
+class TransactionSync:
+    """Cursor-based incremental sync of each item into a ``TransactionStore``.
+
+    Reads never wait on Plaid once an item has synced at least once: a stale item
+    is refreshed on a background thread and the current local rows are served.
+    """
+
+    def __init__(self, api, store: TransactionStore = None, interval: float = SYNC_INTERVAL,
+                 page_size: int = SYNC_PAGE_SIZE):
+        self.api = api
+        self.store = store or TransactionStore()
+        self.interval = interval
+        self.page_size = page_size
+        self._item_locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._pending: Set[str] = set()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="plaid-sync")
+
+    def _item_lock(self, item_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._item_locks.setdefault(item_id, threading.Lock())
+
+    def link_item(self, item_id: str, access_token: str, user_id: str, institution_id: Optional[str] = None,
+                  session_user: Optional[str] = None) -> Dict:
+        """Register an item for ``user_id`` once Plaid confirms the token belongs to it.
+
+        A user that already has linked items can only add more from one of its own
+        sessions (``session_user``). Raises ``ValueError`` for a token Plaid does not
+        match to ``item_id`` and ``PermissionError`` for another user's user id or item.
+        """
+        if session_user != user_id and self.store.items_for_user(user_id):
+            raise PermissionError(f"User {user_id} already has linked items; link more from its session")
+        try:
+            linked_item_id = self.api.item_get(access_token)["item"]["item_id"]
+        except Exception as e:
+            raise ValueError(f"Could not verify the access token: {e}") from e
+        if linked_item_id != item_id:
+            raise ValueError(f"The access token does not belong to item {item_id}")
+        return self.store.upsert_item(item_id, access_token, user_id, institution_id)
+
+    def sync(self, item_id: str) -> Dict:
+        """Pull every change since the item's cursor and apply it in one transaction"""
+        with self._item_lock(item_id):
+            item = self.store.item(item_id)
+            if item is None:
+                raise KeyError(f"Unknown item: {item_id}")
+            for attempt in range(SYNC_RESTARTS):
+                added, modified, removed = [], [], []
+                cursor = item["cursor"]
+                try:
+                    with span("plaid_sync"):
+                        while True:
+                            page = self.api.transactions_sync(item["access_token"], cursor, self.page_size)
+                            added.extend(page.get("added", []))
+                            modified.extend(page.get("modified", []))
+                            removed.extend(r["transaction_id"] if isinstance(r, dict) else r
+                                           for r in page.get("removed", []))
+                            cursor = page["next_cursor"]
+                            if not page.get("has_more"):
+                                break
+                except SyncRestart:
+                    print(f"Transactions for item {item_id} changed during sync, restarting")
+                    continue
+                dates = self.store.apply_sync(item_id, added, modified, removed, cursor)
+                print(f"Synced item {item_id}: {len(added)} added, {len(modified)} modified, {len(removed)} removed")
+                return {"item_id": item_id, "added": len(added), "modified": len(modified),
+                        "removed": len(removed), "dates": sorted(dates)}
+            raise RuntimeError(f"Transactions for item {item_id} kept changing during sync")
+
+    def _sync_in_background(self, item_id: str):
+        try:
+            self.sync(item_id)
+        except Exception as e:
+            print(f"Background sync failed for item {item_id}: {e}")
+        finally:
+            with self._locks_guard:
+                self._pending.discard(item_id)
+
+    def ensure_fresh(self, item_ids: Iterable[str], force: bool = False):
+        """Sync never-synced items (or all with ``force``) now, and schedule stale ones in the background"""
+        now = time.time()
+        for item_id in item_ids:
+            item = self.store.item(item_id)
+            if item is None:
+                continue
+            if force or item["synced_at"] is None:
+                self.sync(item_id)
+            elif now - item["synced_at"] > self.interval:
+                self.schedule(item_id)
+
+    def schedule(self, item_id: str):
+        """Sync an item on the background pool unless it is already queued"""
+        with self._locks_guard:
+            if item_id in self._pending:
+                return
+            self._pending.add(item_id)
+        self._executor.submit(self._sync_in_background, item_id)
+
+
+class LocalPlaid:
+    """Stand-in for Plaid's ``/transactions/sync``, ``/accounts/get`` and ``/item/get`` backed by memory.
+
+    Each access token has an append-only list of ``added``/``modified``/``removed``
+    events and the cursor is a position in that list, so incremental syncs,
+    pagination and removals behave like the real endpoint without network access.
+    Accepts ``{access_token: [transaction, ...]}`` or a JSON-lines file of
+    transactions that carry an ``access_token`` field. ``latency`` seconds are
+    slept per call to emulate the round trip. ``items`` maps access tokens to the
+    item id ``item_get`` reports for them.
+    """
+
+    def __init__(self, transactions: Dict[str, List[Dict]] = None, path: str = None,
+                 accounts: Dict[str, List[Dict]] = None, latency: float = 0.0, items: Dict[str, str] = None):
+        self._log: Dict[str, List[Tuple[str, object]]] = {}
+        self._accounts: Dict[str, List[Dict]] = dict(accounts or {})
+        self._items: Dict[str, str] = dict(items or {})
+        self._lock = threading.Lock()
+        self.latency = latency
+        self.calls = []
+        if path is not None:
+            transactions = {}
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        transactions.setdefault(record.pop("access_token"), []).append(record)
+        for access_token, rows in (transactions or {}).items():
+            self.add(access_token, rows)
+
+    def add(self, access_token: str, transactions: List[Dict]):
+        with self._lock:
+            self._log.setdefault(access_token, []).extend(("added", dict(t)) for t in transactions)
+
+    def modify(self, access_token: str, transactions: List[Dict]):
+        with self._lock:
+            self._log.setdefault(access_token, []).extend(("modified", dict(t)) for t in transactions)
+
+    def remove(self, access_token: str, transaction_ids: List[str]):
+        with self._lock:
+            self._log.setdefault(access_token, []).extend(("removed", t) for t in transaction_ids)
+
+    def set_accounts(self, access_token: str, accounts: List[Dict]):
+        with self._lock:
+            self._accounts[access_token] = [dict(account) for account in accounts]
+
+    def item_get(self, access_token: str) -> Dict:
+        self.calls.append(("item", access_token))
+        time.sleep(self.latency)
+        with self._lock:
+            if access_token not in self._items:
+                raise KeyError(f"Unknown access token: {access_token}")
+            return {"item": {"item_id": self._items[access_token]}}
+
+    def accounts_get(self, access_token: str, realtime: bool = False) -> Dict:
+        self.calls.append(("accounts", access_token))
+        time.sleep(self.latency)
+        with self._lock:
+            if access_token not in self._accounts:
+                raise KeyError(f"Unknown access token: {access_token}")
+            return {"accounts": [dict(account) for account in self._accounts[access_token]]}
+
+    def transactions_sync(self, access_token: str, cursor: Optional[str] = None, count: int = SYNC_PAGE_SIZE) -> Dict:
+        self.calls.append((access_token, cursor))
+        time.sleep(self.latency)
+        with self._lock:
+            if access_token not in self._log:
+                raise KeyError(f"Unknown access token: {access_token}")
+            log = self._log[access_token]
+            position = int(cursor) if cursor else 0
+            events = log[position:position + count]
+        page = {"added": [], "modified": [], "removed": []}
+        for kind, value in events:
+            page[kind].append({"transaction_id": value} if kind == "removed" else value)
+        page["next_cursor"] = str(position + len(events))
+        page["has_more"] = position + len(events) < len(log)
+        return page
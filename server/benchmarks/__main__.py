@@ -0,0 +1,179 @@
+"""Benchmarks for the data profile, model training, sentiment scoring and backtest paths.
+
+Run from the server directory:
+
+    python -m benchmarks                       # all benchmarks, default sizes
+    python -m benchmarks --only profile train  # a subset
+    python -m benchmarks --save-baseline       # store this run as the baseline
+    python -m benchmarks --baseline path.json  # compare against another run
+
+Everything runs offline on synthetic data with a stub in place of FinBERT. Results
+go to ``--output`` as JSON; when a baseline exists the run is compared against it
+and the exit status is 1 if any benchmark regressed beyond ``--tolerance``.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from benchmarks.harness import compare, environment, measure, read_json, run_isolated, write_json
+from benchmarks.synthetic import (StubSentimentEngine, SyntheticPriceSource, headline_articles, make_dataset,
+                                  make_headlines, make_prices)
+
+RESULTS_DIR = os.path.join("cache", "benchmarks")
+START = datetime(2022, 1, 3)
+SYMBOL = "SPY"
+
+
+def bench_profile(args, workdir):
+    from ml.profiling import profile_frame
+    df = make_dataset(args.rows, args.numeric_columns, args.categorical_columns, args.cardinality, seed=args.seed)
+    return measure(lambda: profile_frame(df), repeats=args.repeats, units=len(df), unit_name="rows")
+
+
+def bench_train(args, workdir):
+    from ml.artifacts import ArtifactStore
+    from ml.registry import Registry
+    from mlPipeline import MLPipeline
+    registry = Registry(os.path.join(workdir, "registry"),
+                        artifacts=ArtifactStore(os.path.join(workdir, "registry", "artifacts")))
+    pipeline = MLPipeline(registry)
+    df = make_dataset(args.train_rows, args.numeric_columns, args.categorical_columns, args.cardinality,
+                      seed=args.seed)
+    dataset_id = registry.put_dataset("bench", df)
+    return measure(
+        lambda: pipeline.train_model("target", dataset_id=dataset_id, user_id="bench"),
+        repeats=max(1, args.repeats // 2), warmup=0, units=len(df), unit_name="rows"
+    )
+
+
+def _sentiment_days(args):
+    headlines = make_headlines(START, args.days, per_day=args.headlines_per_day, seed=args.seed)
+    return [group.tolist() for _, group in headlines.groupby("date")["headline"]], len(headlines)
+
+
+def bench_sentiment_cold(args, workdir):
+    """estimate_sentiment per day with an empty logit cache on every call"""
+    from trading.finbert_utils import LogitCache, estimate_sentiment, set_engine
+    days, total = _sentiment_days(args)
+    counter = iter(range(1_000_000))
+
+    def run():
+        cache = LogitCache(os.path.join(workdir, f"logits-{next(counter)}.sqlite"))
+        set_engine(StubSentimentEngine(cache, cost_ms=args.stub_cost_ms))
+        for headlines in days:
+            estimate_sentiment(headlines)
+
+    return measure(run, repeats=args.repeats, units=total, unit_name="headlines")
+
+
+def bench_sentiment_warm(args, workdir):
+    """estimate_sentiment per day with every headline already cached"""
+    from trading.finbert_utils import LogitCache, estimate_sentiment, set_engine
+    days, total = _sentiment_days(args)
+    set_engine(StubSentimentEngine(LogitCache(os.path.join(workdir, "logits-warm.sqlite")),
+                                   cost_ms=args.stub_cost_ms))
+
+    def run():
+        for headlines in days:
+            estimate_sentiment(headlines)
+
+    return measure(run, repeats=args.repeats, units=total, unit_name="headlines")
+
+
+def bench_backtest(args, workdir):
+    """The vectorized run_backtest path: archived news, precomputed sentiment, cached prices, simulation"""
+    from trading.finbert_utils import LogitCache
+    from trading.news_store import LocalNewsAPI, NewsArchive
+    from trading.price_cache import PriceCache
+    from trading.sentiment_series import precompute_sentiment
+    from trading.vector_backtest import run_vectorized_backtest
+    headlines = make_headlines(START - timedelta(days=7), args.days + 7, per_day=args.headlines_per_day,
+                               seed=args.seed)
+    archive = NewsArchive(api=LocalNewsAPI(headline_articles(SYMBOL, headlines)),
+                          path=os.path.join(workdir, "news.sqlite"))
+    prices = PriceCache(os.path.join(workdir, "prices"), source=SyntheticPriceSource(make_prices(START, args.days)))
+    engine = StubSentimentEngine(LogitCache(os.path.join(workdir, "logits-backtest.sqlite")),
+                                 cost_ms=args.stub_cost_ms)
+    end = START + timedelta(days=args.days)
+
+    def run():
+        series = precompute_sentiment(archive, SYMBOL, START, end, engine=engine)
+        return run_vectorized_backtest(prices.get(SYMBOL, START, end), series, cash_at_risk=0.5,
+                                       sentiment_threshold=0.9)
+
+    # The warmup call fills the news archive, logit and price caches, as in steady state
+    return measure(run, repeats=args.repeats, units=args.days, unit_name="days")
+
+
+BENCHMARKS = {
+    "profile": bench_profile,
+    "train": bench_train,
+    "sentiment_cold": bench_sentiment_cold,
+    "sentiment_warm": bench_sentiment_warm,
+    "backtest": bench_backtest,
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="run a subset of the benchmarks")
+    parser.add_argument("--rows", type=int, default=200_000, help="rows for the profile benchmark")
+    parser.add_argument("--train-rows", type=int, default=5_000, help="rows for the training benchmark")
+    parser.add_argument("--numeric-columns", type=int, default=8)
+    parser.add_argument("--categorical-columns", type=int, default=2)
+    parser.add_argument("--cardinality", type=int, default=20, help="distinct values per categorical column")
+    parser.add_argument("--days", type=int, default=365, help="calendar days of headlines and prices")
+    parser.add_argument("--headlines-per-day", type=int, default=20)
+    parser.add_argument("--stub-cost-ms", type=float, default=0.0, help="emulated FinBERT cost per headline")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--baseline", default=os.path.join(RESULTS_DIR, "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="also store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown/growth before a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    config = {key: value for key, value in vars(args).items()
+              if key not in ("only", "output", "baseline", "save_baseline", "tolerance")}
+    results = {"environment": environment(), "config": config, "benchmarks": {}}
+
+    workdir = tempfile.mkdtemp(prefix="benchmarks-")
+    try:
+        for name in args.only or BENCHMARKS:
+            print(f"Running {name}...")
+            # Each benchmark gets its own process, so its peak RSS is not inflated by the ones before it
+            result = run_isolated(BENCHMARKS[name], args, workdir)
+            results["benchmarks"][name] = result
+            print(f"  p50 {result['p50_ms']:.1f} ms  p95 {result['p95_ms']:.1f} ms  "
+                  f"{result['throughput']} {result['throughput_unit']}  peak RSS {result['peak_rss_mb']:.1f} MB "
+                  f"(+{result['rss_growth_mb']:.1f} MB per call)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    write_json(args.output, results)
+    print(f"Results written to {args.output}")
+
+    status = 0
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        baseline = read_json(args.baseline)
+        if baseline.get("config") != config:
+            print("Warning: baseline was recorded with a different configuration")
+        print(f"Compared with {args.baseline} (ratios, >1 is slower/larger):")
+        for row in compare(results, baseline, args.tolerance):
+            flag = "  REGRESSION" if row["regressed"] else ""
+            print(f"  {row['benchmark']:<16} p50 x{row['p50_ms']}  p95 x{row['p95_ms']}  "
+                  f"peak RSS x{row['peak_rss_mb']}{flag}")
+            status = 1 if row["regressed"] else status
+    if args.save_baseline:
+        write_json(args.baseline, results)
+        print(f"Baseline saved to {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Accuracy parity and latency of the FinBERT backends against the fp32 torch model.
+
+Run from the server directory (downloads FinBERT on first use):
+
+    python -m benchmarks.finbert_parity                  # int8 and onnx vs torch
+    python -m benchmarks.finbert_parity --backends int8
+
+Every backend scores the same fixed headline set without the logit cache. The
+exit status is 1 if a backend's label agreement falls below ``--min-agreement``
+or its class probabilities drift further than ``--max-prob-diff`` from fp32.
+"""
+import argparse
+import os
+import sys
+import numpy as np
+from benchmarks.harness import measure, write_json
+from trading.finbert_utils import BACKENDS, SentimentEngine, combine_logits, labels, load_model
+
+RESULTS_PATH = os.path.join("cache", "benchmarks", "finbert_parity.json")
+
+HEADLINES = [
+    "Apple beats quarterly earnings estimates on strong iPhone demand",
+    "Microsoft shares slide after cloud growth misses expectations",
+    "Nvidia raises full-year guidance as data center sales surge",
+    "Tesla recalls 120,000 vehicles over seat belt warning issue",
+    "Federal Reserve holds interest rates steady, signals patience",
+    "Oil prices plunge as OPEC output rises more than expected",
+    "Amazon announces $10 billion share buyback program",
+    "Retail sales unexpectedly fall for a second straight month",
+    "Bank stocks rally after stress test results clear all lenders",
+    "Meta faces EU antitrust probe over advertising practices",
+    "Treasury yields little changed ahead of inflation data",
+    "Alphabet reports in-line revenue, maintains outlook",
+    "Boeing cuts delivery forecast after new production flaws found",
+    "Unemployment claims drop to lowest level in eight months",
+    "Pharmaceutical maker wins FDA approval for new obesity drug",
+    "Chipmaker warns of inventory glut, shares tumble 12%",
+    "S&P 500 closes at a record high as tech leads gains",
+    "Company files for Chapter 11 bankruptcy protection",
+    "Analysts upgrade the stock to buy citing margin expansion",
+    "Dividend cut announced as free cash flow weakens",
+    "Merger talks between the two regional banks collapse",
+    "Consumer confidence rises to a three-year high",
+    "Shares were flat in early trading on light volume",
+    "Regulators fine the lender $200 million over compliance failures",
+    "The company will report results after the market close on Thursday",
+    "Strong jobs report lifts stocks and the dollar",
+    "Supply chain disruptions weigh on automaker profits",
+    "Startup raises $300 million in oversubscribed funding round",
+    "Credit rating agency downgrades the country's debt outlook",
+    "Markets responded negatively to the news!",
+    "Traders were displeased!",
+    "Quarterly revenue grew 4% year over year, in line with estimates",
+]
+
+
+def _probabilities(logits: np.ndarray) -> np.ndarray:
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def compare_backend(reference: np.ndarray, logits: np.ndarray) -> dict:
+    """Agreement of per-headline labels and drift of class probabilities against the reference logits"""
+    ref_probs, probs = _probabilities(reference), _probabilities(logits)
+    return {
+        "label_agreement": round(float((ref_probs.argmax(axis=1) == probs.argmax(axis=1)).mean()), 4),
+        "max_prob_diff": round(float(np.abs(ref_probs - probs).max()), 4),
+        "mean_prob_diff": round(float(np.abs(ref_probs - probs).mean()), 4),
+        "max_logit_diff": round(float(np.abs(reference - logits).max()), 4),
+        "day_label_match": combine_logits(reference)[1] == combine_logits(logits)[1],
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.finbert_parity", description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", choices=[b for b in BACKENDS if b != "torch"],
+                        default=[b for b in BACKENDS if b != "torch"])
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-agreement", type=float, default=0.95)
+    parser.add_argument("--max-prob-diff", type=float, default=0.05)
+    parser.add_argument("--output", default=RESULTS_PATH)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = {"headlines": len(HEADLINES), "labels": labels, "backends": {}}
+    reference = None
+    status = 0
+    for backend in ["torch"] + args.backends:
+        print(f"Loading {backend}...")
+        tokenizer, model = load_model(backend)
+        engine = SentimentEngine(tokenizer, model, cache=None, batch_size=args.batch_size)
+        logits = engine.logits(HEADLINES)
+        entry = {"latency": measure(lambda: engine.logits(HEADLINES), repeats=args.repeats,
+                                    units=len(HEADLINES), unit_name="headlines")}
+        if reference is None:
+            reference = logits
+        else:
+            entry.update(compare_backend(reference, logits))
+            entry["speedup"] = round(results["backends"]["torch"]["latency"]["p50_ms"]
+                                     / entry["latency"]["p50_ms"], 2)
+            if entry["label_agreement"] < args.min_agreement or entry["max_prob_diff"] > args.max_prob_diff:
+                entry["failed"] = True
+                status = 1
+        results["backends"][backend] = entry
+        summary = "  ".join(f"{key} {value}" for key, value in entry.items() if key != "latency")
+        print(f"  p50 {entry['latency']['p50_ms']:.1f} ms  {summary}")
+
+    write_json(args.output, results)
+    print(f"Results written to {args.output}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
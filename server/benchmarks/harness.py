@@ -0,0 +1,155 @@
+import gc
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+import numpy as np
+
+
+def _status_bytes(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) * 1024
+    raise OSError(f"{field} not in /proc/self/status")
+
+
+def _max_rss_bytes() -> int:
+    import resource
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def peak_rss_growth(fn: Callable[[], object]):
+    """Call ``fn`` once; returns how far resident memory peaked above its level before the call.
+
+    Unlike tracemalloc this sees native allocations (xgboost, torch, numpy, sklearn's
+    C code). On Linux the kernel's high-water mark is reset first, so the peak is
+    exact; elsewhere the process-lifetime ``ru_maxrss`` is used, which misses a peak
+    that stays below one reached earlier in the process.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        before = _status_bytes("VmRSS")
+        fn()
+        return max(_status_bytes("VmHWM") - before, 0), "vmhwm"
+    except OSError:
+        before = _max_rss_bytes()
+        fn()
+        return max(_max_rss_bytes() - before, 0), "ru_maxrss"
+
+
+def _isolated_call(module: str, name: str, args: tuple) -> Dict:
+    result = getattr(importlib.import_module(module), name)(*args)
+    result["peak_rss_mb"] = round(_max_rss_bytes() / 1024 ** 2, 3)
+    return result
+
+
+def run_isolated(fn: Callable[..., Dict], *args) -> Dict:
+    """Run a benchmark in a freshly spawned process and add that process's peak RSS.
+
+    The peak covers the interpreter, imports and setup as well as the measured calls,
+    but nothing from earlier benchmarks, so it is comparable run to run.
+    """
+    module = fn.__module__
+    if module == "__main__":
+        # Under ``python -m benchmarks`` a spawned child has no __main__ to unpickle from; import it by name
+        module = sys.modules["__main__"].__spec__.name
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(_isolated_call, module, fn.__name__, args).result()
+
+
+def measure(fn: Callable[[], object], repeats: int = 5, warmup: int = 1, units: float = 1,
+            unit_name: str = "calls") -> Dict:
+    """Time ``fn`` and record how much resident memory one call adds at its peak.
+
+    ``warmup`` calls run first and are not timed. One extra call after the timing
+    runs gives ``rss_growth_mb`` (see ``peak_rss_growth``); memory the allocator kept
+    from earlier calls is reused, so this can read low. ``run_isolated`` adds the
+    whole process's peak.
+    ``units`` is the work done per call (rows, headlines, ...) for the throughput.
+    """
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(repeats):
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+
+    gc.collect()
+    peak, method = peak_rss_growth(fn)
+
+    latencies = np.asarray(latencies)
+    median = float(np.percentile(latencies, 50))
+    return {
+        "repeats": repeats,
+        "p50_ms": round(median * 1000, 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+        "mean_ms": round(float(latencies.mean()) * 1000, 3),
+        "min_ms": round(float(latencies.min()) * 1000, 3),
+        "throughput": round(units / median, 3) if median > 0 else None,
+        "throughput_unit": f"{unit_name}/s",
+        "rss_growth_mb": round(peak / 1024 ** 2, 3),
+        "memory_method": method,
+    }
+
+
+def environment() -> Dict:
+    """Versions and machine details stored next to the numbers"""
+    import pandas
+    import sklearn
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pandas.__version__,
+        "scikit-learn": sklearn.__version__,
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float = 0.2) -> List[Dict]:
+    """Per-benchmark ratios against the baseline; ``regressed`` when p50 or peak RSS grew past tolerance"""
+    rows = []
+    for name, current in results["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if previous is None:
+            continue
+        row = {"benchmark": name}
+        for metric in ("p50_ms", "p95_ms", "peak_rss_mb", "rss_growth_mb"):
+            before, after = previous.get(metric), current.get(metric)
+            row[metric] = round(after / before, 3) if before else None
+        row["regressed"] = any(
+            row[metric] is not None and row[metric] > 1 + tolerance for metric in ("p50_ms", "peak_rss_mb")
+        )
+        rows.append(row)
+    return rows
+
+
+def write_json(path: str, data: Dict):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def read_json(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,117 @@
+import hashlib
+import time
+from datetime import datetime, timedelta
+from typing import List
+import numpy as np
+import pandas as pd
+from trading.finbert_utils import SentimentEngine
+
+COMPANIES = ["Apple", "Microsoft", "Nvidia", "Amazon", "Tesla", "Meta", "Alphabet", "the Fed", "Treasury yields", "oil"]
+VERBS_UP = ["surges", "beats estimates", "rallies", "upgrades guidance", "hits record high"]
+VERBS_DOWN = ["plunges", "misses estimates", "slides", "cuts guidance", "faces probe"]
+VERBS_FLAT = ["holds steady", "is little changed", "awaits data", "trades sideways", "reports in line"]
+POSITIVE_WORDS = ("surges", "beats", "rallies", "upgrades", "record")
+NEGATIVE_WORDS = ("plunges", "misses", "slides", "cuts", "probe")
+
+
+def make_dataset(rows: int, numeric_columns: int = 8, categorical_columns: int = 2, cardinality: int = 20,
+                 seed: int = 0) -> pd.DataFrame:
+    """Mixed-type frame with a binary ``target`` that depends on a few of the features"""
+    rng = np.random.default_rng(seed)
+    data = {f"num_{i}": rng.normal(loc=i, scale=1 + i % 3, size=rows) for i in range(numeric_columns)}
+    for i in range(categorical_columns):
+        data[f"cat_{i}"] = pd.Categorical.from_codes(
+            rng.integers(0, cardinality, rows), [f"c{i}_{j}" for j in range(cardinality)]
+        )
+    frame = pd.DataFrame(data)
+    signal = rng.normal(size=rows)
+    if numeric_columns:
+        signal += frame["num_0"].to_numpy() - frame[f"num_{numeric_columns - 1}"].to_numpy() / numeric_columns
+    if categorical_columns:
+        signal += (frame["cat_0"].cat.codes.to_numpy() % 2) - 0.5
+    frame["target"] = (signal > np.median(signal)).astype(np.int8)
+    return frame
+
+
+def make_headlines(start: datetime, days: int, per_day: int = 20, repeat_rate: float = 0.2,
+                   seed: int = 0) -> pd.DataFrame:
+    """``date``/``headline`` frame; ``repeat_rate`` of headlines reuse earlier text, like syndicated news"""
+    rng = np.random.default_rng(seed)
+    verbs = VERBS_UP + VERBS_DOWN + VERBS_FLAT
+    dates, headlines = [], []
+    for day in range(days):
+        date = start + timedelta(days=day)
+        for _ in range(int(rng.poisson(per_day))):
+            if headlines and rng.random() < repeat_rate:
+                text = headlines[int(rng.integers(0, len(headlines)))]
+            else:
+                text = (f"{COMPANIES[rng.integers(0, len(COMPANIES))]} {verbs[rng.integers(0, len(verbs))]} "
+                        f"as traders weigh outlook ({int(rng.integers(0, 1_000_000))})")
+            dates.append(date)
+            headlines.append(text)
+    return pd.DataFrame({"date": pd.to_datetime(dates), "headline": headlines})
+
+
+def headline_articles(symbol: str, headlines: pd.DataFrame) -> List[dict]:
+    """The headline frame as raw Alpaca-style articles for ``LocalNewsAPI``"""
+    return [
+        {
+            "id": f"{i}",
+            "symbols": [symbol],
+            "created_at": (date + timedelta(hours=13)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "headline": headline,
+        }
+        for i, (date, headline) in enumerate(zip(headlines["date"], headlines["headline"]))
+    ]
+
+
+def make_prices(start: datetime, days: int, seed: int = 0, start_price: float = 400.0) -> pd.DataFrame:
+    """Daily OHLCV bars on business days from a geometric random walk"""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(start, start + timedelta(days=days - 1), name="date")
+    returns = rng.normal(0.0003, 0.012, len(index))
+    close = start_price * np.exp(np.cumsum(returns))
+    open_ = close * np.exp(rng.normal(0, 0.004, len(index)))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.006, len(index))))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.006, len(index))))
+    volume = rng.integers(1_000_000, 5_000_000, len(index)).astype(np.float64)
+    return pd.DataFrame({"open": open_, "high": high, "low": low, "close": close, "volume": volume}, index=index)
+
+
+class SyntheticPriceSource:
+    """``PriceCache`` source serving slices of one synthetic series"""
+
+    def __init__(self, prices: pd.DataFrame):
+        self.prices = prices
+
+    def fetch(self, symbol: str, start: datetime, end: datetime) -> pd.DataFrame:
+        return self.prices.loc[(self.prices.index >= start) & (self.prices.index < end)]
+
+
+class StubSentimentEngine(SentimentEngine):
+    """SentimentEngine with a keyword-and-hash scorer in place of FinBERT.
+
+    Caching and batching are the real engine's; only ``_infer`` is replaced. Logits
+    are deterministic per headline, and ``cost_ms`` per headline can emulate model
+    latency so cache effects stay visible.
+    """
+
+    def __init__(self, cache=None, batch_size: int = 32, cost_ms: float = 0.0):
+        super().__init__(tokenizer=None, model=None, cache=cache, batch_size=batch_size, namespace="stub")
+        self.cost_ms = cost_ms
+
+    def _infer(self, headlines: List[str]) -> np.ndarray:
+        logits = np.empty((len(headlines), 3), dtype=np.float32)
+        for i, headline in enumerate(headlines):
+            digest = hashlib.blake2b(headline.encode("utf-8"), digest_size=12).digest()
+            noise = np.frombuffer(digest, dtype=np.uint32).astype(np.float32) / 2 ** 32 - 0.5
+            text = headline.lower()
+            positive = 3.0 * any(word in text for word in POSITIVE_WORDS)
+            negative = 3.0 * any(word in text for word in NEGATIVE_WORDS)
+            logits[i] = noise + [positive, negative, 1.5]
+        if self.cost_ms:
+            # Busy-wait rather than sleep so the emulated model cost shows up as CPU time
+            deadline = time.perf_counter() + self.cost_ms * len(headlines) / 1000
+            while time.perf_counter() < deadline:
+                pass
+        return logits
@@ -0,0 +1,6 @@
+class JobCancelled(Exception):
+    """Raised from a progress callback once cancellation has been requested.
+
+    Kept apart from ``jobs`` so long-running code (the backtest result cache, the
+    ML tournament) can recognise a cancellation without importing the job layer.
+    """
@@ -0,0 +1,257 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from fastapi.encoders import jsonable_encoder
+from cancellation import JobCancelled
+from tracing import JOB_SECONDS, copy_context_run
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", os.path.join("cache", "jobs.sqlite"))
+# Finished jobs (and their stored results) older than this are deleted
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "14"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobStore:
+    """SQLite-backed job records, shared by every worker process on the host"""
+
+    def __init__(self, path: str = JOB_STORE_PATH):
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress REAL NOT NULL DEFAULT 0,
+                message TEXT,
+                error TEXT,
+                result TEXT,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                pid INTEGER,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_kind_created ON jobs(kind, created_at);
+            CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs(finished_at);
+        """)
+        self._conn.commit()
+
+    def create(self, kind: str, params: Dict) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, params, status, pid, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(jsonable_encoder(params)), QUEUED, os.getpid(), time.time())
+            )
+            self._conn.commit()
+        return job_id
+
+    def update(self, job_id: str, **fields):
+        if "result" in fields:
+            fields["result"] = json.dumps(jsonable_encoder(fields["result"]))
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+            self._conn.commit()
+
+    def get(self, job_id: str, with_result: bool = False) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._record(row, with_result) if row is not None else None
+
+    def list(self, kind: str = None, status: str = None, limit: int = 50) -> List[Dict]:
+        query, args = "SELECT * FROM jobs WHERE 1 = 1", []
+        if kind:
+            query += " AND kind = ?"
+            args.append(kind)
+        if status:
+            query += " AND status = ?"
+            args.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, args).fetchall()
+        return [self._record(row) for row in rows]
+
+    def latest_result(self, kind: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE kind = ? AND status = ? ORDER BY finished_at DESC LIMIT 1",
+                (kind, SUCCEEDED)
+            ).fetchone()
+        return self._record(row, with_result=True) if row is not None else None
+
+    def cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def fail_orphans(self):
+        """Mark unfinished jobs whose worker process no longer exists as failed"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, pid FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchall()
+        for row in rows:
+            if row["pid"] != os.getpid() and not _pid_alive(row["pid"]):
+                self.update(row["id"], status=FAILED, error="Worker exited before the job finished",
+                            finished_at=time.time())
+
+    def prune(self, retention_days: float = JOB_RETENTION_DAYS) -> int:
+        """Delete finished jobs older than ``retention_days``; returns how many were removed"""
+        cutoff = time.time() - retention_days * 24 * 3600
+        with self._lock:
+            removed = self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED))}) AND finished_at < ?",
+                (*FINISHED, cutoff)
+            ).rowcount
+            self._conn.commit()
+        return removed
+
+    @staticmethod
+    def _record(row, with_result: bool = False) -> Dict:
+        record = {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "params": json.loads(row["params"]),
+            "status": row["status"],
+            "progress": row["progress"],
+            "message": row["message"],
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+        if with_result:
+            record["result"] = json.loads(row["result"]) if row["result"] else None
+        return record
+
+
+def _pid_alive(pid) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobManager:
+    """Runs registered job kinds on a bounded thread pool and persists their state.
+
+    A job function is called as ``fn(params, progress)``. ``progress(fraction, message)``
+    records progress and raises ``JobCancelled`` once the job has been cancelled, so
+    long-running work stops at its next checkpoint.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, store: JobStore = None,
+                 retention_days: float = JOB_RETENTION_DAYS):
+        self.store = store or JobStore()
+        self.store.fail_orphans()
+        self.retention_days = retention_days
+        self._last_prune = 0.0
+        self._prune()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._handlers: Dict[str, Callable] = {}
+        self._futures: Dict[str, Future] = {}
+
+    def register(self, kind: str, fn: Callable[[Dict, Callable], Any]):
+        self._handlers[kind] = fn
+
+    def submit(self, kind: str, params: Dict) -> str:
+        """Queue a job and return its id without waiting for it"""
+        job_id, _ = self._submit(kind, params)
+        return job_id
+
+    async def run(self, kind: str, params: Dict) -> Any:
+        """Queue a job and wait for its result without blocking the event loop"""
+        _, future = self._submit(kind, params)
+        return await asyncio.wrap_future(future)
+
+    def _submit(self, kind: str, params: Dict):
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = self.store.create(kind, params)
+        # Run in the submitter's context so spans land on the request's trace
+        future = self._executor.submit(copy_context_run(self._run), job_id, kind, params)
+        self._futures[job_id] = future
+        future.add_done_callback(lambda _: self._futures.pop(job_id, None))
+        return job_id, future
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        job = self.store.get(job_id)
+        if job is None or job["status"] in FINISHED:
+            return job
+        self.store.update(job_id, cancel_requested=1)
+        future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            self.store.update(job_id, status=CANCELLED, finished_at=time.time())
+        return self.store.get(job_id)
+
+    def _prune(self):
+        # At most hourly, so busy workers don't sweep the table after every job
+        if time.monotonic() - self._last_prune < 3600 and self._last_prune:
+            return
+        self._last_prune = time.monotonic()
+        removed = self.store.prune(self.retention_days)
+        if removed:
+            print(f"Pruned {removed} jobs finished more than {self.retention_days:g} days ago")
+
+    def _run(self, job_id: str, kind: str, params: Dict):
+        if self.store.cancel_requested(job_id):
+            self.store.update(job_id, status=CANCELLED, finished_at=time.time())
+            raise JobCancelled(job_id)
+        self.store.update(job_id, status=RUNNING, started_at=time.time())
+        started = time.perf_counter()
+
+        def progress(fraction: float, message: str = None):
+            if self.store.cancel_requested(job_id):
+                raise JobCancelled(job_id)
+            self.store.update(job_id, progress=round(min(max(fraction, 0.0), 1.0), 4), message=message)
+
+        try:
+            result = self._handlers[kind](params, progress)
+        except JobCancelled:
+            JOB_SECONDS.observe(time.perf_counter() - started, kind=kind, status=CANCELLED)
+            self.store.update(job_id, status=CANCELLED, finished_at=time.time())
+            raise
+        except Exception as e:
+            JOB_SECONDS.observe(time.perf_counter() - started, kind=kind, status=FAILED)
+            print(f"Job {job_id} ({kind}) failed: {e}")
+            self.store.update(job_id, status=FAILED, error=str(e), finished_at=time.time())
+            raise
+        try:
+            self.store.update(job_id, status=SUCCEEDED, progress=1.0, result=result, finished_at=time.time())
+        except Exception as e:
+            # The work is done but its result can't be stored; don't leave the job running forever
+            JOB_SECONDS.observe(time.perf_counter() - started, kind=kind, status=FAILED)
+            print(f"Job {job_id} ({kind}) finished but its result could not be stored: {e}")
+            self.store.update(job_id, status=FAILED, error=f"Could not store the result: {e}",
+                              finished_at=time.time())
+            raise
+        finally:
+            self._prune()
+        JOB_SECONDS.observe(time.perf_counter() - started, kind=kind, status=SUCCEEDED)
+        return result
@@ -1,40 +1,67 @@
 import json
 import uvicorn
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Response
+from fastapi import Cookie, Depends, FastAPI, UploadFile, File, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import datetime, timedelta
-from mlPipeline import MLPipeline
-from trading.service import TradingService
-from plaid.api import plaid_api
-from plaid.model.link_token_create_request import LinkTokenCreateRequest
-from plaid.model.link_token_create_request_user import LinkTokenCreateRequestUser
-from plaid.model.item_public_token_exchange_request import ItemPublicTokenExchangeRequest
-from plaid.model.transactions_get_request import TransactionsGetRequest
-import os
-import plaid
-from plaid.exceptions import ApiException
-from plaid.model.country_code import CountryCode 
-from plaid.model.products import Products  
+from contextlib import asynccontextmanager
+from trading.sweep import MAX_SWEEP_CASES, run_sweep, sweep_cases
+from jobs import FINISHED, SUCCEEDED, JobManager
+from subsystems import Subsystems
+from tracing import render_metrics, trace_request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.encoders import jsonable_encoder
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from datetime import datetime, timedelta
-import secrets
 
 security = HTTPBearer()
 
-# Plaid configuration
-configuration = plaid.Configuration(
-    host=plaid.Environment.Sandbox,
-    api_key={
-        'clientId': os.getenv('PLAID_CLIENT_ID'),
-        'secret': os.getenv('PLAID_SECRET'),
-    }
-)
+# Heavy subsystems (lumibot, sklearn/xgboost, FinBERT, the Plaid SDK) are imported
+# and built on first use, so a worker only pays for the routes it actually serves
+def create_plaid_client():
+    from banking.plaid_client import get_plaid_client
+    return get_plaid_client()
+
+def create_trading_service():
+    from trading.service import TradingService
+    return TradingService()
+
+def create_ml_pipeline():
+    from mlPipeline import MLPipeline
+    return MLPipeline()
+
+def create_prediction_service():
+    from ml.serving import PredictionService
+    return PredictionService(subsystems.get("ml").registry)
+
+def create_transaction_sync():
+    from banking.transactions import PlaidAPI, TransactionSync
+    return TransactionSync(PlaidAPI(subsystems.get("plaid")))
 
-api_client = plaid.ApiClient(configuration)
-client = plaid_api.PlaidApi(api_client)
+def create_banking_aggregator():
+    from banking.aggregation import BankingAggregator
+    sync = subsystems.get("transactions")
+    return BankingAggregator(sync.api, sync)
+
+def create_spending_analytics():
+    from banking.analytics import SpendingAnalytics
+    return SpendingAnalytics(subsystems.get("transactions").store)
+
+def create_finbert():
+    from trading.finbert_utils import get_engine
+    return get_engine()
+
+subsystems = Subsystems()
+subsystems.register("trading", create_trading_service)
+subsystems.register("ml", create_ml_pipeline)
+subsystems.register("prediction", create_prediction_service)
+subsystems.register("finbert", create_finbert)
+subsystems.register("plaid", create_plaid_client)
+subsystems.register("transactions", create_transaction_sync)
+subsystems.register("banking", create_banking_aggregator)
+subsystems.register("analytics", create_spending_analytics)
 
 class StoreAccessTokenRequest(BaseModel):
     user_id: str
@@ -42,9 +69,26 @@ class StoreAccessTokenRequest(BaseModel):
     item_id: str
     institution_id: str
 
-app = FastAPI(title="Trading API", version="1.0.0")
-trading_service = TradingService()
-ml_pipeline = MLPipeline()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    subsystems.start_warmup()
+    yield
+
+app = FastAPI(title="Trading API", version="1.0.0", lifespan=lifespan)
+job_manager = JobManager()
+
+def run_backtest_job(params, progress):
+    return subsystems.get("trading").run_backtest(**params, progress=progress)
+
+def run_walk_forward_job(params, progress):
+    return subsystems.get("trading").run_walk_forward(**params, progress=progress)
+
+def train_model_job(params, progress):
+    return subsystems.get("ml").train_model(**params, progress=progress)
+
+job_manager.register("backtest", run_backtest_job)
+job_manager.register("walk_forward", run_walk_forward_job)
+job_manager.register("train", train_model_job)
 
 origins = [
     "http://localhost:3000",
@@ -57,14 +101,49 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Trace-Id", "X-Profile"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    return await trace_request(request, call_next)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics for this worker process"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # Trading Models
 class BacktestRequest(BaseModel):
     symbol: str = "SPY"
     start_date: str
     end_date: str
     cash_at_risk: float = 0.5
+    sentiment_mode: Literal["precompute", "live"] = "precompute"
+    sentiment_threshold: float = 0.999
+    engine: Literal["lumibot", "vectorized"] = "lumibot"
+
+class DateRange(BaseModel):
+    start_date: str
+    end_date: str
+
+class BacktestSweepRequest(BaseModel):
+    symbols: List[str] = ["SPY"]
+    date_ranges: List[DateRange]
+    cash_at_risk: List[float] = [0.5]
+    sentiment_thresholds: List[float] = [0.999]
+    sentiment_mode: Literal["precompute", "live"] = "precompute"
+    engine: Literal["lumibot", "vectorized"] = "lumibot"
+
+class WalkForwardRequest(BaseModel):
+    symbol: str = "SPY"
+    start_date: str
+    end_date: str
+    window_days: int = 90
+    step_days: int = 30
+    mode: Literal["rolling", "anchored"] = "rolling"
+    cash_at_risk: float = 0.5
+    sentiment_threshold: float = 0.999
 
 class BacktestResult(BaseModel):
     performance: dict
@@ -75,23 +154,48 @@ class TrainRequest(BaseModel):
     target_column: str
     test_size: float = 0.2
     random_state: int = 42
+    max_workers: Optional[int] = None
+    model_time_budget: Optional[float] = None
+    dataset_id: Optional[str] = None
+    user_id: str = "default"
+    search_mode: Literal["tournament", "halving"] = "tournament"
+    # Seconds for a halving search, including the final refit on all training rows
+    time_budget: Optional[float] = None
 
 class LinkTokenRequest(BaseModel):
     user_id: str
 
+def check_ids(**ids):
+    """Reject user/dataset/model ids that are not safe registry file names"""
+    from ml.registry import check_id
+    try:
+        for kind, value in ids.items():
+            if value is not None:
+                check_id(value, kind)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+BacktestFormat = Optional[Literal["json", "compact", "arrow"]]
+
+def backtest_response(result: dict, format: BacktestFormat, points: Optional[int], accept: Optional[str]):
+    """Encode a backtest result as requested: the plain JSON result, compact columnar JSON or Arrow IPC"""
+    from trading.payload import ARROW_MEDIA_TYPE, arrow_ipc, compact_json
+    if format is None and accept and ARROW_MEDIA_TYPE in accept:
+        format = "arrow"
+    if format == "arrow":
+        return Response(arrow_ipc(result, points), media_type=ARROW_MEDIA_TYPE)
+    if format == "compact":
+        return Response(compact_json(result, points), media_type="application/json")
+    return result
+
 @app.post("/api/trading/backtest")
-async def backtest(request: BacktestRequest):
-    """Main backtest endpoint"""
+async def backtest(request: BacktestRequest, http_request: Request, format: BacktestFormat = None,
+                   points: Optional[int] = None):
+    """Main backtest endpoint; ``format=compact|arrow`` and ``points`` (LTTB downsampling) shrink the payload"""
     try:
         print(f"Received backtest request: {request}")
-        results = trading_service.run_backtest(
-            request.symbol,
-            request.start_date,
-            request.end_date,
-            request.cash_at_risk
-        )
-        print("Sending to frontend:", results)
-        return results
+        result = await job_manager.run("backtest", request.model_dump())
+        return backtest_response(result, format, points, http_request.headers.get("accept"))
     except Exception as e:
         print(f"Backtest error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -101,13 +205,9 @@ async def debug_backtest(request: BacktestRequest):
     """Debug backtest endpoint with extra logging"""
     try:
         print(f"DEBUG: Received backtest request: {request}")
-        results = trading_service.run_backtest(
-            request.symbol,
-            request.start_date,
-            request.end_date,
-            request.cash_at_risk
-        )
-        print("DEBUG: Sending to frontend:", results)
+        results = await job_manager.run("backtest", request.model_dump())
+        print("DEBUG: Sending to frontend:", {key: len(value) if isinstance(value, (dict, list)) else value
+                                               for key, value in results.items()})
         return results
     except Exception as e:
         print(f"DEBUG: Backtest error: {str(e)}")
@@ -115,29 +215,147 @@ async def debug_backtest(request: BacktestRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
     
+@app.post("/api/trading/backtest_sweep")
+async def backtest_sweep(request: BacktestSweepRequest):
+    """Run a symbols x date ranges x cash_at_risk x threshold grid, streaming NDJSON results"""
+    cases = sweep_cases(
+        request.symbols,
+        [(r.start_date, r.end_date) for r in request.date_ranges],
+        request.cash_at_risk,
+        request.sentiment_thresholds,
+        request.sentiment_mode,
+        request.engine
+    )
+    if not cases:
+        raise HTTPException(status_code=400, detail="Sweep grid is empty")
+    if len(cases) > MAX_SWEEP_CASES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Sweep grid has {len(cases)} cases, the limit is {MAX_SWEEP_CASES}"
+        )
+    print(f"Received backtest sweep with {len(cases)} cases")
+
+    async def stream():
+        async for outcome in run_sweep(cases):
+            yield json.dumps(jsonable_encoder(outcome)) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+def check_walk_forward(request: WalkForwardRequest):
+    from trading.walk_forward import walk_forward_windows
+    try:
+        walk_forward_windows(datetime.strptime(request.start_date, "%Y-%m-%d"),
+                             datetime.strptime(request.end_date, "%Y-%m-%d"),
+                             request.window_days, request.step_days, request.mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/trading/walk_forward")
+async def walk_forward(request: WalkForwardRequest):
+    """Vectorized backtests over rolling or anchored windows, with per-window and aggregate statistics"""
+    check_walk_forward(request)
+    try:
+        print(f"Received walk-forward request: {request}")
+        return await job_manager.run("walk_forward", request.model_dump())
+    except Exception as e:
+        print(f"Walk-forward error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/trading/debug_last_result")
 async def debug_last_result():
     """Get the last backtest result for debugging"""
     try:
-        if hasattr(trading_service, 'last_results'):
-            return trading_service.last_results
+        job = job_manager.store.latest_result("backtest")
+        if job is not None:
+            return job["result"]
         return {"error": "No results available"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Background jobs
+
+@app.post("/api/jobs/backtest")
+async def submit_backtest_job(request: BacktestRequest):
+    """Queue a backtest and return its job id immediately"""
+    job_id = job_manager.submit("backtest", request.model_dump())
+    return job_manager.store.get(job_id)
+
+@app.post("/api/jobs/walk_forward")
+async def submit_walk_forward_job(request: WalkForwardRequest):
+    """Queue a walk-forward analysis and return its job id immediately"""
+    check_walk_forward(request)
+    job_id = job_manager.submit("walk_forward", request.model_dump())
+    return job_manager.store.get(job_id)
+
+@app.post("/api/jobs/train")
+async def submit_train_job(request: TrainRequest):
+    """Queue model training on the current dataset and return its job id immediately"""
+    check_ids(user_id=request.user_id, dataset_id=request.dataset_id)
+    job_id = job_manager.submit("train", request.model_dump())
+    return job_manager.store.get(job_id)
+
+@app.get("/api/jobs")
+async def list_jobs(kind: Optional[str] = None, status: Optional[str] = None, limit: int = 50):
+    return job_manager.store.list(kind=kind, status=status, limit=limit)
+
+@app.get("/api/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = job_manager.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/api/jobs/{job_id}/result")
+async def job_result(job_id: str, request: Request, format: BacktestFormat = None, points: Optional[int] = None):
+    job = job_manager.store.get(job_id, with_result=True)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] not in FINISHED:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    if job["status"] != SUCCEEDED:
+        raise HTTPException(status_code=422, detail=job["error"] or f"Job was {job['status']}")
+    if job["kind"] == "backtest":
+        return backtest_response(job["result"], format, points, request.headers.get("accept"))
+    return job["result"]
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "message": "Trading API is running"}
 
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness: 503 until every subsystem listed in WARMUP has loaded"""
+    status = subsystems.status()
+    if not subsystems.ready():
+        return JSONResponse(status_code=503, content={"status": "loading", "subsystems": status})
+    return {"status": "ready", "subsystems": status}
+
 
 # Plaid Implementation 
 
-def create_session_token(user_id: str):
-    return f"session_{secrets.token_hex(16)}_{user_id}"
+async def session_user(session_token: Optional[str] = Cookie(None)) -> str:
+    """The user behind the ``session_token`` cookie set when an item was linked"""
+    sync = await subsystems.aget("transactions")
+    user_id = await run_in_threadpool(sync.store.session_user, session_token)
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return user_id
 
 @app.post("/api/plaid/create_link_token")
 async def create_link_token(request: LinkTokenRequest):
+    from plaid.exceptions import ApiException
+    from plaid.model.country_code import CountryCode
+    from plaid.model.link_token_create_request import LinkTokenCreateRequest
+    from plaid.model.link_token_create_request_user import LinkTokenCreateRequestUser
+    from plaid.model.products import Products
     try:
         # Create properly typed lists
         country_codes = [CountryCode('US')]
@@ -150,7 +368,8 @@ async def create_link_token(request: LinkTokenRequest):
             country_codes=country_codes,
             language="en"
         )
-        response = client.link_token_create(link_request)
+        client = await subsystems.aget("plaid")
+        response = await run_in_threadpool(client.link_token_create, link_request)
         return {"link_token": response.link_token}
     except ApiException as e:
         body = e.body if hasattr(e, 'body') else str(e)
@@ -162,6 +381,8 @@ async def create_link_token(request: LinkTokenRequest):
 
 @app.post("/api/plaid/exchange_public_token")
 async def exchange_public_token(request: Request):
+    from plaid.exceptions import ApiException
+    from plaid.model.item_public_token_exchange_request import ItemPublicTokenExchangeRequest
     try:
         # Get raw request body to debug
         body_bytes = await request.body()
@@ -180,7 +401,8 @@ async def exchange_public_token(request: Request):
         exchange_request = ItemPublicTokenExchangeRequest(
             public_token=data['public_token']
         )
-        response = client.item_public_token_exchange(exchange_request)
+        client = await subsystems.aget("plaid")
+        response = await run_in_threadpool(client.item_public_token_exchange, exchange_request)
         
         return {
             "access_token": response.access_token,
@@ -205,38 +427,86 @@ async def exchange_public_token(request: Request):
             detail=jsonable_encoder({"error": "Internal server error"})
         )
 
+def transactions_window(start_date: Optional[str], end_date: Optional[str]):
+    """Default to the last 30 days, as the page has always shown"""
+    if start_date is None and end_date is None:
+        start_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+    return start_date, end_date
+
+async def read_transactions(item_ids: List[str], start_date, end_date, limit, offset, refresh):
+    sync = await subsystems.aget("transactions")
+    try:
+        await run_in_threadpool(sync.ensure_fresh, item_ids, refresh)
+    except Exception as e:
+        print(f"Transaction sync failed: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    start_date, end_date = transactions_window(start_date, end_date)
+    try:
+        return sync.store.query(item_ids, start_date, end_date, limit, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/api/plaid/transactions")
-async def get_transactions(access_token: str):
+async def get_transactions(access_token: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                           limit: int = 100, offset: int = 0, refresh: bool = False):
+    """One page of an item's transactions from the local store, synced from Plaid when stale"""
+    sync = await subsystems.aget("transactions")
+    # Only tokens linked through store_access_token are synced
+    item = sync.store.item_for_token(access_token)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Unknown access token")
+    return await read_transactions([item["item_id"]], start_date, end_date, limit, offset, refresh)
+
+@app.get("/api/banking/summary")
+async def banking_summary(user_id: str = Depends(session_user), recent: int = 10):
+    """Net worth, accounts and recent transactions across every linked item, fetched concurrently"""
+    aggregator = await subsystems.aget("banking")
+    return jsonable_encoder(await aggregator.summary(user_id, recent=recent))
+
+@app.get("/api/banking/analytics")
+async def spending_analytics(user_id: str = Depends(session_user), refresh: bool = False):
+    """Category/merchant rollups, rolling spend, recurring charges and anomalies from stored transactions"""
+    sync = await subsystems.aget("transactions")
+    analytics = await subsystems.aget("analytics")
+    item_ids = [item["item_id"] for item in sync.store.items_for_user(user_id)]
     try:
-        start_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-        end_date = datetime.now().strftime('%Y-%m-%d')
-        
-        request = TransactionsGetRequest(
-            access_token=access_token,
-            start_date=start_date,
-            end_date=end_date
-        )
-        response = client.transactions_get(request)
-        return response.to_dict()
-    except ApiException as e:
-        raise HTTPException(status_code=400, detail=e.body)
+        await run_in_threadpool(sync.ensure_fresh, item_ids, refresh)
+    except Exception as e:
+        print(f"Transaction sync failed: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    return await run_in_threadpool(analytics.summary, user_id)
+
+@app.get("/api/banking/transactions")
+async def user_transactions(user_id: str = Depends(session_user), start_date: Optional[str] = None, end_date: Optional[str] = None,
+                            limit: int = 100, offset: int = 0, refresh: bool = False):
+    """Transactions across all of a user's linked items, newest first"""
+    sync = await subsystems.aget("transactions")
+    item_ids = [item["item_id"] for item in sync.store.items_for_user(user_id)]
+    return await read_transactions(item_ids, start_date, end_date, limit, offset, refresh)
     
 @app.post("/api/plaid/store_access_token")
 async def store_access_token(
     request: StoreAccessTokenRequest,
-    response: Response
+    response: Response,
+    session_token: Optional[str] = Cookie(None)
 ):
     try:
-        # Store the access token (in a real app, save to database)
         print(f"Storing access token for user: {request.user_id}")
+        sync = await subsystems.aget("transactions")
+        # Plaid must confirm the token belongs to the item, and neither the user nor the item may be someone else's
+        await run_in_threadpool(sync.link_item, request.item_id, request.access_token, request.user_id,
+                                request.institution_id, sync.store.session_user(session_token))
+        # Initial sync in the background, so the first page load is usually local
+        sync.schedule(request.item_id)
         
         # Create and set session cookie
-        session_token = create_session_token(request.user_id)
+        from banking.transactions import SESSION_TTL
+        session_token = sync.store.create_session(request.user_id, SESSION_TTL)
         response.set_cookie(
             key="session_token",
             value=session_token,
             httponly=True,
-            max_age=3600,  # 1 hour expiration
+            max_age=SESSION_TTL,
             secure=False,  # Set to True in production with HTTPS
             samesite="lax"
         )
@@ -247,6 +517,12 @@ async def store_access_token(
             "user_id": request.user_id
         }
         
+    except PermissionError as e:
+        print(f"Refused access token for user {request.user_id}: {e}")
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        print(f"Refused access token for user {request.user_id}: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error storing access token: {str(e)}")
         raise HTTPException(
@@ -260,20 +536,52 @@ async def check_auth():
 
 
 @app.post("/upload-dataset")
-async def upload_dataset(file: UploadFile = File(...)):
-    return await ml_pipeline.upload_dataset(file)
+async def upload_dataset(file: UploadFile = File(...), user_id: str = "default", exact_profile: bool = False,
+                         out_of_core: bool = False):
+    check_ids(user_id=user_id)
+    ml_pipeline = await subsystems.aget("ml")
+    return await ml_pipeline.upload_dataset(file, user_id, exact_profile, out_of_core)
+
+@app.get("/datasets")
+async def list_datasets(user_id: str = "default"):
+    check_ids(user_id=user_id)
+    ml_pipeline = await subsystems.aget("ml")
+    return {"datasets": ml_pipeline.registry.list_datasets(user_id)}
 
 @app.post("/train-model")
 async def train_model(request: TrainRequest):
-    return await ml_pipeline.train_model(
-        target_column=request.target_column,
-        test_size=request.test_size,
-        random_state=request.random_state
-    )
+    check_ids(user_id=request.user_id, dataset_id=request.dataset_id)
+    return await job_manager.run("train", request.model_dump())
 
 @app.get("/download-model")
-async def download_model():
-    return await ml_pipeline.download_model()
+async def download_model(request: Request, model_id: Optional[str] = None, user_id: str = "default"):
+    check_ids(user_id=user_id, model_id=model_id)
+    ml_pipeline = await subsystems.aget("ml")
+    return await ml_pipeline.download_model(model_id, user_id, request.headers.get("if-none-match"))
+
+@app.post("/predict")
+async def predict(request: Request, model_id: Optional[str] = None, user_id: str = "default",
+                  proba: bool = False, output: Literal["ndjson", "csv"] = "ndjson"):
+    """Score rows (JSON, CSV, Arrow IPC or Parquet body) with a trained model, streaming the results"""
+    from ml.serving import parse_rows, render
+    check_ids(user_id=user_id, model_id=model_id)
+    ml_pipeline = await subsystems.aget("ml")
+    model_id = model_id or ml_pipeline.registry.latest_model_id(user_id)
+    if model_id is None:
+        raise HTTPException(status_code=404, detail="No trained model available")
+    try:
+        prediction_service = await subsystems.aget("prediction")
+        frame = parse_rows(await request.body(), request.headers.get("content-type"))
+        predictions, probabilities, classes = await prediction_service.score(model_id, user_id, frame, proba)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        render(predictions, probabilities, classes, output),
+        media_type="text/csv" if output == "csv" else "application/x-ndjson",
+        headers={"X-Model-Id": model_id}
+    )
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
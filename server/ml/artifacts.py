@@ -0,0 +1,82 @@
+import hashlib
+import os
+import time
+import uuid
+from typing import Iterable, Optional
+import joblib
+
+ARTIFACT_DIR = os.getenv("ML_ARTIFACT_DIR", os.path.join("cache", "artifacts"))
+# joblib compression level (0 disables); 3 is a good size/speed trade-off for forests
+ARTIFACT_COMPRESS = int(os.getenv("ML_ARTIFACT_COMPRESS", "0"))
+# Unreferenced artifacts younger than this are kept, so an upload in flight is never collected
+ARTIFACT_GRACE_SECONDS = float(os.getenv("ML_ARTIFACT_GRACE_SECONDS", "3600"))
+
+CHUNK_BYTES = 1024 * 1024
+
+
+class ArtifactStore:
+    """Content-addressed store for serialized pipelines.
+
+    Each pipeline is serialized once and saved under the SHA-256 of its bytes, so
+    identical pipelines share a file and the digest doubles as a strong ETag.
+    """
+
+    def __init__(self, directory: str = ARTIFACT_DIR, compress: int = ARTIFACT_COMPRESS,
+                 grace_seconds: float = ARTIFACT_GRACE_SECONDS):
+        self.directory = directory
+        self.compress = compress
+        self.grace_seconds = grace_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{digest}.joblib")
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def put(self, obj) -> str:
+        """Serialize ``obj`` and return the digest it is stored under"""
+        tmp = os.path.join(self.directory, f"{uuid.uuid4().hex}.tmp")
+        try:
+            joblib.dump(obj, tmp, compress=self.compress)
+            digest = hashlib.sha256()
+            with open(tmp, "rb") as f:
+                for block in iter(lambda: f.read(CHUNK_BYTES), b""):
+                    digest.update(block)
+            digest = digest.hexdigest()
+            if self.exists(digest):
+                # Same bytes already stored; refresh the mtime so collection treats it as new
+                os.remove(tmp)
+                os.utime(self.path(digest))
+            else:
+                os.replace(tmp, self.path(digest))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return digest
+
+    def load(self, digest: str):
+        return joblib.load(self.path(digest))
+
+    def size(self, digest: str) -> int:
+        return os.path.getsize(self.path(digest))
+
+    def collect(self, referenced: Iterable[str], now: Optional[float] = None) -> int:
+        """Delete artifacts (and abandoned temp files) no model refers to; returns the count"""
+        now = time.time() if now is None else now
+        keep = set(referenced)
+        removed = 0
+        for name in os.listdir(self.directory):
+            digest, ext = os.path.splitext(name)
+            if ext not in (".joblib", ".tmp") or digest in keep:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.path.getmtime(path) < self.grace_seconds:
+                    continue
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
@@ -0,0 +1,326 @@
+import os
+import shutil
+import tempfile
+from typing import Callable, Dict, Iterator, Tuple
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from scipy import sparse
+from sklearn.base import BaseEstimator, RegressorMixin, TransformerMixin
+from sklearn.linear_model import SGDClassifier, SGDRegressor
+from sklearn.pipeline import Pipeline
+from tracing import span
+
+OOC_EPOCHS = int(os.getenv("ML_OOC_EPOCHS", "3"))
+OOC_BOOST_ROUNDS = int(os.getenv("ML_OOC_BOOST_ROUNDS", "200"))
+# Only the most frequent categories per column get a one-hot column
+MAX_CATEGORIES = int(os.getenv("ML_OOC_MAX_CATEGORIES", "100"))
+# Same rule as train_model: text targets, or fewer distinct values than this, are classes
+CLASS_LIMIT = 10
+
+
+class StreamingPreprocessor(BaseEstimator, TransformerMixin):
+    """StandardScaler + OneHotEncoder(handle_unknown='ignore') fitted chunk by chunk.
+
+    ``partial_fit`` merges per-chunk means and variances (Chan et al.) and category
+    counts, so the statistics match a single fit over the whole data. ``transform``
+    returns a CSR matrix: scaled numeric columns followed by the one-hot columns.
+    """
+
+    def __init__(self, numeric_features=(), categorical_features=(), max_categories: int = MAX_CATEGORIES):
+        self.numeric_features = numeric_features
+        self.categorical_features = categorical_features
+        self.max_categories = max_categories
+
+    def _reset(self):
+        self.n_samples_seen_ = 0
+        self.mean_ = np.zeros(len(self.numeric_features))
+        self.var_ = np.zeros(len(self.numeric_features))
+        self.category_counts_ = [{} for _ in self.categorical_features]
+
+    def fit(self, X, y=None):
+        self._reset()
+        return self.partial_fit(X)
+
+    def partial_fit(self, X, y=None):
+        if not hasattr(self, "n_samples_seen_"):
+            self._reset()
+        n = len(X)
+        if n == 0:
+            return self
+        if len(self.numeric_features):
+            block = X[list(self.numeric_features)].to_numpy(dtype=np.float64)
+            seen = self.n_samples_seen_
+            total = seen + n
+            batch_mean = block.mean(axis=0)
+            batch_m2 = ((block - batch_mean) ** 2).sum(axis=0)
+            delta = batch_mean - self.mean_
+            m2 = self.var_ * seen + batch_m2 + delta ** 2 * seen * n / total
+            self.mean_ = self.mean_ + delta * n / total
+            self.var_ = m2 / total
+        for counts, col in zip(self.category_counts_, self.categorical_features):
+            for value, count in X[col].astype(str).value_counts().items():
+                counts[value] = counts.get(value, 0) + int(count)
+        self.n_samples_seen_ += n
+        self.scale_ = np.where(self.var_ > 0, np.sqrt(self.var_), 1.0)
+        self.categories_ = [
+            sorted(sorted(counts, key=counts.get, reverse=True)[:self.max_categories])
+            for counts in self.category_counts_
+        ]
+        return self
+
+    def transform(self, X):
+        parts = []
+        if len(self.numeric_features):
+            block = X[list(self.numeric_features)].to_numpy(dtype=np.float64)
+            parts.append(sparse.csr_matrix((block - self.mean_) / self.scale_))
+        for col, categories in zip(self.categorical_features, self.categories_):
+            codes = pd.Categorical(X[col].astype(str), categories=categories).codes
+            rows = np.flatnonzero(codes >= 0)
+            parts.append(sparse.csr_matrix(
+                (np.ones(len(rows)), (rows, codes[rows])), shape=(len(X), len(categories))
+            ))
+        return sparse.hstack(parts, format="csr") if parts else sparse.csr_matrix((len(X), 0))
+
+    def get_feature_names_out(self, input_features=None):
+        names = list(self.numeric_features)
+        for col, categories in zip(self.categorical_features, self.categories_):
+            names.extend(f"{col}_{category}" for category in categories)
+        return np.asarray(names, dtype=object)
+
+
+class ScaledSGDRegressor(BaseEstimator, RegressorMixin):
+    """SGDRegressor trained on a standardized target and predicting in original units"""
+
+    def __init__(self, target_mean: float = 0.0, target_scale: float = 1.0, random_state: int = 42):
+        self.target_mean = target_mean
+        self.target_scale = target_scale
+        self.random_state = random_state
+
+    def partial_fit(self, X, y):
+        if not hasattr(self, "estimator_"):
+            self.estimator_ = SGDRegressor(random_state=self.random_state)
+        self.estimator_.partial_fit(X, (np.asarray(y, dtype=np.float64) - self.target_mean) / self.target_scale)
+        return self
+
+    def fit(self, X, y):
+        self.estimator_ = SGDRegressor(random_state=self.random_state)
+        return self.partial_fit(X, y)
+
+    def predict(self, X):
+        return self.estimator_.predict(X) * self.target_scale + self.target_mean
+
+
+class BoosterModel(BaseEstimator):
+    """Estimator around an XGBoost Booster, so a streamed booster fits in a Pipeline.
+
+    With ``classes`` it is a classifier whose labels are encoded as positions in
+    ``classes``; without, a regressor.
+    """
+
+    def __init__(self, params: Dict = None, num_boost_round: int = OOC_BOOST_ROUNDS, classes=None):
+        self.params = params
+        self.num_boost_round = num_boost_round
+        self.classes = classes
+
+    def booster_params(self) -> Dict:
+        params = {"tree_method": "hist", **(self.params or {})}
+        if self.classes is None:
+            params.setdefault("objective", "reg:squarederror")
+        elif len(self.classes) > 2:
+            params.setdefault("objective", "multi:softprob")
+            params["num_class"] = len(self.classes)
+        else:
+            params.setdefault("objective", "binary:logistic")
+        return params
+
+    def encode(self, y) -> np.ndarray:
+        if self.classes is None:
+            return np.asarray(y, dtype=np.float64)
+        return pd.Index(self.classes).get_indexer(y)
+
+    def fit(self, X, y):
+        return self.fit_dmatrix(xgb.DMatrix(X, label=self.encode(y)))
+
+    def fit_dmatrix(self, dtrain):
+        self.booster_ = xgb.train(self.booster_params(), dtrain, num_boost_round=self.num_boost_round)
+        if self.classes is not None:
+            self.classes_ = np.asarray(self.classes)
+        return self
+
+    def predict_proba(self, X):
+        raw = self.booster_.predict(xgb.DMatrix(X))
+        return np.column_stack([1 - raw, raw]) if raw.ndim == 1 else raw
+
+    def predict(self, X):
+        if self.classes is None:
+            return self.booster_.predict(xgb.DMatrix(X))
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+class _BatchIter(xgb.DataIter):
+    """Feeds preprocessed training chunks to XGBoost's external-memory DMatrix"""
+
+    def __init__(self, make_batches: Callable[[], Iterator[Tuple]], cache_prefix: str):
+        self._make_batches = make_batches
+        self._batches = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> bool:
+        if self._batches is None:
+            self._batches = self._make_batches()
+        try:
+            X, y = next(self._batches)
+        except StopIteration:
+            return False
+        input_data(data=X, label=y)
+        return True
+
+    def reset(self):
+        self._batches = None
+
+
+def train_streaming(batches: Callable[[], Iterator[pd.DataFrame]], target_column: str, test_size: float = 0.2,
+                    random_state: int = 42, epochs: int = OOC_EPOCHS, boost_rounds: int = OOC_BOOST_ROUNDS,
+                    workdir: str = None, progress=None):
+    """Train on a dataset too large for memory, reading it chunk by chunk.
+
+    ``batches()`` must return a fresh iterator over the dataset's chunks on every call.
+    Rows are assigned to the test split by a seeded draw per chunk, so every pass
+    sees the same split. The passes are: preprocessing and target statistics, SGD
+    epochs, XGBoost's external-memory build and boosting, and one evaluation pass
+    scoring both candidates. Returns ``(pipelines, results, info)`` where ``results``
+    holds accuracy (classification) or MSE (regression) per candidate.
+    """
+    progress = progress or (lambda fraction, message=None: None)
+    total_passes = 3 + epochs
+
+    def split(chunks: Iterator[pd.DataFrame], test: bool) -> Iterator[pd.DataFrame]:
+        for i, chunk in enumerate(chunks):
+            draw = np.random.default_rng([random_state, i]).random(len(chunk))
+            yield chunk[(draw < test_size) == test]
+
+    # Pass 1: preprocessing statistics and the shape of the target
+    first = next(batches(), None)
+    if first is None or target_column not in first.columns:
+        raise ValueError(f"Target column '{target_column}' not found in dataset.")
+    features = first.drop(columns=[target_column])
+    numeric_features = features.select_dtypes(include=["number"]).columns.tolist()
+    categorical_features = [col for col in features.columns if col not in numeric_features]
+    preprocessor = StreamingPreprocessor(numeric_features, categorical_features)
+
+    text_target = not pd.api.types.is_numeric_dtype(first[target_column])
+    labels, n_train, y_sum, y_sq = set(), 0, 0.0, 0.0
+    for chunk in split(batches(), test=False):
+        preprocessor.partial_fit(chunk.drop(columns=[target_column]))
+        y = chunk[target_column]
+        if text_target or len(labels) < CLASS_LIMIT:
+            labels.update(y.unique().tolist())
+        if not text_target:
+            values = y.to_numpy(dtype=np.float64)
+            y_sum += values.sum()
+            y_sq += (values ** 2).sum()
+        n_train += len(chunk)
+    if n_train == 0:
+        raise ValueError("No training rows after the split.")
+    progress(1 / total_passes, "Preprocessing statistics computed")
+
+    is_classification = text_target or len(labels) < CLASS_LIMIT
+    classes = None
+    if is_classification:
+        classes = sorted(labels)
+        # Numeric CSV columns are stored as floats; keep whole-number labels as ints
+        if not text_target and all(float(label).is_integer() for label in classes):
+            classes = [int(label) for label in classes]
+
+    def target(y: pd.Series) -> np.ndarray:
+        if is_classification and not text_target:
+            return y.to_numpy().astype(type(classes[0]))
+        return y.to_numpy()
+
+    def training_batches(shuffle_seed: int = None) -> Iterator[Tuple]:
+        for i, chunk in enumerate(split(batches(), test=False)):
+            if shuffle_seed is not None:
+                chunk = chunk.iloc[np.random.default_rng([shuffle_seed, i]).permutation(len(chunk))]
+            yield preprocessor.transform(chunk.drop(columns=[target_column])), target(chunk[target_column])
+
+    # SGD epochs, each over freshly shuffled chunks
+    if is_classification:
+        linear = SGDClassifier(loss="log_loss", random_state=random_state)
+    else:
+        mean = y_sum / n_train
+        scale = np.sqrt(max(y_sq / n_train - mean ** 2, 0.0)) or 1.0
+        linear = ScaledSGDRegressor(mean, scale, random_state=random_state)
+    for epoch in range(epochs):
+        with span("model_fit", "SGD"):
+            for X, y in training_batches(shuffle_seed=random_state + epoch):
+                if is_classification:
+                    linear.partial_fit(X, y, classes=classes)
+                else:
+                    linear.partial_fit(X, y)
+        progress((2 + epoch) / total_passes, f"SGD epoch {epoch + 1}/{epochs}")
+
+    # XGBoost over an external-memory quantile DMatrix, paged through a disk cache
+    booster = BoosterModel(
+        params={"seed": random_state, "max_depth": 6, "eta": 0.1},
+        num_boost_round=boost_rounds,
+        classes=classes
+    )
+    cache_dir = tempfile.mkdtemp(prefix="xgb-", dir=workdir)
+    try:
+        batches_iter = _BatchIter(
+            lambda: ((X, booster.encode(y)) for X, y in training_batches()),
+            cache_prefix=os.path.join(cache_dir, "cache")
+        )
+        with span("model_fit", "XGBoost"):
+            booster.fit_dmatrix(xgb.ExtMemQuantileDMatrix(batches_iter))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    progress((2 + epochs) / total_passes, "XGBoost trained")
+
+    pipelines = {
+        "SGD": Pipeline([("preprocessor", preprocessor), ("model", linear)]),
+        "XGBoost": Pipeline([("preprocessor", preprocessor), ("model", booster)]),
+    }
+
+    # Evaluation pass over the held-out rows, accumulating metrics per candidate
+    n_test, sums = 0, {name: [0.0, 0.0, 0.0] for name in pipelines}
+    for chunk in split(batches(), test=True):
+        if not len(chunk):
+            continue
+        X = preprocessor.transform(chunk.drop(columns=[target_column]))
+        y = target(chunk[target_column])
+        n_test += len(chunk)
+        for name, pipeline in pipelines.items():
+            y_pred = pipeline.named_steps["model"].predict(X)
+            if is_classification:
+                sums[name][0] += float((y_pred == y).sum())
+            else:
+                sums[name][0] += float(((y_pred - y) ** 2).sum())
+                sums[name][1] += float(y.sum())
+                sums[name][2] += float((y.astype(np.float64) ** 2).sum())
+    if n_test == 0:
+        raise ValueError("No test rows after the split; increase test_size.")
+    progress(1.0, "Evaluation finished")
+
+    results, metrics = {}, {}
+    for name, (error, y_total, y_squares) in sums.items():
+        if is_classification:
+            # For classifiers the first sum counts correct predictions
+            results[name] = error / n_test
+            metrics[name] = {"accuracy": results[name]}
+        else:
+            total_variance = y_squares - y_total ** 2 / n_test
+            results[name] = error / n_test
+            metrics[name] = {"mse": results[name], "r2": 1 - error / total_variance if total_variance > 0 else 0.0}
+
+    info = {
+        "is_classification": is_classification,
+        "feature_columns": features.columns.tolist(),
+        "numeric_features": numeric_features,
+        "categorical_features": categorical_features,
+        "train_rows": n_train,
+        "test_rows": n_test,
+        "metrics": metrics,
+    }
+    return pipelines, results, info
@@ -0,0 +1,108 @@
+import os
+from typing import BinaryIO, Dict, Iterator, List, Tuple
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+MISSING_VALUES = ['.', ' ', 'NA', 'N/A', 'NaN', 'NULL', '?', '..']
+CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", "100000"))
+# Strings become categoricals when distinct values are at most this share of the rows
+CATEGORY_RATIO = 0.5
+
+
+def compact_chunk(chunk: pd.DataFrame, category_ratio: float = CATEGORY_RATIO) -> pd.DataFrame:
+    """Downcast numeric columns and turn low-cardinality strings into categoricals"""
+    for col in chunk.columns:
+        series = chunk[col]
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            chunk[col] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series):
+            # Only keep float32 when it round-trips exactly, so values are unchanged
+            narrow = series.astype(np.float32)
+            if np.array_equal(narrow.to_numpy(dtype=np.float64), series.to_numpy(dtype=np.float64)):
+                chunk[col] = narrow
+        elif pd.api.types.is_object_dtype(series) and len(series):
+            if series.nunique() <= category_ratio * len(series):
+                chunk[col] = series.astype("category")
+    return chunk
+
+
+def _combine(parts: List[pd.DataFrame], columns) -> pd.DataFrame:
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    combined: Dict[str, pd.Series] = {}
+    for col in columns:
+        pieces = [part[col] for part in parts]
+        kinds = {
+            "category" if isinstance(piece.dtype, pd.CategoricalDtype)
+            else "bool" if pd.api.types.is_bool_dtype(piece)
+            else "number" if pd.api.types.is_numeric_dtype(piece)
+            else "other"
+            for piece in pieces
+        }
+        if kinds == {"category"}:
+            combined[col] = pd.Series(union_categoricals(pieces), name=col)
+        elif len(kinds) == 1:
+            combined[col] = pd.concat(pieces, ignore_index=True)
+        elif "number" in kinds:
+            # Numbers in some chunks and text in others: the column becomes text, as a single parse
+            # would make it, but numbers are written the way Python formats them ("1.0", not "1")
+            # rather than as they appeared in the file. Missing values stay missing, not "nan".
+            combined[col] = pd.concat([piece.astype(str).where(piece.notna()) for piece in pieces],
+                                      ignore_index=True)
+        else:
+            combined[col] = pd.concat([piece.astype(object) for piece in pieces], ignore_index=True)
+    return pd.DataFrame(combined, columns=columns)
+
+
+def read_csv_chunks(source: BinaryIO, chunk_rows: int = CHUNK_ROWS) -> Tuple[pd.DataFrame, int]:
+    """Parse a CSV in chunks, cleaning and compacting each chunk as it is read.
+
+    Placeholder values are treated as missing while parsing and rows with any missing
+    value are dropped per chunk, so only cleaned, downcast chunks are held in memory.
+    Returns the cleaned frame and the number of rows before cleaning.
+    """
+    parts = []
+    columns = None
+    original_rows = 0
+    for chunk in pd.read_csv(source, chunksize=chunk_rows, na_values=MISSING_VALUES, encoding="utf-8"):
+        columns = chunk.columns if columns is None else columns
+        original_rows += len(chunk)
+        text_cols = chunk.select_dtypes(include=["object"]).columns
+        if len(text_cols):
+            chunk[text_cols] = chunk[text_cols].replace(MISSING_VALUES, np.nan)
+        chunk = chunk.dropna()
+        if len(chunk):
+            parts.append(compact_chunk(chunk))
+    return _combine(parts, columns if columns is not None else []), original_rows
+
+
+def iter_csv_chunks(source: BinaryIO, chunk_rows: int = CHUNK_ROWS) -> Iterator[Tuple[pd.DataFrame, int]]:
+    """Yield cleaned chunks with one fixed dtype per column, for writing straight to disk.
+
+    Column kinds are taken from the first chunk: numeric (and boolean) columns become
+    float64 and everything else text, so every chunk shares one schema. Values that
+    do not fit a column's kind count as missing, and rows with missing values are
+    dropped. Each item is ``(chunk, rows read before cleaning)``.
+    """
+    numeric = None
+    for chunk in pd.read_csv(source, chunksize=chunk_rows, na_values=MISSING_VALUES, encoding="utf-8"):
+        raw_rows = len(chunk)
+        if numeric is None:
+            numeric = {
+                col: pd.api.types.is_numeric_dtype(chunk[col]) or pd.api.types.is_bool_dtype(chunk[col])
+                for col in chunk.columns
+            }
+        for col, is_numeric in numeric.items():
+            series = chunk[col]
+            if is_numeric:
+                chunk[col] = pd.to_numeric(series, errors="coerce").astype("float64")
+            else:
+                chunk[col] = series.where(~series.isin(MISSING_VALUES)).astype(object)
+        chunk = chunk.dropna()
+        for col, is_numeric in numeric.items():
+            if not is_numeric:
+                chunk[col] = chunk[col].astype(str)
+        yield chunk, raw_rows
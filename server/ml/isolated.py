@@ -0,0 +1,113 @@
+import importlib
+import multiprocessing
+import os
+import threading
+import time
+from typing import List, Tuple
+import joblib
+
+POLL_SECONDS = 0.5
+# Fit processes kept alive between tournaments, so the next fit skips process start and imports
+MAX_IDLE_WORKERS = int(os.getenv("ML_FIT_IDLE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# The tournament's model libraries, imported as a worker starts instead of on its first fit
+PRELOAD_MODULES = ("sklearn.ensemble", "sklearn.linear_model", "sklearn.svm", "xgboost")
+
+_idle: List["FitWorker"] = []
+_idle_lock = threading.Lock()
+
+
+def _serve(conn):
+    """Child process loop: fit each ``(model, data_path)`` received on the memory-mapped matrices"""
+    for module in PRELOAD_MODULES:
+        importlib.import_module(module)
+    while True:
+        try:
+            model, data_path = conn.recv()
+        except EOFError:
+            return
+        try:
+            Xt_train, y_train, Xt_test = joblib.load(data_path, mmap_mode="r")
+            model.fit(Xt_train, y_train)
+            outcome = (None, model, model.predict(Xt_test))
+        except Exception as e:
+            outcome = (str(e), None, None)
+        Xt_train = y_train = Xt_test = None
+        conn.send(outcome)
+
+
+class FitWorker:
+    """A spawned process that fits the models sent to it; killed when a fit has to be stopped"""
+
+    def __init__(self):
+        # spawn so the child never inherits a forked copy of torch's thread pools
+        context = multiprocessing.get_context("spawn")
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def kill(self):
+        self.conn.close()
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+
+
+def _acquire() -> FitWorker:
+    with _idle_lock:
+        while _idle:
+            worker = _idle.pop()
+            if worker.process.is_alive():
+                return worker
+            worker.kill()
+    return FitWorker()
+
+
+def _release(worker: FitWorker):
+    with _idle_lock:
+        if len(_idle) < MAX_IDLE_WORKERS:
+            _idle.append(worker)
+            return
+    worker.kill()
+
+
+def prestart():
+    """Start the idle workers ahead of the first fit; they load in the background"""
+    with _idle_lock:
+        missing = MAX_IDLE_WORKERS - len(_idle)
+    for _ in range(missing):
+        _release(FitWorker())
+
+
+def dump_matrices(data_path: str, Xt_train, y_train, Xt_test):
+    """Write the matrices once, so every fit process memory-maps them instead of receiving a copy"""
+    joblib.dump((Xt_train, y_train, Xt_test), data_path)
+
+
+def fit_isolated(model, data_path: str, time_budget: float, stop: threading.Event) -> Tuple[object, object]:
+    """Fit ``model`` in a worker process that is killed once ``time_budget`` seconds pass or ``stop`` is set.
+
+    Unlike a thread, a fit that runs over its budget is really stopped, so it never
+    keeps a core busy behind later requests. Returns ``(model, y_pred)``; raises
+    ``TimeoutError`` over budget and ``RuntimeError`` for a failed or stopped fit.
+    """
+    worker = _acquire()
+    deadline = time.monotonic() + time_budget
+    try:
+        worker.conn.send((model, data_path))
+        while not worker.conn.poll(POLL_SECONDS):
+            if stop.is_set():
+                raise RuntimeError("Training was stopped")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Exceeded time budget of {time_budget:.0f}s")
+        error, fitted, y_pred = worker.conn.recv()
+    except (EOFError, ConnectionError):
+        worker.kill()
+        raise RuntimeError(f"The fit process exited with code {worker.process.exitcode}")
+    except BaseException:
+        worker.kill()
+        raise
+    _release(worker)
+    if error is not None:
+        raise RuntimeError(error)
+    return fitted, y_pred
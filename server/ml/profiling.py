@@ -0,0 +1,186 @@
+import os
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+PROFILE_SAMPLE_ROWS = int(os.getenv("PROFILE_SAMPLE_ROWS", "200000"))
+QUANTILES = (0.25, 0.50, 0.75)
+
+
+def highly_correlated_pairs(corr_matrix: Optional[pd.DataFrame], threshold: float = 0.7) -> Optional[List[dict]]:
+    """Identify highly correlated variable pairs"""
+    if corr_matrix is None:
+        return None
+
+    corr_pairs = corr_matrix.abs().stack()
+    pairs = corr_pairs[corr_pairs > threshold].reset_index()
+    pairs = pairs[pairs['level_0'] != pairs['level_1']]  # Remove diagonal
+
+    if len(pairs) > 0:
+        pairs.columns = ['variable1', 'variable2', 'correlation']
+        return pairs.sort_values('correlation', ascending=False).to_dict('records')
+    return None
+
+
+def numeric_summary(block: np.ndarray) -> Dict[str, np.ndarray]:
+    """Column statistics for a 2-D float array in one sort plus one reduction pass.
+
+    NaNs sort to the end of each column, so with ``k`` non-missing values per column
+    the minimum, maximum, quantiles and distinct count all come from the sorted block.
+    """
+    n = block.shape[0]
+    present = n - np.isnan(block).sum(axis=0)
+    ordered = np.sort(block, axis=0)
+    columns = np.arange(block.shape[1])
+    last = np.maximum(present - 1, 0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.nansum(block, axis=0) / present
+        std = np.sqrt(np.nansum((block - mean) ** 2, axis=0) / (present - 1))
+
+        quantiles = {}
+        for q in QUANTILES:
+            # Linear interpolation, the pandas/NumPy default
+            position = q * last
+            lower = np.floor(position).astype(np.int64)
+            upper = np.minimum(lower + 1, last)
+            fraction = position - lower
+            low_values = ordered[lower, columns]
+            high_values = ordered[upper, columns]
+            quantiles[q] = low_values + (high_values - low_values) * fraction
+
+    if n > 1:
+        changes = np.diff(ordered, axis=0) != 0
+        inside = np.arange(n - 1)[:, None] < last[None, :]
+        unique = (changes & inside).sum(axis=0) + (present > 0)
+    else:
+        unique = (present > 0).astype(np.int64)
+
+    empty = present == 0
+    return {
+        "mean": np.where(empty, np.nan, mean),
+        "std": np.where(present > 1, std, np.nan),
+        "min": np.where(empty, np.nan, ordered[0]),
+        "max": np.where(empty, np.nan, ordered[last, columns]),
+        "quantiles": {q: np.where(empty, np.nan, values) for q, values in quantiles.items()},
+        "unique": unique,
+    }
+
+
+def correlation(frame: pd.DataFrame, block: np.ndarray) -> pd.DataFrame:
+    """Pearson correlation; a single matrix product when there are no missing values"""
+    if np.isnan(block).any():
+        return frame.corr()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        matrix = np.corrcoef(block, rowvar=False)
+    return pd.DataFrame(np.clip(matrix, -1, 1), index=frame.columns, columns=frame.columns)
+
+
+def _sample_values(series: pd.Series) -> list:
+    head = series.iloc[:64].dropna()
+    if len(head) < 3 and len(series) > 64:
+        head = series.dropna()
+    return head.head(3).tolist()
+
+
+def _is_categorical(series: pd.Series) -> bool:
+    return pd.api.types.is_string_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype)
+
+
+def profile_frame(df: pd.DataFrame, exact: bool = False, sample_rows: int = PROFILE_SAMPLE_ROWS) -> dict:
+    """Generate comprehensive data profile.
+
+    Numeric statistics are computed together over the numeric block and each text
+    column is counted once. Frames longer than ``sample_rows`` are profiled on a
+    fixed random sample unless ``exact`` is set; row, missing and duplicate counts
+    always use the full frame.
+    """
+    sampled = not exact and len(df) > sample_rows
+    view = df.sample(n=sample_rows, random_state=0) if sampled else df
+
+    # Booleans get summary statistics as 0/1 floats but, as before, stay out of the correlation matrix
+    numeric_cols = df.select_dtypes(include=['number', 'bool']).columns
+    summary = None
+    if len(numeric_cols):
+        block = view[numeric_cols].to_numpy(dtype=np.float64, na_value=np.nan)
+        summary = numeric_summary(block)
+    corr_positions = [i for i, col in enumerate(numeric_cols) if not pd.api.types.is_bool_dtype(df[col])]
+    corr_cols = numeric_cols[corr_positions]
+    corr_matrix = correlation(view[corr_cols], block[:, corr_positions]).round(2) if len(corr_cols) > 1 else None
+
+    missing = df.isna().sum()
+    numeric_index = {col: i for i, col in enumerate(numeric_cols)}
+
+    columns = {}
+    for col in df.columns:
+        series = view[col]
+        entry = {
+            "type": str(df[col].dtype),
+            "missing": int(missing[col]),
+        }
+        stats = {}
+        distribution = None
+
+        if col in numeric_index:
+            i = numeric_index[col]
+            entry["unique"] = int(summary["unique"][i])
+            col_min, col_max = summary["min"][i], summary["max"][i]
+            stats = {
+                "mean": float(summary["mean"][i]),
+                "min": float(col_min),
+                "max": float(col_max),
+                "std": float(summary["std"][i]),
+                "quantiles": {
+                    f"{int(q * 100)}%": float(summary["quantiles"][q][i]) for q in QUANTILES
+                }
+            }
+            bins = np.linspace(
+                int(col_min),
+                int(col_max) + (0 if float(col_max).is_integer() else 1),
+                10,
+                dtype=int
+            )
+            values = block[:, i]
+            distribution = {
+                "bins": bins.tolist(),
+                "counts": np.histogram(values[~np.isnan(values)], bins=bins)[0].tolist()
+            }
+        elif _is_categorical(series):
+            counts = series.value_counts()
+            entry["unique"] = int((counts > 0).sum())
+            top = counts.head(10)
+            stats = {
+                "value_counts": top.to_dict(),
+                "top_values": counts.head(3).to_dict()
+            }
+            distribution = {
+                "categories": top.index.tolist(),
+                "counts": top.values.tolist()
+            }
+        else:
+            entry["unique"] = int(series.nunique())
+
+        entry["stats"] = stats
+        entry["sample_values"] = _sample_values(df[col])
+        if distribution is not None:
+            entry["distribution"] = distribution
+        columns[col] = entry
+
+    overview = {
+        "rows": len(df),
+        "columns": len(df.columns),
+        "missing_values": int(missing.sum()),
+        "duplicate_rows": int(df.duplicated().sum())
+    }
+    if sampled:
+        overview["sampled_rows"] = len(view)
+
+    return {
+        "overview": overview,
+        "columns": columns,
+        "correlation": {
+            "matrix": corr_matrix.to_dict() if corr_matrix is not None else None,
+            "highly_correlated": highly_correlated_pairs(corr_matrix, threshold=0.7)
+                               if corr_matrix is not None else None
+        }
+    }
@@ -0,0 +1,283 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from ml.artifacts import ArtifactStore
+
+REGISTRY_DIR = os.getenv("ML_REGISTRY_DIR", os.path.join("cache", "registry"))
+MEMORY_BUDGET_MB = float(os.getenv("ML_REGISTRY_MEMORY_MB", "1024"))
+MODEL_CACHE_SIZE = int(os.getenv("ML_REGISTRY_MODEL_CACHE", "8"))
+MODELS_PER_USER = int(os.getenv("ML_MODELS_PER_USER", "5"))
+# User, dataset and model ids become file names, so they must not carry path components
+ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def check_id(value: str, kind: str = "id") -> str:
+    if not isinstance(value, str) or not ID_PATTERN.match(value):
+        raise ValueError(f"Invalid {kind}: use 1-64 letters, digits, '_' or '-'")
+    return value
+
+
+def _write_json(path: str, data: Dict):
+    # Write then rename so readers in other workers never see a partial file
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+class Registry:
+    """Datasets and trained models keyed by id and owned by a user.
+
+    Datasets are stored as uncompressed Arrow IPC (Feather) files and memory-mapped
+    back on demand; recently used frames stay in an LRU bounded by a memory budget.
+    Trained pipelines are serialized once into a content-addressed artifact store and
+    only the newest ``models_per_user`` models per user are kept. Everything lives on
+    disk, so every uvicorn worker sees the same registry.
+    """
+
+    def __init__(self, directory: str = REGISTRY_DIR, memory_budget_mb: float = MEMORY_BUDGET_MB,
+                 model_cache_size: int = MODEL_CACHE_SIZE, models_per_user: int = MODELS_PER_USER,
+                 artifacts: ArtifactStore = None):
+        self.directory = directory
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.model_cache_size = model_cache_size
+        self.models_per_user = models_per_user
+        self.artifacts = artifacts or ArtifactStore()
+        for sub in ("datasets", "models", "users"):
+            os.makedirs(os.path.join(directory, sub), exist_ok=True)
+        self._lock = threading.Lock()
+        self._frames: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+        self._frame_bytes: Dict[str, int] = {}
+        self._models: "OrderedDict[str, Any]" = OrderedDict()
+
+    def _path(self, kind: str, name: str) -> str:
+        return os.path.join(self.directory, kind, name)
+
+    # Users
+
+    def _user(self, user_id: str) -> Dict:
+        check_id(user_id, "user_id")
+        return _read_json(self._path("users", f"{user_id}.json")) or {}
+
+    def _set_user(self, user_id: str, **fields):
+        with self._lock:
+            record = self._user(user_id)
+            record.update(fields)
+            _write_json(self._path("users", f"{user_id}.json"), record)
+
+    def latest_dataset_id(self, user_id: str) -> Optional[str]:
+        return self._user(user_id).get("latest_dataset")
+
+    def latest_model_id(self, user_id: str) -> Optional[str]:
+        return self._user(user_id).get("latest_model")
+
+    # Datasets
+
+    def put_dataset(self, user_id: str, df: pd.DataFrame, filename: str = None) -> str:
+        check_id(user_id, "user_id")
+        dataset_id = uuid.uuid4().hex
+        df = df.reset_index(drop=True)
+        path = self._path("datasets", f"{dataset_id}.arrow")
+        feather.write_feather(df, f"{path}.tmp", compression="uncompressed")
+        os.replace(f"{path}.tmp", path)
+        _write_json(self._path("datasets", f"{dataset_id}.json"), {
+            "dataset_id": dataset_id,
+            "user_id": user_id,
+            "filename": filename,
+            "rows": len(df),
+            "columns": df.columns.tolist(),
+            "created_at": time.time(),
+        })
+        self._set_user(user_id, latest_dataset=dataset_id)
+        self._remember_frame(dataset_id, df)
+        return dataset_id
+
+    def put_dataset_stream(self, user_id: str, chunks: Iterable[pd.DataFrame], filename: str = None) -> str:
+        """Write chunks that share one schema straight to disk, one record batch each.
+
+        The frame is never assembled in memory; read it back with ``iter_batches``.
+        """
+        check_id(user_id, "user_id")
+        dataset_id = uuid.uuid4().hex
+        path = self._path("datasets", f"{dataset_id}.arrow")
+        writer, schema, rows, columns = None, None, 0, []
+        try:
+            for chunk in chunks:
+                if writer is None:
+                    schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                    columns = chunk.columns.tolist()
+                    writer = pa.ipc.new_file(f"{path}.tmp", schema)
+                if len(chunk):
+                    writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+                    rows += len(chunk)
+        except BaseException:
+            if writer is not None:
+                writer.close()
+                os.remove(f"{path}.tmp")
+            raise
+        if writer is None:
+            raise ValueError("Dataset is empty")
+        writer.close()
+        os.replace(f"{path}.tmp", path)
+        _write_json(self._path("datasets", f"{dataset_id}.json"), {
+            "dataset_id": dataset_id,
+            "user_id": user_id,
+            "filename": filename,
+            "rows": rows,
+            "columns": columns,
+            "out_of_core": True,
+            "created_at": time.time(),
+        })
+        self._set_user(user_id, latest_dataset=dataset_id)
+        return dataset_id
+
+    def iter_batches(self, dataset_id: str, user_id: str, columns: List[str] = None) -> Iterator[pd.DataFrame]:
+        """Stream a stored dataset one record batch at a time from the memory-mapped file"""
+        path = self.dataset_path(dataset_id, user_id)
+        with pa.memory_map(path, "r") as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if columns is not None:
+                    batch = batch.select(columns)
+                yield batch.to_pandas()
+
+    def dataset_meta(self, dataset_id: str, user_id: str) -> Dict:
+        check_id(dataset_id, "dataset_id")
+        meta = _read_json(self._path("datasets", f"{dataset_id}.json"))
+        if meta is None or meta["user_id"] != user_id:
+            raise KeyError(f"Dataset '{dataset_id}' not found")
+        return meta
+
+    def dataset_path(self, dataset_id: str, user_id: str) -> str:
+        self.dataset_meta(dataset_id, user_id)
+        return self._path("datasets", f"{dataset_id}.arrow")
+
+    def get_dataset(self, dataset_id: str, user_id: str) -> pd.DataFrame:
+        path = self.dataset_path(dataset_id, user_id)
+        with self._lock:
+            if dataset_id in self._frames:
+                self._frames.move_to_end(dataset_id)
+                return self._frames[dataset_id]
+        source = pa.memory_map(path, "r")
+        table = pa.ipc.open_file(source).read_all()
+        # split_blocks lets null-free numeric columns stay views over the mapped file
+        df = table.to_pandas(split_blocks=True)
+        self._remember_frame(dataset_id, df)
+        return df
+
+    def list_datasets(self, user_id: str) -> List[Dict]:
+        metas = []
+        for name in os.listdir(self._path("datasets", "")):
+            if name.endswith(".json"):
+                meta = _read_json(self._path("datasets", name))
+                if meta and meta["user_id"] == user_id:
+                    metas.append(meta)
+        return sorted(metas, key=lambda meta: meta["created_at"], reverse=True)
+
+    def _remember_frame(self, dataset_id: str, df: pd.DataFrame):
+        size = int(df.memory_usage(index=False, deep=False).sum())
+        with self._lock:
+            self._frames[dataset_id] = df
+            self._frame_bytes[dataset_id] = size
+            self._frames.move_to_end(dataset_id)
+            # Keep the newest frame even if it alone exceeds the budget
+            while len(self._frames) > 1 and sum(self._frame_bytes.values()) > self.memory_budget:
+                evicted, _ = self._frames.popitem(last=False)
+                self._frame_bytes.pop(evicted, None)
+
+    # Models
+
+    def put_model(self, user_id: str, dataset_id: str, pipeline, info: Dict) -> str:
+        check_id(user_id, "user_id")
+        model_id = uuid.uuid4().hex
+        digest = self.artifacts.put(pipeline)
+        _write_json(self._path("models", f"{model_id}.json"), {
+            **info,
+            "model_id": model_id,
+            "user_id": user_id,
+            "dataset_id": dataset_id,
+            "artifact": digest,
+            "artifact_bytes": self.artifacts.size(digest),
+            "created_at": time.time(),
+        })
+        self._set_user(user_id, latest_model=model_id)
+        self._remember_model(model_id, pipeline)
+        try:
+            self.collect_garbage()
+        except OSError as e:
+            print(f"Model garbage collection failed: {e}")
+        return model_id
+
+    def model_meta(self, model_id: str, user_id: str) -> Dict:
+        check_id(model_id, "model_id")
+        meta = _read_json(self._path("models", f"{model_id}.json"))
+        if meta is None or meta["user_id"] != user_id:
+            raise KeyError(f"Model '{model_id}' not found")
+        return meta
+
+    def model_artifact(self, model_id: str, user_id: str) -> Tuple[str, str]:
+        """Path and content digest of a model's serialized pipeline"""
+        digest = self.model_meta(model_id, user_id).get("artifact")
+        if digest is None or not self.artifacts.exists(digest):
+            raise KeyError(f"Model '{model_id}' not found")
+        return self.artifacts.path(digest), digest
+
+    def model_path(self, model_id: str, user_id: str) -> str:
+        return self.model_artifact(model_id, user_id)[0]
+
+    def get_model(self, model_id: str, user_id: str):
+        _, digest = self.model_artifact(model_id, user_id)
+        with self._lock:
+            if model_id in self._models:
+                self._models.move_to_end(model_id)
+                return self._models[model_id]
+        pipeline = self.artifacts.load(digest)
+        self._remember_model(model_id, pipeline)
+        return pipeline
+
+    def list_models(self, user_id: Optional[str] = None) -> List[Dict]:
+        metas = []
+        for name in os.listdir(self._path("models", "")):
+            if name.endswith(".json"):
+                meta = _read_json(self._path("models", name))
+                if meta and (user_id is None or meta["user_id"] == user_id):
+                    metas.append(meta)
+        return sorted(metas, key=lambda meta: meta["created_at"], reverse=True)
+
+    def collect_garbage(self) -> int:
+        """Drop models beyond each user's retention limit, then unreferenced artifacts"""
+        kept: Dict[str, int] = {}
+        referenced = set()
+        for meta in self.list_models():
+            user_id = meta["user_id"]
+            kept[user_id] = kept.get(user_id, 0) + 1
+            if kept[user_id] > self.models_per_user and meta["model_id"] != self.latest_model_id(user_id):
+                os.remove(self._path("models", f"{meta['model_id']}.json"))
+                with self._lock:
+                    self._models.pop(meta["model_id"], None)
+                continue
+            referenced.add(meta["artifact"])
+        return self.artifacts.collect(referenced)
+
+    def _remember_model(self, model_id: str, pipeline):
+        with self._lock:
+            self._models[model_id] = pipeline
+            self._models.move_to_end(model_id)
+            while len(self._models) > self.model_cache_size:
+                self._models.popitem(last=False)
@@ -0,0 +1,287 @@
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Tuple
+import numpy as np
+from scipy.stats import loguniform
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, mean_squared_error
+from sklearn.model_selection import KFold, ParameterSampler, StratifiedKFold
+from xgboost import XGBModel
+from tracing import copy_context_run, span
+
+SEARCH_TIME_BUDGET = float(os.getenv("ML_SEARCH_TIME_BUDGET", "600"))
+# Random configurations drawn per model family for the first rung
+CANDIDATES_PER_FAMILY = int(os.getenv("ML_SEARCH_CANDIDATES", "8"))
+CV_FOLDS = 3
+# Each rung keeps the best 1/ETA configurations and gives them ETA times more rows
+ETA = 3
+MIN_ROWS = 300
+# Most of the budget the final refit on all training rows may take; the search gets the rest
+REFIT_SHARE = 0.5
+# Fit time grows with rows like n log n, except for kernel SVMs which are roughly quadratic
+FIT_TIME_EXPONENT = {"SVM": 2.0}
+
+SEARCH_SPACES = {
+    "RandomForest": {
+        "n_estimators": [100, 200, 400],
+        "max_depth": [None, 8, 16, 32],
+        "min_samples_leaf": [1, 2, 5],
+        "max_features": ["sqrt", 0.5, 1.0],
+    },
+    "LogisticRegression": {
+        "C": loguniform(1e-3, 1e2),
+    },
+    "XGBoost": {
+        "learning_rate": loguniform(0.01, 0.3),
+        "max_depth": [3, 4, 6, 8],
+        "subsample": [0.6, 0.8, 1.0],
+        "colsample_bytree": [0.6, 0.8, 1.0],
+        "min_child_weight": [1, 3, 5],
+    },
+    "SVM": {
+        "C": loguniform(1e-2, 1e2),
+        "gamma": ["scale", "auto"],
+    },
+    "GradientBoosting": {
+        "learning_rate": loguniform(0.01, 0.3),
+        "max_depth": [2, 3, 4, 5],
+        "subsample": [0.7, 0.85, 1.0],
+    },
+}
+
+# Boosted models get a generous round cap and stop once validation stops improving
+EARLY_STOPPING = {
+    "XGBoost": {"n_estimators": 1000, "early_stopping_rounds": 20},
+    "GradientBoosting": {"n_estimators": 1000, "n_iter_no_change": 10, "validation_fraction": 0.1},
+}
+
+
+def _candidates(models: Dict, per_family: int, random_state: int) -> List[Tuple[str, Dict]]:
+    candidates = []
+    for name in models:
+        # The library defaults always compete, so search never does worse than the tournament
+        candidates.append((name, {}))
+        space = SEARCH_SPACES.get(name)
+        if space and per_family > 1:
+            for params in ParameterSampler(space, per_family - 1, random_state=random_state):
+                # Plain Python values so the report serializes cleanly
+                candidates.append((name, {key: getattr(value, "item", lambda: value)() for key, value in params.items()}))
+    return candidates
+
+
+def _build(models: Dict, name: str, params: Dict):
+    model = clone(models[name])
+    return model.set_params(**{**EARLY_STOPPING.get(name, {}), **params})
+
+
+def _score(y_true, y_pred, is_classification: bool) -> float:
+    """Higher is better: accuracy, or negated MSE"""
+    if is_classification:
+        return accuracy_score(y_true, y_pred)
+    return -mean_squared_error(y_true, y_pred)
+
+
+def _fit_fold(model, X, y, train_idx, val_idx, is_classification: bool) -> Tuple[float, int, float]:
+    X_train, y_train = X[train_idx], y.iloc[train_idx]
+    X_val, y_val = X[val_idx], y.iloc[val_idx]
+    started = time.monotonic()
+    with span("model_fit", type(model).__name__):
+        if isinstance(model, XGBModel):
+            model.fit(X_train, y_train, eval_set=[(X_val, y_val)], verbose=False)
+            rounds = model.best_iteration + 1
+        else:
+            model.fit(X_train, y_train)
+            rounds = getattr(model, "n_estimators_", None)
+    return _score(y_val, model.predict(X_val), is_classification), rounds, time.monotonic() - started
+
+
+def _fit_estimate(entry: Dict, rows: float) -> float:
+    """Seconds one fit of ``entry``'s configuration should take on ``rows`` rows, from its CV fits"""
+    ratio = rows / entry["fit_rows"]
+    if entry["model"] in FIT_TIME_EXPONENT:
+        return entry["fit_seconds"] * ratio ** FIT_TIME_EXPONENT[entry["model"]]
+    return entry["fit_seconds"] * ratio * math.log(max(rows, 2)) / math.log(max(entry["fit_rows"], 2))
+
+
+def _folds(y, rows: np.ndarray, is_classification: bool, n_folds: int, random_state: int):
+    if is_classification and y.iloc[rows].value_counts().min() >= n_folds:
+        splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=random_state)
+    else:
+        splitter = KFold(n_splits=n_folds, shuffle=True, random_state=random_state)
+    return [(rows[train], rows[val]) for train, val in splitter.split(rows, y.iloc[rows])]
+
+
+def _rank(candidates: List[Tuple[str, Dict]], fold_results: Dict[int, List[Tuple[float, int, float]]],
+          failed: set, folds: List, rows: int) -> List[Dict]:
+    """Configurations with every fold scored, best first"""
+    scored = [
+        {
+            "model": candidates[index][0],
+            "params": candidates[index][1],
+            "rows": rows,
+            "cv_score": float(np.mean([score for score, _, _ in results])),
+            "rounds": [r for _, r, _ in results if r is not None],
+            "fit_seconds": float(np.mean([seconds for _, _, seconds in results])),
+            "fit_rows": len(folds[0][0]),
+        }
+        for index, results in fold_results.items()
+        if index not in failed and len(results) == len(folds)
+    ]
+    return sorted(scored, key=lambda entry: entry["cv_score"], reverse=True)
+
+
+def _refit_choice(scored: List[Dict], rows: int, available: float) -> Tuple[Dict, float]:
+    """The best configuration whose refit on ``rows`` rows should fit in ``available`` seconds (else the
+    quickest to refit), with that estimate"""
+    estimates = [(entry, _fit_estimate(entry, rows)) for entry in scored]
+    affordable = [pair for pair in estimates if pair[1] <= available]
+    return affordable[0] if affordable else min(estimates, key=lambda pair: pair[1])
+
+
+def _refit(models: Dict, name: str, params: Dict, rounds: List[int], X, y):
+    """Fit the winner on all training rows with the boosting length learned during CV"""
+    model = _build(models, name, params)
+    if name in EARLY_STOPPING and rounds:
+        overrides = {"n_estimators": max(1, int(round(np.mean(rounds))))}
+        if isinstance(model, XGBModel):
+            overrides["early_stopping_rounds"] = None
+        else:
+            overrides["n_iter_no_change"] = None
+        model.set_params(**overrides)
+    return model.fit(X, y)
+
+
+def halving_search(models: Dict, Xt_train, y_train, is_classification: bool,
+                   time_budget: float = SEARCH_TIME_BUDGET, max_workers: int = 1,
+                   candidates_per_family: int = CANDIDATES_PER_FAMILY, n_folds: int = CV_FOLDS,
+                   eta: int = ETA, min_rows: int = MIN_ROWS, random_state: int = 42, progress=None):
+    """Successive-halving hyperparameter search over the tournament's model families.
+
+    Every configuration is scored by k-fold CV on a small random subset of the
+    training rows; each rung keeps the best ``1/eta`` and evaluates them on ``eta``
+    times more rows, so most of the budget goes to promising configurations. One
+    configuration of the last completed rung is refitted on all training rows.
+
+    ``time_budget`` covers the refit too. Refit times are estimated from the CV fit
+    times scaled to all rows; the best configuration whose refit fits in
+    ``REFIT_SHARE`` of the budget has its estimate held back, no further rung starts
+    unless its estimated cost still fits in front of it, and the configuration
+    refitted is the best one that still fits in the time left (the quickest when
+    none does). The refit itself is not interrupted, so a low estimate can overrun.
+
+    Returns ``(fitted, results, skipped, report)`` like ``run_tournament``, where
+    ``fitted`` and ``results`` only hold the winning family (scored by CV).
+    """
+    progress = progress or (lambda fraction, message=None: None)
+    deadline = time.monotonic() + time_budget
+    workers = max(1, max_workers)
+    refit_budget = time_budget * REFIT_SHARE
+    # Seconds held back for the final refit, estimated as configurations finish
+    reserve = 0.0
+    y_train = y_train.reset_index(drop=True)
+    n = Xt_train.shape[0]
+    order = np.random.default_rng(random_state).permutation(n)
+
+    candidates = _candidates(models, candidates_per_family, random_state)
+    configurations = len(candidates)
+    rungs = max(1, math.ceil(math.log(len(candidates), eta)))
+    rows = min(n, max(min_rows, n // eta ** (rungs - 1)))
+
+    errors: Dict[str, str] = {}
+    leaderboard: List[Dict] = []
+    survivors: List[Dict] = []
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search")
+    try:
+        for rung in range(rungs):
+            folds = _folds(y_train, order[:rows], is_classification, n_folds, random_state)
+            futures = {}
+            for index, (name, params) in enumerate(candidates):
+                for train_idx, val_idx in folds:
+                    future = executor.submit(copy_context_run(_fit_fold), _build(models, name, params), Xt_train, y_train,
+                                             train_idx, val_idx, is_classification)
+                    futures[future] = index
+
+            fold_results: Dict[int, List[Tuple[float, int, float]]] = {}
+            failed = set()
+            pending = set(futures)
+            while pending and time.monotonic() < deadline - reserve:
+                done, pending = wait(pending, timeout=min(0.5, max(0.0, deadline - reserve - time.monotonic())),
+                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = futures[future]
+                    try:
+                        fold_results.setdefault(index, []).append(future.result())
+                    except Exception as e:
+                        name = candidates[index][0]
+                        print(f"Error training {name} {candidates[index][1]}: {e}")
+                        errors.setdefault(name, str(e))
+                        failed.add(index)
+                # Hold back the refit time as soon as it can be estimated, so even the first rung leaves room for it
+                ranked = _rank(candidates, fold_results, failed, folds, rows)
+                if ranked:
+                    reserve = _refit_choice(ranked, n, refit_budget)[1]
+                finished = len(futures) - len(pending)
+                progress((rung + finished / len(futures)) / rungs,
+                         f"Rung {rung + 1}/{rungs}: {len(futures) - len(pending)}/{len(futures)} fits on {rows} rows")
+            for future in pending:
+                future.cancel()
+
+            scored = _rank(candidates, fold_results, failed, folds, rows)
+            if not scored:
+                print(f"Search rung {rung + 1} finished no configuration within the time budget")
+                break
+            leaderboard.extend(scored)
+            survivors = scored
+            print(f"Rung {rung + 1}/{rungs}: best {scored[0]['model']} {scored[0]['params']} "
+                  f"CV {scored[0]['cv_score']:.4f} on {rows} rows")
+
+            reserve = _refit_choice(scored, n, refit_budget)[1]
+            if pending or rows >= n or time.monotonic() >= deadline - reserve:
+                break
+            keep = max(1, len(scored) // eta)
+            next_ratio = min(n, rows * eta) / rows
+            next_rung = sum(_fit_estimate(entry, entry["fit_rows"] * next_ratio)
+                            for entry in scored[:keep]) * n_folds / workers
+            if time.monotonic() + next_rung > deadline - reserve:
+                print(f"Stopping the search after rung {rung + 1}: the next rung (~{next_rung:.0f}s) "
+                      f"and the refit (~{reserve:.0f}s) would not fit in the time budget")
+                break
+            candidates = [(entry["model"], entry["params"]) for entry in scored[:keep]]
+            rows = min(n, rows * eta)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if not survivors:
+        return {}, {}, errors or {"search": "No configuration finished within the time budget"}, {}
+
+    best, estimate = _refit_choice(survivors, n, max(0.0, deadline - time.monotonic()))
+    if best is not survivors[0]:
+        print(f"Refitting {best['model']} {best['params']} instead of the CV leader {survivors[0]['model']}: "
+              f"its refit (~{estimate:.0f}s) fits in the remaining time budget")
+    model = _refit(models, best["model"], best["params"], best["rounds"], Xt_train, y_train)
+    score = best["cv_score"] if is_classification else -best["cv_score"]
+
+    families = {}
+    for entry in leaderboard:
+        current = families.get(entry["model"])
+        if current is None or (entry["rows"], entry["cv_score"]) > (current["rows"], current["cv_score"]):
+            families[entry["model"]] = entry
+    # A family only counts as skipped when none of its configurations could be scored
+    skipped = {name: error for name, error in errors.items() if name not in families}
+    report = {
+        "best_params": best["params"],
+        "cv_folds": n_folds,
+        "configurations": configurations,
+        "fits": len(leaderboard) * n_folds,
+        "families": {
+            name: {
+                "params": entry["params"],
+                "rows": entry["rows"],
+                "cv_score": entry["cv_score"] if is_classification else -entry["cv_score"],
+            }
+            for name, entry in families.items()
+        },
+    }
+    return {best["model"]: model}, {best["model"]: score}, skipped, report
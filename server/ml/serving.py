@@ -0,0 +1,197 @@
+import asyncio
+import io
+import json
+import os
+from typing import Dict, Iterator, List, Tuple
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi.concurrency import run_in_threadpool
+from ml.registry import Registry
+
+# Concurrent requests for the same model are merged up to this many rows...
+MAX_BATCH_ROWS = int(os.getenv("PREDICT_MAX_BATCH_ROWS", "8192"))
+# ...or until the first request has waited this long
+MAX_WAIT_MS = float(os.getenv("PREDICT_MAX_WAIT_MS", "5"))
+# A model's batching loop stops after this long without requests
+IDLE_SECONDS = 60.0
+OUTPUT_CHUNK_ROWS = 1000
+
+ARROW_TYPES = ("application/vnd.apache.arrow.stream", "application/vnd.apache.arrow.file")
+PARQUET_TYPES = ("application/vnd.apache.parquet", "application/x-parquet", "application/parquet")
+
+
+def parse_rows(body: bytes, content_type: str) -> pd.DataFrame:
+    """Decode a request body into a DataFrame.
+
+    JSON may be a list of records, ``{"rows": [...]}`` or ``{"columns": [...], "data": [[...]]}``.
+    CSV, Arrow IPC (stream or file) and Parquet bodies are read directly.
+    """
+    content_type = (content_type or "application/json").split(";")[0].strip().lower()
+    if content_type == "text/csv":
+        return pd.read_csv(io.BytesIO(body))
+    if content_type in ARROW_TYPES:
+        source = pa.BufferReader(body)
+        if body[:6] == b"ARROW1":
+            return pa.ipc.open_file(source).read_pandas()
+        return pa.ipc.open_stream(source).read_pandas()
+    if content_type in PARQUET_TYPES:
+        return pq.read_table(pa.BufferReader(body)).to_pandas()
+    if content_type == "application/json":
+        payload = json.loads(body or b"null")
+        if isinstance(payload, dict) and "columns" in payload and "data" in payload:
+            return pd.DataFrame(payload["data"], columns=payload["columns"])
+        if isinstance(payload, dict):
+            payload = payload.get("rows")
+        if not isinstance(payload, list):
+            raise ValueError("JSON body must be a list of rows, {'rows': [...]} or {'columns': [...], 'data': [...]}")
+        return pd.DataFrame.from_records(payload)
+    raise ValueError(f"Unsupported content type '{content_type}'")
+
+
+def _score(pipeline, frames: List[pd.DataFrame], proba: bool) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """One vectorized predict (and predict_proba) over every queued frame, split back per request"""
+    X = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    predictions = pipeline.predict(X)
+    probabilities = pipeline.predict_proba(X) if proba else None
+    bounds = np.cumsum([len(frame) for frame in frames])[:-1]
+    split_predictions = np.split(predictions, bounds)
+    split_probabilities = np.split(probabilities, bounds) if proba else [None] * len(frames)
+    return list(zip(split_predictions, split_probabilities))
+
+
+class PredictionService:
+    """Scores rows against registry models kept warm in memory.
+
+    Requests for the same model (and output kind) are queued and drained by one loop
+    per model, which merges whatever arrived within ``max_wait_ms`` into a single
+    predict call on the threadpool.
+    """
+
+    def __init__(self, registry: Registry, max_batch_rows: int = MAX_BATCH_ROWS, max_wait_ms: float = MAX_WAIT_MS):
+        self.registry = registry
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000
+        self._queues: Dict[Tuple[str, bool], asyncio.Queue] = {}
+        self._loops: Dict[Tuple[str, bool], asyncio.Task] = {}
+
+    def prepare(self, model_id: str, user_id: str, frame: pd.DataFrame) -> Tuple[Dict, pd.DataFrame]:
+        """Validate the frame against the model's features; raises KeyError/ValueError"""
+        meta = self.registry.model_meta(model_id, user_id)
+        features = meta["feature_columns"]
+        missing = [column for column in features if column not in frame.columns]
+        if missing:
+            raise ValueError(f"Missing feature columns: {missing}")
+        return meta, frame[features]
+
+    async def predict(self, model_id: str, user_id: str, frame: pd.DataFrame,
+                      proba: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        # Load (or touch) the pipeline up front so ownership errors surface per request
+        await run_in_threadpool(self.registry.get_model, model_id, user_id)
+        if len(frame) == 0:
+            return np.empty(0), None
+        key = (model_id, proba)
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.setdefault(key, asyncio.Queue())
+        queue.put_nowait((user_id, frame, future))
+        task = self._loops.get(key)
+        if task is None or task.done():
+            self._loops[key] = asyncio.create_task(self._drain(key, queue))
+        return await future
+
+    async def _drain(self, key: Tuple[str, bool], queue: asyncio.Queue):
+        model_id, proba = key
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                first = await asyncio.wait_for(queue.get(), IDLE_SECONDS)
+            except asyncio.TimeoutError:
+                if queue.empty():
+                    self._queues.pop(key, None)
+                    self._loops.pop(key, None)
+                    return
+                continue
+
+            batch = [first]
+            rows = len(first[1])
+            deadline = loop.time() + self.max_wait
+            while rows < self.max_batch_rows:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                rows += len(item[1])
+
+            live = [item for item in batch if not item[2].done()]
+            if not live:
+                continue
+            try:
+                pipeline = await run_in_threadpool(self.registry.get_model, model_id, live[0][0])
+            except Exception as e:
+                for _, _, future in live:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            await self._resolve(pipeline, live, proba)
+
+    async def _resolve(self, pipeline, items: List, proba: bool):
+        try:
+            results = await run_in_threadpool(_score, pipeline, [item[1] for item in items], proba)
+        except Exception as e:
+            if len(items) > 1:
+                # One malformed request must not fail the others merged with it
+                for item in items:
+                    await self._resolve(pipeline, [item], proba)
+                return
+            print(f"Prediction failed: {e}")
+            results = [e]
+        for (_, _, future), result in zip(items, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def score(self, model_id: str, user_id: str, frame: pd.DataFrame,
+                    proba: bool = False) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """Predictions, class probabilities and class labels for ``frame``"""
+        meta, features = self.prepare(model_id, user_id, frame)
+        if proba and not meta.get("is_classification"):
+            raise ValueError("Probabilities are only available for classification models")
+        predictions, probabilities = await self.predict(model_id, user_id, features, proba)
+        classes = None
+        if proba:
+            pipeline = await run_in_threadpool(self.registry.get_model, model_id, user_id)
+            classes = [str(label) for label in pipeline.classes_]
+        return predictions, probabilities, classes
+
+
+def render(predictions: np.ndarray, probabilities: np.ndarray = None, classes: List[str] = None,
+           output: str = "ndjson") -> Iterator[str]:
+    """Predictions as NDJSON records or CSV, yielded in chunks of rows"""
+    if output == "csv":
+        header = ["prediction"] + [f"proba_{label}" for label in classes or []]
+        yield ",".join(header) + "\n"
+    for start in range(0, len(predictions), OUTPUT_CHUNK_ROWS):
+        stop = start + OUTPUT_CHUNK_ROWS
+        chunk = pd.DataFrame({"prediction": predictions[start:stop]})
+        if output == "csv":
+            for i, label in enumerate(classes or []):
+                chunk[f"proba_{label}"] = probabilities[start:stop, i]
+            yield chunk.to_csv(index=False, header=False)
+        elif classes is not None:
+            yield "".join(
+                json.dumps({
+                    "prediction": prediction,
+                    "probabilities": dict(zip(classes, row))
+                }) + "\n"
+                for prediction, row in zip(chunk["prediction"].tolist(), probabilities[start:stop].tolist())
+            )
+        else:
+            yield "".join(json.dumps({"prediction": prediction}) + "\n" for prediction in chunk["prediction"].tolist())
@@ -1,6 +1,4 @@
 import pandas as pd
-import io
-import numpy as np
 from fastapi import HTTPException, UploadFile
 from typing import Dict, Any, Optional
 from sklearn.pipeline import Pipeline
@@ -9,62 +7,129 @@ from sklearn.compose import ColumnTransformer
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, mean_squared_error, classification_report, r2_score
-import joblib
-import tempfile
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from sklearn.linear_model import LogisticRegression
 from sklearn.svm import SVC
 from sklearn.ensemble import GradientBoostingClassifier, GradientBoostingRegressor
 from xgboost import XGBClassifier, XGBRegressor
+from fastapi.concurrency import run_in_threadpool
+from cancellation import JobCancelled
+from tracing import copy_context_run, span
+from ml.incremental import train_streaming
+from ml.ingest import iter_csv_chunks, read_csv_chunks
+from ml.isolated import dump_matrices, fit_isolated, prestart
+from ml.profiling import PROFILE_SAMPLE_ROWS, profile_frame
+from ml.registry import Registry
+from ml.search import SEARCH_TIME_BUDGET, halving_search
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import os
+import shutil
+import tempfile
+import threading
+
+TRAIN_WORKERS = int(os.getenv("ML_TRAIN_WORKERS", str(min(4, os.cpu_count() or 1))))
+MODEL_TIME_BUDGET = float(os.getenv("ML_MODEL_TIME_BUDGET", "300"))
+# Uploads larger than this are stored and trained out of core
+OUT_OF_CORE_BYTES = int(os.getenv("ML_OUT_OF_CORE_BYTES", str(1024 ** 3)))
+
+def run_tournament(models, Xt_train, y_train, Xt_test, y_test, is_classification,
+                   max_workers=TRAIN_WORKERS, time_budget=MODEL_TIME_BUDGET, progress=None):
+    """Fit every candidate in its own process and score it on the held-out split.
+
+    At most ``max_workers`` fits run at once. A candidate that runs longer than
+    ``time_budget`` seconds is killed and dropped from the tournament, and every fit
+    still running is killed when the tournament ends early (e.g. the job is
+    cancelled). Returns the fitted models, the scores and a ``{name: reason}`` dict
+    of skipped candidates.
+    """
+    progress = progress or (lambda fraction, message=None: None)
+    stop = threading.Event()
+    workdir = tempfile.mkdtemp(prefix="tournament_")
+    data_path = os.path.join(workdir, "matrices.joblib")
+    dump_matrices(data_path, Xt_train, y_train, Xt_test)
+
+    def fit(name, model):
+        with span("model_fit", name):
+            return fit_isolated(model, data_path, time_budget, stop)
+
+    fitted, results, skipped = {}, {}, {}
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="train")
+    futures = {executor.submit(copy_context_run(fit), name, model): name for name, model in models.items()}
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures[future]
+                try:
+                    model, y_pred = future.result()
+                except TimeoutError as e:
+                    print(f"{name} exceeded its {time_budget:.0f}s budget")
+                    skipped[name] = str(e)
+                    continue
+                except Exception as e:
+                    print(f"Error training {name}: {str(e)}")
+                    skipped[name] = str(e)
+                    continue
+                if is_classification:
+                    score = accuracy_score(y_test, y_pred)
+                    print(f"{name} - Accuracy: {score:.4f}")
+                else:
+                    score = mean_squared_error(y_test, y_pred)
+                    print(f"{name} - MSE: {score:.4f}")
+                fitted[name] = model
+                results[name] = score
+
+            finished = len(models) - len(pending)
+            progress(finished / len(models), f"{finished}/{len(models)} models finished")
+    finally:
+        # Kill whatever is still fitting; the threads return within one poll interval
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(workdir, ignore_errors=True)
 
-class ModelInfo:
-    def __init__(self, model_type: str, accuracy: Optional[float] = None, 
-                 mse: Optional[float] = None, r2: Optional[float] = None,
-                 feature_importance: Optional[dict] = None,
-                 classification_report: Optional[dict] = None,
-                 is_classification: Optional[bool] = None):
-        self.model_type = model_type
-        self.accuracy = accuracy
-        self.mse = mse
-        self.r2 = r2
-        self.feature_importance = feature_importance
-        self.classification_report = classification_report
-        self.is_classification = is_classification
+    # Keep the original candidate order in the response
+    ordered = {name: results[name] for name in models if name in results}
+    return fitted, ordered, skipped
 
 class MLPipeline:
-    def __init__(self):
-        self.current_dataset = None
-        self.current_model = None
-        self.current_model_info = None
+    def __init__(self, registry: Registry = None):
+        # Datasets and models live in the registry, keyed by id and owned by a user
+        self.registry = registry or Registry()
+        # Tournament fits run in worker processes; start them while the first dataset uploads
+        prestart()
 
-    async def upload_dataset(self, file: UploadFile) -> Dict[str, Any]:
-        """Handle dataset upload and return profile"""
+    async def upload_dataset(self, file: UploadFile, user_id: str = "default",
+                             exact_profile: bool = False, out_of_core: bool = False) -> Dict[str, Any]:
+        """Handle dataset upload and return profile.
+
+        With ``out_of_core`` (implied for uploads over ``OUT_OF_CORE_BYTES``) chunks are
+        written straight to disk and only a leading sample is profiled.
+        """
         try:
-            # Read file content
-            content = await file.read()
-            
-            # Determine file type and read into DataFrame
-            if file.filename.endswith('.csv'):
-                df = pd.read_csv(io.StringIO(content.decode('utf-8')))
-            else:
+            # Determine file type and stream it into a cleaned, compact DataFrame
+            if not file.filename.endswith('.csv'):
                 raise HTTPException(status_code=400, detail="Invalid file type. Only CSV files are supported.")
 
-            missing_values = ['.', ' ', 'NA', 'N/A', 'NaN', 'NULL', '?', '..']
+            await file.seek(0)
+            if out_of_core or (file.size or 0) > OUT_OF_CORE_BYTES:
+                return await run_in_threadpool(self._ingest_out_of_core, file.file, user_id, file.filename)
 
-            # Drop rows with any NaN values (keep complete cases only)
-            df_clean = df.replace(missing_values, pd.NA).dropna()
+            with span("csv_parse"):
+                df_clean, original_row_count = await run_in_threadpool(read_csv_chunks, file.file)
             
             # Store the cleaned dataset
-            self.current_dataset = df_clean
+            dataset_id = await run_in_threadpool(self.registry.put_dataset, user_id, df_clean, file.filename)
             
             # Generate profile
-            profile = self.generate_data_profile(df_clean)
+            profile = await run_in_threadpool(self.generate_data_profile, df_clean, exact_profile)
             
             return {
                 "message": "Dataset uploaded successfully",
+                "dataset_id": dataset_id,
                 "filename": file.filename,
                 "columns": df_clean.columns.tolist(),
-                "original_row_count": len(df),
+                "original_row_count": original_row_count,
                 "cleaned_row_count": len(df_clean),
                 "shape": df_clean.shape,
                 "sample_data": df_clean.head().to_dict(orient='records'),
@@ -74,13 +139,67 @@ class MLPipeline:
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def train_model(self, target_column: str, test_size: float = 0.2, random_state: int = 42) -> Dict[str, Any]:
-        """Train machine learning model"""
+    def _ingest_out_of_core(self, source, user_id: str, filename: str) -> Dict[str, Any]:
+        original_rows = 0
+        sample = []
+        sampled_rows = 0
+
+        def chunks():
+            nonlocal original_rows, sampled_rows
+            for chunk, raw_rows in iter_csv_chunks(source):
+                original_rows += raw_rows
+                if sampled_rows < PROFILE_SAMPLE_ROWS:
+                    sample.append(chunk.head(PROFILE_SAMPLE_ROWS - sampled_rows))
+                    sampled_rows += len(sample[-1])
+                yield chunk
+
+        with span("csv_parse", "out_of_core"):
+            dataset_id = self.registry.put_dataset_stream(user_id, chunks(), filename)
+        meta = self.registry.dataset_meta(dataset_id, user_id)
+        df_sample = pd.concat(sample, ignore_index=True)
+        profile = self.generate_data_profile(df_sample, exact=True)
+        profile["overview"]["rows"] = meta["rows"]
+        profile["overview"]["sampled_rows"] = len(df_sample)
+
+        return {
+            "message": "Dataset uploaded successfully",
+            "dataset_id": dataset_id,
+            "filename": filename,
+            "out_of_core": True,
+            "columns": meta["columns"],
+            "original_row_count": original_rows,
+            "cleaned_row_count": meta["rows"],
+            "shape": (meta["rows"], len(meta["columns"])),
+            "sample_data": df_sample.head().to_dict(orient='records'),
+            "profile": profile
+        }
+
+    def train_model(self, target_column: str, test_size: float = 0.2, random_state: int = 42,
+                    max_workers: Optional[int] = None, model_time_budget: Optional[float] = None,
+                    dataset_id: Optional[str] = None, user_id: str = "default",
+                    search_mode: str = "tournament", time_budget: Optional[float] = None,
+                    progress=None) -> Dict[str, Any]:
+        """Train machine learning model (blocking; runs on the job pool).
+
+        Trains on ``dataset_id``, or the user's most recent upload when omitted. In
+        ``tournament`` mode the default-parameter candidates are fitted concurrently on
+        at most ``max_workers`` threads, each limited to ``model_time_budget`` seconds.
+        In ``halving`` mode a cross-validated successive-halving search tunes the same
+        families within ``time_budget`` seconds. ``progress(fraction, message)`` is
+        called as candidates finish.
+        """
+        progress = progress or (lambda fraction, message=None: None)
         try:
-            if self.current_dataset is None:
+            dataset_id = dataset_id or self.registry.latest_dataset_id(user_id)
+            if dataset_id is None:
                 raise HTTPException(status_code=400, detail="No dataset uploaded. Please upload a dataset first.")
-            
-            df = self.current_dataset
+            try:
+                if self.registry.dataset_meta(dataset_id, user_id).get("out_of_core"):
+                    return self._train_out_of_core(dataset_id, user_id, target_column, test_size,
+                                                   random_state, progress)
+                df = self.registry.get_dataset(dataset_id, user_id)
+            except KeyError as e:
+                raise HTTPException(status_code=404, detail=e.args[0])
             
             if target_column not in df.columns:
                 raise HTTPException(status_code=400, detail=f"Target column '{target_column}' not found in dataset.")
@@ -141,46 +260,49 @@ class MLPipeline:
                     "GradientBoosting": GradientBoostingRegressor(random_state=42)
                 }
             
-            # Train and evaluate each model
-            results = {}
-            best_score = -float('inf') if is_classification else float('inf')
+            # Fit preprocessing once and share the transformed matrices across candidates
+            preprocessor.fit(X_train)
+            Xt_train = preprocessor.transform(X_train)
+            Xt_test = preprocessor.transform(X_test)
+
+            search_report = None
+            if search_mode == "halving":
+                # Tune hyperparameters by CV on the training split; the test split stays held out
+                fitted, results, skipped, search_report = halving_search(
+                    models, Xt_train, y_train, is_classification,
+                    time_budget=time_budget or SEARCH_TIME_BUDGET,
+                    max_workers=max_workers or TRAIN_WORKERS,
+                    random_state=random_state,
+                    progress=progress
+                )
+            else:
+                # Train and evaluate the candidates in parallel
+                fitted, results, skipped = run_tournament(
+                    models, Xt_train, y_train, Xt_test, y_test, is_classification,
+                    max_workers=max_workers or TRAIN_WORKERS,
+                    time_budget=model_time_budget or MODEL_TIME_BUDGET,
+                    progress=progress
+                )
+
             best_model = None
             best_model_name = ""
-            
-            for name, model in models.items():
-                try:
-                    pipeline = Pipeline([
-                        ('preprocessor', preprocessor),
-                        ('model', model)
-                    ])
-                    
-                    pipeline.fit(X_train, y_train)
-                    y_pred = pipeline.predict(X_test)
-                    
-                    if is_classification:
-                        score = accuracy_score(y_test, y_pred)
-                        print(f"{name} - Accuracy: {score:.4f}")
-                        if score > best_score:
-                            best_score = score
-                            best_model = pipeline
-                            best_model_name = name
-                    else:
-                        score = mean_squared_error(y_test, y_pred)
-                        print(f"{name} - MSE: {score:.4f}")
-                        if score < best_score:
-                            best_score = score
-                            best_model = pipeline
-                            best_model_name = name
-                    
-                    results[name] = score
-                except Exception as e:
-                    print(f"Error training {name}: {str(e)}")
-                    continue
+            best_score = -float('inf') if is_classification else float('inf')
+            for name, score in results.items():
+                if (is_classification and score > best_score) or (not is_classification and score < best_score):
+                    best_score = score
+                    best_model_name = name
+            if best_model_name:
+                best_model = Pipeline([
+                    ('preprocessor', preprocessor),
+                    ('model', fitted[best_model_name])
+                ])
             
             print(f"\n=== TRAINING RESULTS ===")
             print(f"Best model: {best_model_name}")
             print(f"Best score: {best_score}")
             print(f"All results: {results}")
+            if skipped:
+                print(f"Skipped: {skipped}")
             print("=======================\n")
 
             # Evaluate best model
@@ -194,6 +316,8 @@ class MLPipeline:
                 "model_type": best_model_name,
                 "is_classification": is_classification
             }
+            if search_report is not None:
+                model_info["search"] = search_report
             
             if is_classification:
                 model_info["accuracy"] = accuracy_score(y_test, y_pred)
@@ -214,122 +338,107 @@ class MLPipeline:
                 else:
                     all_feature_names = numeric_features
                 
-                model_info["feature_importance"] = dict(zip(all_feature_names, feature_importances))
+                model_info["feature_importance"] = {
+                    str(name): float(value) for name, value in zip(all_feature_names, feature_importances)
+                }
             
-            self.current_model = best_model
-            self.current_model_info = ModelInfo(**model_info)
+            model_id = self.registry.put_model(user_id, dataset_id, best_model, {
+                "target_column": target_column,
+                "feature_columns": X.columns.tolist(),
+                "model_type": best_model_name,
+                "is_classification": is_classification,
+                **{key: model_info[key] for key in ("accuracy", "mse", "r2") if key in model_info}
+            })
             
             return {
                 "message": f"Model training complete. Best model: {best_model_name}",
+                "model_id": model_id,
+                "dataset_id": dataset_id,
                 "model_info": model_info,
                 "all_model_results": results,
+                "skipped_models": skipped,
                 "is_classification": is_classification
             }
         
+        except JobCancelled:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def download_model(self) -> FileResponse:
-        """Download the trained model"""
-        if self.current_model is None:
+    def _train_out_of_core(self, dataset_id: str, user_id: str, target_column: str, test_size: float,
+                           random_state: int, progress) -> Dict[str, Any]:
+        """Stream the stored chunks through incremental learners instead of loading the frame"""
+        try:
+            pipelines, results, info = train_streaming(
+                lambda: self.registry.iter_batches(dataset_id, user_id),
+                target_column, test_size=test_size, random_state=random_state,
+                workdir=self.registry.directory, progress=progress
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        is_classification = info["is_classification"]
+        pick = max if is_classification else min
+        best_model_name = pick(results, key=results.get)
+        print("\n=== OUT-OF-CORE TRAINING RESULTS ===")
+        print(f"Best model: {best_model_name}")
+        print(f"All results: {results}")
+        print("=======================\n")
+
+        model_info = {
+            "model_type": best_model_name,
+            "is_classification": is_classification,
+            **info["metrics"][best_model_name],
+            "train_rows": info["train_rows"],
+            "test_rows": info["test_rows"]
+        }
+        model_id = self.registry.put_model(user_id, dataset_id, pipelines[best_model_name], {
+            "target_column": target_column,
+            "feature_columns": info["feature_columns"],
+            "model_type": best_model_name,
+            "is_classification": is_classification,
+            "out_of_core": True,
+            **info["metrics"][best_model_name]
+        })
+
+        return {
+            "message": f"Model training complete. Best model: {best_model_name}",
+            "model_id": model_id,
+            "dataset_id": dataset_id,
+            "model_info": model_info,
+            "all_model_results": results,
+            "skipped_models": {},
+            "is_classification": is_classification
+        }
+
+    async def download_model(self, model_id: Optional[str] = None, user_id: str = "default",
+                             if_none_match: Optional[str] = None) -> Response:
+        """Download a trained model (the user's most recent one when ``model_id`` is omitted).
+
+        The pipeline was serialized once at training time; this streams the stored
+        artifact, with its content digest as ETag so clients can revalidate or resume.
+        """
+        model_id = model_id or self.registry.latest_model_id(user_id)
+        if model_id is None:
             raise HTTPException(status_code=404, detail="No trained model available")
         
         try:
-            # Save model to a temporary file
-            with tempfile.NamedTemporaryFile(delete=False) as tmp:
-                joblib.dump(self.current_model, tmp.name)
-                
-                # Return the file
-                return FileResponse(
-                    tmp.name,
-                    media_type='application/octet-stream',
-                    filename="trained_model.joblib"
-                )
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-
-    def get_highly_correlated_pairs(self, corr_matrix, threshold=0.7):
-        """Identify highly correlated variable pairs"""
-        if corr_matrix is None:
-            return None
+            path, digest = self.registry.model_artifact(model_id, user_id)
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=e.args[0])
         
-        corr_pairs = corr_matrix.abs().stack()
-        pairs = corr_pairs[corr_pairs > threshold].reset_index()
-        pairs = pairs[pairs['level_0'] != pairs['level_1']]  # Remove diagonal
+        headers = {"ETag": f'"{digest}"', "Cache-Control": "private, no-cache"}
+        if if_none_match and digest in [tag.strip().strip('"') for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
         
-        if len(pairs) > 0:
-            pairs.columns = ['variable1', 'variable2', 'correlation']
-            return pairs.sort_values('correlation', ascending=False).to_dict('records')
-        return None
+        return FileResponse(
+            path,
+            media_type='application/octet-stream',
+            filename="trained_model.joblib",
+            headers=headers
+        )
 
-    def generate_data_profile(self, df: pd.DataFrame) -> dict:
-        """Generate comprehensive data profile"""
-        numeric_cols = df.select_dtypes(include=['number']).columns
-        corr_matrix = df[numeric_cols].corr().round(2) if len(numeric_cols) > 1 else None
-
-        profile = {
-            "overview": {
-                "rows": len(df),
-                "columns": len(df.columns),
-                "missing_values": int(df.isna().sum().sum()),
-                "duplicate_rows": int(df.duplicated().sum())
-            },
-            "columns": {
-                col: {
-                    "type": str(df[col].dtype),
-                    "missing": int(df[col].isna().sum()),
-                    "unique": int(df[col].nunique()),
-                    "stats": {
-                        **({
-                            "mean": float(df[col].mean()),
-                            "min": float(df[col].min()),
-                            "max": float(df[col].max()),
-                            "std": float(df[col].std()),
-                            "quantiles": {
-                                "25%": float(df[col].quantile(0.25)),
-                                "50%": float(df[col].quantile(0.50)),
-                                "75%": float(df[col].quantile(0.75))
-                            }
-                        } if pd.api.types.is_numeric_dtype(df[col]) else {}),
-                        **({
-                            "value_counts": df[col].value_counts().head(10).to_dict(),
-                            "top_values": df[col].value_counts().head(3).to_dict()
-                        } if pd.api.types.is_string_dtype(df[col]) or 
-                            pd.api.types.is_categorical_dtype(df[col]) else {})
-                    },
-                    "sample_values": df[col].dropna().head(3).tolist(),
-                    **({
-                        "distribution": {
-                            "bins": np.linspace(
-                                int(df[col].min()), 
-                                int(df[col].max()) + (0 if df[col].max().is_integer() else 1),
-                                10, 
-                                dtype=int
-                            ).tolist(),
-                            "counts": np.histogram(
-                                df[col].dropna(),
-                                bins=np.linspace(
-                                    int(df[col].min()),
-                                    int(df[col].max()) + (0 if df[col].max().is_integer() else 1),
-                                    10,
-                                    dtype=int
-                                )
-                            )[0].tolist()
-                        }
-                    } if pd.api.types.is_numeric_dtype(df[col]) else {}),
-                    **({
-                        "distribution": {
-                            "categories": df[col].value_counts().head(10).index.tolist(),
-                            "counts": df[col].value_counts().head(10).values.tolist()
-                        }
-                    } if pd.api.types.is_string_dtype(df[col]) or 
-                        pd.api.types.is_categorical_dtype(df[col]) else {})
-                } for col in df.columns
-            },
-            "correlation": {
-                "matrix": corr_matrix.to_dict() if corr_matrix is not None else None,
-                "highly_correlated": self.get_highly_correlated_pairs(corr_matrix, threshold=0.7) 
-                                   if corr_matrix is not None else None
-            }
-        }
-        return profile
\ No newline at end of file
+    def generate_data_profile(self, df: pd.DataFrame, exact: bool = False) -> dict:
+        """Generate comprehensive data profile (sampled for very large frames unless ``exact``)"""
+        with span("profile"):
+            return profile_frame(df, exact=exact)
@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from fastapi.concurrency import run_in_threadpool
+from tracing import span
+
+# Comma-separated subsystems to load in the background at startup, e.g. "ml,finbert"
+WARMUP = [name.strip() for name in os.getenv("WARMUP", "").split(",") if name.strip()]
+
+IDLE = "idle"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class Subsystem:
+    """A heavy dependency built on first use, once per process"""
+
+    def __init__(self, name: str, factory: Callable[[], object]):
+        self.name = name
+        self.factory = factory
+        self.state = IDLE
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self.state == READY:
+            return self._value
+        with self._lock:
+            if self.state != READY:
+                self.state = LOADING
+                started = time.perf_counter()
+                try:
+                    with span("subsystem_load", self.name):
+                        self._value = self.factory()
+                except Exception as e:
+                    self.state = FAILED
+                    self.error = str(e)
+                    raise
+                self.load_seconds = round(time.perf_counter() - started, 3)
+                self.error = None
+                self.state = READY
+                print(f"Loaded {self.name} in {self.load_seconds}s")
+        return self._value
+
+    def status(self) -> Dict:
+        return {"state": self.state, "load_seconds": self.load_seconds, "error": self.error}
+
+
+class Subsystems:
+    """Named lazy subsystems plus an optional background warm-up"""
+
+    def __init__(self):
+        self._subsystems: Dict[str, Subsystem] = {}
+        self.warmup: List[str] = []
+
+    def register(self, name: str, factory: Callable[[], object]) -> Subsystem:
+        self._subsystems[name] = Subsystem(name, factory)
+        return self._subsystems[name]
+
+    def get(self, name: str):
+        return self._subsystems[name].get()
+
+    async def aget(self, name: str):
+        """``get`` for async routes: a first load runs off the event loop"""
+        subsystem = self._subsystems[name]
+        if subsystem.state == READY:
+            return subsystem.get()
+        return await run_in_threadpool(subsystem.get)
+
+    def start_warmup(self, names: List[str] = WARMUP) -> Optional[threading.Thread]:
+        """Load ``names`` one after another on a daemon thread; requests that need one sooner load it themselves"""
+        unknown = [name for name in names if name not in self._subsystems]
+        if unknown:
+            raise ValueError(f"Unknown warm-up subsystems: {', '.join(unknown)}")
+        self.warmup = list(names)
+        if not names:
+            return None
+
+        def run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"Warm-up of {name} failed: {e}")
+
+        thread = threading.Thread(target=run, name="warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def ready(self) -> bool:
+        """True once every warm-up subsystem has loaded"""
+        return all(self._subsystems[name].state == READY for name in self.warmup)
+
+    def status(self) -> Dict:
+        return {
+            name: {**subsystem.status(), "warmup": name in self.warmup}
+            for name, subsystem in self._subsystems.items()
+        }
@@ -0,0 +1,25 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from ml.ingest import _combine, read_csv_chunks
+
+
+def test_column_that_turns_to_text_in_a_later_chunk():
+    csv = "id,code\n" + "".join(f"{i},{i * 10}\n" for i in range(4)) + "4,A7\n5,B9\n"
+    df, original_rows = read_csv_chunks(io.BytesIO(csv.encode("utf-8")), chunk_rows=4)
+
+    assert original_rows == 6
+    assert df["code"].tolist() == ["0", "10", "20", "30", "A7", "B9"]
+    assert df["id"].tolist() == list(range(6))
+
+
+def test_mixed_chunks_keep_missing_values_missing():
+    numbers = pd.DataFrame({"code": [1.5, np.nan]})
+    text = pd.DataFrame({"code": pd.Series(["A7", None], dtype=object)})
+
+    combined = _combine([numbers, text], ["code"])
+
+    assert combined["code"].tolist()[0] == "1.5" and combined["code"].tolist()[2] == "A7"
+    assert combined["code"].isna().tolist() == [False, True, False, True]
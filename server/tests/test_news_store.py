@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from trading.news_store import LocalNewsAPI, NewsArchive, NewsFetchError
+
+SYMBOL = "SPY"
+
+
+def articles(start: datetime, days: int, per_day: int = 2):
+    return [
+        {"id": f"{day}-{i}", "symbols": [SYMBOL],
+         "created_at": (start + timedelta(days=day, hours=9 + i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+         "headline": f"headline {day}-{i}"}
+        for day in range(days) for i in range(per_day)
+    ]
+
+
+class FlakyNewsAPI(LocalNewsAPI):
+    def __init__(self, articles, failures: int):
+        super().__init__(articles)
+        self.failures = failures
+
+    def get_news(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("news endpoint unavailable")
+        return super().get_news(*args, **kwargs)
+
+
+@pytest.fixture
+def api():
+    return LocalNewsAPI(articles(datetime(2023, 1, 1), 31))
+
+
+def test_top_up_fetches_only_missing_days(tmp_path, api):
+    archive = NewsArchive(api=api, path=str(tmp_path / "news.sqlite"))
+
+    first = archive.headlines(SYMBOL, "2023-01-05", "2023-01-10")
+    assert len(first) == 10
+    assert api.calls == [(SYMBOL, "2023-01-05", "2023-01-10")]
+
+    archive.headlines(SYMBOL, "2023-01-06", "2023-01-09")
+    assert len(api.calls) == 1
+
+    widened = archive.headlines(SYMBOL, "2023-01-01", "2023-01-15")
+    assert len(widened) == 28
+    assert api.calls[1:] == [(SYMBOL, "2023-01-01", "2023-01-05"), (SYMBOL, "2023-01-10", "2023-01-15")]
+
+
+def test_missing_ranges_track_per_day_coverage(tmp_path, api):
+    archive = NewsArchive(api=api, path=str(tmp_path / "news.sqlite"))
+    archive.headlines(SYMBOL, "2023-01-03", "2023-01-05")
+    archive.headlines(SYMBOL, "2023-01-08", "2023-01-09")
+
+    assert archive.missing_ranges(SYMBOL, "2023-01-01", "2023-01-10") == [
+        (datetime(2023, 1, 1), datetime(2023, 1, 3)),
+        (datetime(2023, 1, 5), datetime(2023, 1, 8)),
+        (datetime(2023, 1, 9), datetime(2023, 1, 10)),
+    ]
+    assert archive.covered(SYMBOL, "2023-01-03", "2023-01-05")
+    assert not archive.covered(SYMBOL, "2023-01-03", "2023-01-06")
+    # Coverage is per symbol
+    assert archive.missing_ranges("QQQ", "2023-01-03", "2023-01-05") == [(datetime(2023, 1, 3), datetime(2023, 1, 5))]
+
+
+def test_days_from_today_on_are_never_covered(tmp_path):
+    today = datetime.now(timezone.utc).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    archive = NewsArchive(api=LocalNewsAPI([]), path=str(tmp_path / "news.sqlite"))
+    archive.headlines(SYMBOL, today - timedelta(days=3), today + timedelta(days=2))
+
+    assert archive.missing_ranges(SYMBOL, today - timedelta(days=3), today + timedelta(days=2)) == [
+        (today, today + timedelta(days=2))
+    ]
+
+
+def test_query_orders_by_publication_time(tmp_path):
+    raw = articles(datetime(2023, 1, 1), 3)
+    archive = NewsArchive(api=LocalNewsAPI(list(reversed(raw))), path=str(tmp_path / "news.sqlite"))
+
+    frame = archive.headlines(SYMBOL, "2023-01-01", "2023-01-04")
+    assert frame["headline"].tolist() == [article["headline"] for article in raw]
+    assert list(frame.columns) == ["date", "created_at", "headline"]
+    assert frame["date"].dt.strftime("%Y-%m-%d").tolist() == ["2023-01-01"] * 2 + ["2023-01-02"] * 2 + ["2023-01-03"] * 2
+
+
+def test_offline_mode_serves_archive_without_fetching(tmp_path, api):
+    path = str(tmp_path / "news.sqlite")
+    NewsArchive(api=api, path=path).headlines(SYMBOL, "2023-01-01", "2023-01-05")
+    calls = len(api.calls)
+
+    offline = NewsArchive(api=api, path=path, offline=True)
+    assert len(offline.headlines(SYMBOL, "2023-01-01", "2023-01-10")) == 8
+    assert len(api.calls) == calls
+    # Without an API the archive is offline too
+    assert NewsArchive(api=None, path=path).offline
+
+
+def test_failed_fetch_raises_and_leaves_days_uncovered(tmp_path):
+    api = FlakyNewsAPI(articles(datetime(2023, 1, 1), 10), failures=1)
+    archive = NewsArchive(api=api, path=str(tmp_path / "news.sqlite"))
+
+    with pytest.raises(NewsFetchError) as error:
+        archive.headlines(SYMBOL, "2023-01-01", "2023-01-05")
+    assert error.value.failures[0][:2] == (datetime(2023, 1, 1), datetime(2023, 1, 5))
+    assert not archive.covered(SYMBOL, "2023-01-01", "2023-01-05")
+
+    # The next call retries the span
+    assert len(archive.headlines(SYMBOL, "2023-01-01", "2023-01-05")) == 8
+    assert archive.covered(SYMBOL, "2023-01-01", "2023-01-05")
@@ -0,0 +1,122 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from ml.profiling import highly_correlated_pairs, profile_frame
+
+
+def baseline_profile(df: pd.DataFrame) -> dict:
+    """The profile as generated before the vectorized profiler.
+
+    Bool columns are read as 0/1 floats for their statistics; the original code
+    took the same numeric branch for them but pandas can no longer take a bool
+    quantile.
+    """
+    numeric_cols = df.select_dtypes(include=['number']).columns
+    corr_matrix = df[numeric_cols].corr().round(2) if len(numeric_cols) > 1 else None
+
+    def values(col):
+        return df[col].astype(float) if pd.api.types.is_bool_dtype(df[col]) else df[col]
+
+    def bins(col):
+        return np.linspace(int(values(col).min()),
+                           int(values(col).max()) + (0 if values(col).max().is_integer() else 1), 10, dtype=int)
+
+    return {
+        "overview": {
+            "rows": len(df),
+            "columns": len(df.columns),
+            "missing_values": int(df.isna().sum().sum()),
+            "duplicate_rows": int(df.duplicated().sum())
+        },
+        "columns": {
+            col: {
+                "type": str(df[col].dtype),
+                "missing": int(df[col].isna().sum()),
+                "unique": int(df[col].nunique()),
+                "stats": {
+                    **({
+                        "mean": float(values(col).mean()),
+                        "min": float(values(col).min()),
+                        "max": float(values(col).max()),
+                        "std": float(values(col).std()),
+                        "quantiles": {
+                            "25%": float(values(col).quantile(0.25)),
+                            "50%": float(values(col).quantile(0.50)),
+                            "75%": float(values(col).quantile(0.75))
+                        }
+                    } if pd.api.types.is_numeric_dtype(df[col]) else {}),
+                    **({
+                        "value_counts": df[col].value_counts().head(10).to_dict(),
+                        "top_values": df[col].value_counts().head(3).to_dict()
+                    } if pd.api.types.is_string_dtype(df[col])
+                        or isinstance(df[col].dtype, pd.CategoricalDtype) else {})
+                },
+                "sample_values": df[col].dropna().head(3).tolist(),
+                **({
+                    "distribution": {
+                        "bins": bins(col).tolist(),
+                        "counts": np.histogram(values(col).dropna(), bins=bins(col))[0].tolist()
+                    }
+                } if pd.api.types.is_numeric_dtype(df[col]) else {}),
+                **({
+                    "distribution": {
+                        "categories": df[col].value_counts().head(10).index.tolist(),
+                        "counts": df[col].value_counts().head(10).values.tolist()
+                    }
+                } if pd.api.types.is_string_dtype(df[col])
+                    or isinstance(df[col].dtype, pd.CategoricalDtype) else {})
+            } for col in df.columns
+        },
+        "correlation": {
+            "matrix": corr_matrix.to_dict() if corr_matrix is not None else None,
+            "highly_correlated": highly_correlated_pairs(corr_matrix, threshold=0.7)
+            if corr_matrix is not None else None
+        }
+    }
+
+
+def assert_same(actual, expected, path="profile"):
+    if isinstance(expected, dict):
+        assert isinstance(actual, dict) and set(actual) == set(expected), path
+        for key in expected:
+            assert_same(actual[key], expected[key], f"{path}.{key}")
+    elif isinstance(expected, list):
+        assert isinstance(actual, list) and len(actual) == len(expected), path
+        for i, (a, e) in enumerate(zip(actual, expected)):
+            assert_same(a, e, f"{path}[{i}]")
+    elif isinstance(expected, float) and math.isnan(expected):
+        assert isinstance(actual, float) and math.isnan(actual), path
+    elif isinstance(expected, float):
+        assert math.isclose(actual, expected, rel_tol=1e-9, abs_tol=1e-12), path
+    else:
+        assert actual == expected and type(actual) is type(expected), path
+
+
+def mixed_frame(rows=500):
+    rng = np.random.default_rng(0)
+    base = rng.normal(size=rows)
+    df = pd.DataFrame({
+        "count": rng.integers(0, 50, rows),
+        "price": base * 10 + 100,
+        "price_copy": base * 20 - 3,
+        "ratio": rng.uniform(size=rows),
+        "active": rng.random(rows) < 0.3,
+        "city": rng.choice(["Austin", "Boston", "Chicago", "Denver"], rows),
+        "tier": pd.Categorical(rng.choice(["gold", "silver"], rows), categories=["bronze", "gold", "silver"]),
+        "constant": 7.0,
+    })
+    df.loc[rng.choice(rows, 40, replace=False), "ratio"] = np.nan
+    df.loc[rng.choice(rows, 25, replace=False), "city"] = None
+    return pd.concat([df, df.head(5)], ignore_index=True)
+
+
+def test_profile_matches_baseline_on_mixed_types():
+    df = mixed_frame()
+    profile = profile_frame(df, exact=True)
+
+    assert_same(profile, baseline_profile(df))
+    assert profile["columns"]["active"]["type"] == "bool"
+    assert profile["columns"]["active"]["stats"]["max"] == 1.0
+    assert "active" not in profile["correlation"]["matrix"]
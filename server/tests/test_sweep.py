@@ -0,0 +1,31 @@
+import asyncio
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from trading import sweep
+
+
+async def _collect(cases):
+    return [outcome async for outcome in sweep.run_sweep(cases)]
+
+
+def test_broken_pool_is_replaced(monkeypatch):
+    # A worker that dies in its initializer breaks the pool like an OOM kill would
+    broken = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=sys.exit)
+    monkeypatch.setattr(sweep, "_executor", broken)
+    cases = sweep.sweep_cases(["SPY"], [("2020-01-01", "2020-06-01")], [0.5], [0.9, 0.99])
+
+    outcomes = asyncio.run(_collect(cases))
+
+    assert len(outcomes) == 2
+    assert all("Sweep worker process died" in outcome["error"] for outcome in outcomes)
+    assert sorted(o["params"]["sentiment_threshold"] for o in outcomes) == [0.9, 0.99]
+    assert sweep._executor is None
+    fresh = sweep.get_executor()
+    try:
+        assert fresh is not broken
+    finally:
+        fresh.shutdown()
+        monkeypatch.setattr(sweep, "_executor", None)
@@ -0,0 +1,48 @@
+import multiprocessing
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.linear_model import LogisticRegression
+
+from ml import isolated
+from mlPipeline import run_tournament
+
+
+class SlowClassifier(BaseEstimator, ClassifierMixin):
+    def __init__(self, seconds=300.0):
+        self.seconds = seconds
+
+    def fit(self, X, y):
+        time.sleep(self.seconds)
+        return self
+
+    def predict(self, X):
+        return np.zeros(len(X))
+
+
+@pytest.fixture(autouse=True)
+def no_idle_workers():
+    yield
+    while isolated._idle:
+        isolated._idle.pop().kill()
+
+
+def test_timed_out_fit_is_killed():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, 4))
+    y = pd.Series((X[:, 0] > 0).astype(int))
+
+    started = time.monotonic()
+    fitted, results, skipped = run_tournament(
+        {"Slow": SlowClassifier(), "Logistic": LogisticRegression()},
+        X[:150], y[:150], X[150:], y[150:], True, max_workers=2, time_budget=20
+    )
+
+    assert time.monotonic() - started < 60
+    assert list(results) == ["Logistic"] and results["Logistic"] > 0.8
+    assert "Exceeded time budget" in skipped["Slow"]
+    # The over-budget fit was killed rather than left running; only the idle worker that fitted Logistic is left
+    assert [worker.process for worker in isolated._idle] == multiprocessing.active_children()
@@ -0,0 +1,179 @@
+import pytest
+from banking.transactions import LocalPlaid, SyncRestart, TransactionStore, TransactionSync
+
+TOKEN = "access-sandbox-1"
+ITEM = "item-1"
+
+
+def transaction(n: int, day: int, amount: float = 10.0, **fields):
+    return {"transaction_id": f"t{n}", "account_id": "acc-1", "date": f"2024-01-{day:02d}", "amount": amount,
+            "name": f"Merchant {n}", "merchant_name": f"Merchant {n}",
+            "personal_finance_category": {"primary": "GENERAL_MERCHANDISE"}, "pending": False, **fields}
+
+
+class RestartingPlaid(LocalPlaid):
+    """Reports a mutation during pagination on the first ``restarts`` follow-up pages"""
+
+    def __init__(self, *args, restarts: int = 1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.restarts = restarts
+
+    def transactions_sync(self, access_token, cursor=None, count=500):
+        if cursor and self.restarts:
+            self.restarts -= 1
+            raise SyncRestart()
+        return super().transactions_sync(access_token, cursor, count)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TransactionStore(str(tmp_path / "banking.sqlite"))
+
+
+def make_sync(api, store, page_size=500):
+    store.upsert_item(ITEM, TOKEN, "user-1", "ins_1")
+    return TransactionSync(api, store, interval=300, page_size=page_size)
+
+
+def stored_ids(store):
+    return sorted(t["transaction_id"] for t in store.query([ITEM], limit=500)["transactions"])
+
+
+def test_initial_and_incremental_sync_follow_the_cursor(store):
+    api = LocalPlaid({TOKEN: [transaction(i, i) for i in range(1, 6)]})
+    sync = make_sync(api, store)
+
+    assert sync.sync(ITEM)["added"] == 5
+    cursor = store.item(ITEM)["cursor"]
+    assert cursor == "5"
+    assert store.item(ITEM)["synced_at"] is not None
+
+    api.add(TOKEN, [transaction(6, 6)])
+    result = sync.sync(ITEM)
+    assert result["added"] == 1 and result["dates"] == ["2024-01-06"]
+    # The incremental call resumed from the saved cursor
+    assert api.calls[-1] == (TOKEN, cursor)
+    assert stored_ids(store) == [f"t{i}" for i in range(1, 7)]
+
+
+def test_has_more_pages_are_applied_together(store):
+    api = LocalPlaid({TOKEN: [transaction(i, i) for i in range(1, 8)]})
+    sync = make_sync(api, store, page_size=3)
+
+    assert sync.sync(ITEM)["added"] == 7
+    assert [cursor for _, cursor in api.calls] == [None, "3", "6"]
+    assert store.item(ITEM)["cursor"] == "7"
+    assert len(stored_ids(store)) == 7
+
+
+def test_modify_and_remove(store):
+    api = LocalPlaid({TOKEN: [transaction(1, 1), transaction(2, 2), transaction(3, 3)]})
+    sync = make_sync(api, store)
+    sync.sync(ITEM)
+
+    api.modify(TOKEN, [transaction(1, 4, amount=99.0)])
+    api.remove(TOKEN, ["t2"])
+    result = sync.sync(ITEM)
+
+    assert (result["modified"], result["removed"]) == (1, 1)
+    # Both the old and new date of the moved transaction changed, and the removed one's date
+    assert result["dates"] == ["2024-01-01", "2024-01-02", "2024-01-04"]
+    page = store.query([ITEM])
+    assert [t["transaction_id"] for t in page["transactions"]] == ["t1", "t3"]
+    assert page["transactions"][0]["amount"] == 99.0
+    assert store.changed_dates([ITEM], 0) == {"2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04"}
+
+
+def test_mutation_during_pagination_restarts_from_saved_cursor(store):
+    api = RestartingPlaid({TOKEN: [transaction(i, i) for i in range(1, 6)]}, restarts=1)
+    sync = make_sync(api, store, page_size=2)
+
+    assert sync.sync(ITEM)["added"] == 5
+    # The first attempt's page was discarded and the second attempt started again from no cursor
+    assert [cursor for _, cursor in api.calls] == [None, None, "2", "4"]
+    assert stored_ids(store) == [f"t{i}" for i in range(1, 6)]
+
+
+def test_sync_gives_up_without_moving_the_cursor(store):
+    api = RestartingPlaid({TOKEN: [transaction(i, i) for i in range(1, 6)]}, restarts=100)
+    sync = make_sync(api, store, page_size=2)
+
+    with pytest.raises(RuntimeError):
+        sync.sync(ITEM)
+    assert store.item(ITEM)["cursor"] is None
+    assert stored_ids(store) == []
+
+
+def test_query_pagination_and_date_filters(store):
+    api = LocalPlaid({TOKEN: [transaction(i, i) for i in range(1, 11)]})
+    make_sync(api, store).sync(ITEM)
+
+    first = store.query([ITEM], limit=4)
+    assert first["total"] == 10 and first["next_offset"] == 4
+    assert [t["date"] for t in first["transactions"]] == ["2024-01-10", "2024-01-09", "2024-01-08", "2024-01-07"]
+    last = store.query([ITEM], limit=4, offset=8)
+    assert [t["transaction_id"] for t in last["transactions"]] == ["t2", "t1"]
+    assert last["next_offset"] is None
+
+    window = store.query([ITEM], start_date="2024-01-03", end_date="2024-01-05")
+    assert window["total"] == 3
+    assert [t["transaction_id"] for t in window["transactions"]] == ["t5", "t4", "t3"]
+    assert store.query([ITEM], start_date="2024-02-01")["total"] == 0
+    assert store.query([], limit=10)["transactions"] == []
+
+
+def test_unknown_tokens_are_not_registered(store):
+    api = LocalPlaid({TOKEN: [transaction(1, 1)]}, items={TOKEN: ITEM})
+    sync = TransactionSync(api, store)
+
+    assert store.item_for_token(TOKEN) is None
+    sync.link_item(ITEM, TOKEN, "user-1")
+    assert store.item_for_token(TOKEN)["item_id"] == ITEM
+    assert store.item_for_token("access-unlinked") is None
+
+
+def test_link_requires_the_token_to_belong_to_the_item(store):
+    api = LocalPlaid({TOKEN: [transaction(1, 1)]}, items={TOKEN: ITEM, "access-sandbox-2": "item-2"})
+    sync = TransactionSync(api, store)
+
+    with pytest.raises(ValueError):
+        sync.link_item(ITEM, "access-sandbox-2", "user-1")
+    with pytest.raises(ValueError):
+        sync.link_item(ITEM, "access-forged", "user-1")
+    assert store.item(ITEM) is None
+
+    assert sync.link_item(ITEM, TOKEN, "user-1", "ins_1")["user_id"] == "user-1"
+
+
+def test_linked_item_cannot_be_rebound_to_another_user(store):
+    api = LocalPlaid({TOKEN: [transaction(1, 1)]}, items={TOKEN: ITEM})
+    sync = TransactionSync(api, store)
+    sync.link_item(ITEM, TOKEN, "victim")
+
+    with pytest.raises(PermissionError):
+        sync.link_item(ITEM, TOKEN, "attacker")
+    # Straight to the store, with a token Plaid was never asked about
+    with pytest.raises(PermissionError):
+        store.upsert_item(ITEM, "access-attacker", "attacker")
+    item = store.item(ITEM)
+    assert (item["user_id"], item["access_token"]) == ("victim", TOKEN)
+    assert store.items_for_user("attacker") == []
+
+
+def test_forged_user_id_needs_that_users_session(store):
+    api = LocalPlaid(items={TOKEN: ITEM, "access-sandbox-2": "item-2", "access-sandbox-3": "item-3"})
+    sync = TransactionSync(api, store)
+    sync.link_item(ITEM, TOKEN, "victim")
+
+    # An attacker's own, valid item cannot be used to claim the victim's user id
+    with pytest.raises(PermissionError):
+        sync.link_item("item-2", "access-sandbox-2", "victim")
+    with pytest.raises(PermissionError):
+        sync.link_item("item-2", "access-sandbox-2", "victim",
+                       session_user=store.session_user(store.create_session("attacker")))
+    assert [item["item_id"] for item in store.items_for_user("victim")] == [ITEM]
+
+    # The victim's own session can link another item
+    session = store.create_session("victim")
+    sync.link_item("item-3", "access-sandbox-3", "victim", session_user=store.session_user(session))
+    assert [item["item_id"] for item in store.items_for_user("victim")] == [ITEM, "item-3"]
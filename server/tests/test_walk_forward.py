@@ -0,0 +1,42 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_prices
+from trading import walk_forward
+
+
+@pytest.fixture
+def inputs():
+    prices = make_prices(datetime(2015, 1, 1), 365 * 4)
+    rng = np.random.default_rng(0)
+    sentiment = pd.DataFrame({"probability": rng.uniform(0.99, 1.0, len(prices)),
+                              "sentiment": rng.choice(["positive", "negative", "neutral"], len(prices))},
+                             index=pd.DatetimeIndex(prices.index))
+    windows = walk_forward.walk_forward_windows(datetime(2015, 1, 1), datetime(2018, 12, 1), 180, 30, "anchored")
+    return prices, sentiment, windows
+
+
+def test_process_pool_matches_serial(inputs, monkeypatch):
+    prices, sentiment, windows = inputs
+    serial = walk_forward.run_walk_forward(prices, sentiment, windows, max_workers=1)
+
+    monkeypatch.setattr(walk_forward, "WALK_FORWARD_WORKERS", 2)
+    monkeypatch.setattr(walk_forward, "WALK_FORWARD_PARALLEL_SECONDS", 0.0)
+    monkeypatch.setattr(walk_forward, "_executor", None)
+    submitted = []
+    original = walk_forward._run_on_pool
+    monkeypatch.setattr(walk_forward, "_run_on_pool", lambda *args: submitted.append(args) or original(*args))
+    try:
+        parallel = walk_forward.run_walk_forward(prices, sentiment, windows, max_workers=2)
+        # The pool is still there, so the windows did not fall back to running in-process
+        assert walk_forward._executor is not None
+    finally:
+        if walk_forward._executor is not None:
+            walk_forward._executor.shutdown()
+
+    assert submitted
+    assert parallel == serial
+    assert [w["start_date"] for w in parallel["windows"]] == [w["start_date"] for w in serial["windows"]]
@@ -0,0 +1,221 @@
+import contextvars
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Per-request sampling profiles are only honoured when this is switched on
+TRACE_PROFILING = os.getenv("TRACE_PROFILING", "false").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("TRACE_PROFILE_DIR", os.path.join("cache", "profiles"))
+PROFILE_INTERVAL = float(os.getenv("TRACE_PROFILE_INTERVAL_MS", "5")) / 1000
+# Innermost frames of threads that are blocked waiting for work rather than running
+IDLE_FRAMES = {"threading.py:wait", "thread.py:_worker", "selectors.py:select", "queue.py:get"}
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs) -> str:
+    pairs = [(name, value) for name, value in pairs if value != ""]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus text format, one series per label set"""
+
+    def __init__(self, name: str, help: str, label_names: Tuple[str, ...], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple, List] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            counts = self._series.get(key)
+            if counts is None:
+                # Per-bucket counts, then the sum and the total count
+                counts = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(counts) for key, counts in self._series.items()}
+        for key, counts in sorted(series.items()):
+            pairs = list(zip(self.label_names, key))
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(pairs + [('le', repr(bound))])} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(pairs + [('le', '+Inf')])} {counts[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(pairs)} {counts[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(pairs)} {counts[-1]}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to produce the response, by route", ("method", "route", "status")
+)
+SPAN_SECONDS = Histogram(
+    "span_duration_seconds", "Time spent in instrumented hot paths", ("span", "detail")
+)
+JOB_SECONDS = Histogram(
+    "job_duration_seconds", "Background job run time", ("kind", "status")
+)
+METRICS = [REQUEST_SECONDS, SPAN_SECONDS, JOB_SECONDS]
+
+
+def render_metrics() -> str:
+    """All metrics of this worker process in the Prometheus text exposition format"""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class Trace:
+    """Spans recorded while handling one request, across the threads it hands work to"""
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self._lock = threading.Lock()
+        self.spans: List[Tuple[str, float]] = []
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self.spans.append((name, seconds))
+
+    def server_timing(self, total: float) -> str:
+        """``Server-Timing`` header value: total milliseconds and call count per span name"""
+        totals: Dict[str, List] = {}
+        with self._lock:
+            for name, seconds in self.spans:
+                entry = totals.setdefault(name, [0.0, 0])
+                entry[0] += seconds
+                entry[1] += 1
+        parts = [f"total;dur={total * 1000:.1f}"]
+        for name, (seconds, count) in totals.items():
+            parts.append(f'{name};dur={seconds * 1000:.1f};desc="x{count}"')
+        return ", ".join(parts)
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+
+
+@contextmanager
+def span(name: str, detail: str = ""):
+    """Time a block into ``span_duration_seconds`` and the current request's trace"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        SPAN_SECONDS.observe(seconds, span=name, detail=detail)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(name, seconds)
+
+
+class SamplingProfiler:
+    """Samples every thread's stack at a fixed interval into folded (flamegraph) stacks"""
+
+    _active = threading.Lock()
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> bool:
+        """Start sampling; False if another profile is already running"""
+        if not SamplingProfiler._active.acquire(blocking=False):
+            return False
+        self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        SamplingProfiler._active.release()
+        return self.samples
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                # Skip threads that are only parked waiting for work
+                if stack and stack[0] not in IDLE_FRAMES:
+                    self.samples[";".join(reversed(stack))] += 1
+
+    def save(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def copy_context_run(fn):
+    """Wrap ``fn`` so it runs in a copy of the caller's context (keeps spans on the request's trace)"""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+async def trace_request(request, call_next):
+    """HTTP middleware body: request histogram, ``Server-Timing`` header and optional profile.
+
+    A request opts into sampling with ``?profile=1`` or an ``X-Profile: 1`` header
+    when ``TRACE_PROFILING`` is enabled; the folded stacks are written under
+    ``PROFILE_DIR`` and named in the ``X-Profile`` response header. Streaming
+    responses are timed until their headers are ready.
+    """
+    trace = Trace()
+    token = _current_trace.set(trace)
+    profiler = None
+    if TRACE_PROFILING and "1" in (request.query_params.get("profile"), request.headers.get("x-profile")):
+        profiler = SamplingProfiler()
+        if not profiler.start():
+            profiler = None
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        total = time.perf_counter() - started
+        _current_trace.reset(token)
+        route = request.scope.get("route")
+        REQUEST_SECONDS.observe(total, method=request.method, route=getattr(route, "path", "unmatched"),
+                                status=status)
+        if profiler is not None:
+            profiler.stop()
+
+    response.headers["Server-Timing"] = trace.server_timing(total)
+    response.headers["X-Trace-Id"] = trace.trace_id
+    if profiler is not None:
+        name = f"{trace.trace_id}.folded"
+        profiler.save(os.path.join(PROFILE_DIR, name))
+        response.headers["X-Profile"] = name
+    return response
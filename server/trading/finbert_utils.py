@@ -1,28 +1,276 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
-from typing import Tuple 
-device = "cuda:0" if torch.cuda.is_available() else "cpu"
+import numpy as np
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Tuple
+from tracing import span
+MODEL_NAME = "ProsusAI/finbert"
+CACHE_PATH = os.getenv("FINBERT_CACHE_PATH", os.path.join("cache", "finbert_logits.sqlite"))
+CACHE_MAX_ENTRIES = int(os.getenv("FINBERT_CACHE_MAX_ENTRIES", "200000"))
+BATCH_SIZE = int(os.getenv("FINBERT_BATCH_SIZE", "32"))
+# Inference backend: "torch" (fp32), "int8" (dynamically quantized torch) or "onnx" (ONNX Runtime)
+BACKENDS = ("torch", "int8", "onnx")
+BACKEND = os.getenv("FINBERT_BACKEND", "torch").lower()
+ONNX_PATH = os.getenv("FINBERT_ONNX_PATH", os.path.join("cache", "finbert.onnx"))
+# Intra-op threads for torch and ONNX Runtime; 0 keeps the library default
+THREADS = int(os.getenv("FINBERT_THREADS", "0"))
 
-tokenizer = AutoTokenizer.from_pretrained("ProsusAI/finbert")
-model = AutoModelForSequenceClassification.from_pretrained("ProsusAI/finbert").to(device)
 labels = ["positive", "negative", "neutral"]
 
+_engine = None
+_engine_lock = threading.Lock()
+
+
+class TorchBackend:
+    """FinBERT in PyTorch, either fp32 or with dynamically int8-quantized linear layers"""
+
+    def __init__(self, model, name: str = "torch"):
+        self.model = model
+        self.name = name
+
+    def infer(self, tokenizer, batch: List[str]) -> np.ndarray:
+        import torch
+        with torch.inference_mode():
+            with span("tokenize", self.name):
+                tokens = tokenizer(batch, return_tensors="pt", padding=True, truncation=True).to(self.model.device)
+            with span("inference", self.name):
+                result = self.model(tokens["input_ids"], attention_mask=tokens["attention_mask"])["logits"]
+        return result.float().cpu().numpy()
+
+
+class OnnxBackend:
+    """FinBERT exported to ONNX and run with ONNX Runtime on the CPU"""
+
+    name = "onnx"
+
+    def __init__(self, session):
+        self.session = session
+        self.input_names = {i.name for i in session.get_inputs()}
+
+    def infer(self, tokenizer, batch: List[str]) -> np.ndarray:
+        with span("tokenize", self.name):
+            tokens = tokenizer(batch, return_tensors="np", padding=True, truncation=True)
+        feed = {name: tokens[name].astype(np.int64) for name in self.input_names}
+        with span("inference", self.name):
+            return self.session.run(["logits"], feed)[0]
+
+
+def export_onnx(model, path: str = ONNX_PATH):
+    """Export the fp32 model with dynamic batch and sequence axes, written atomically"""
+    import torch
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    dummy = torch.ones((1, 8), dtype=torch.long)
+    axes = {0: "batch", 1: "sequence"}
+    tmp = f"{path}.{os.getpid()}.tmp"
+    torch.onnx.export(
+        model.cpu(),
+        (dummy, dummy),
+        tmp,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={"input_ids": axes, "attention_mask": axes, "logits": {0: "batch"}},
+        opset_version=17
+    )
+    os.replace(tmp, path)
+
+
+def load_model(backend: str = BACKEND):
+    """Load the FinBERT tokenizer and an inference backend; torch and transformers are imported here.
+
+    ``torch`` is the fp32 reference; ``int8`` quantizes the linear layers
+    dynamically; ``onnx`` exports the model to ``ONNX_PATH`` once and serves it
+    with ONNX Runtime. The quantized and ONNX backends always run on the CPU.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown FinBERT backend: {backend}")
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    import torch
+    if THREADS:
+        torch.set_num_threads(THREADS)
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    if backend == "onnx":
+        import onnxruntime as ort
+        if not os.path.exists(ONNX_PATH):
+            print(f"Exporting {MODEL_NAME} to {ONNX_PATH}")
+            export_onnx(AutoModelForSequenceClassification.from_pretrained(MODEL_NAME).eval())
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if THREADS:
+            options.intra_op_num_threads = THREADS
+        return tokenizer, OnnxBackend(ort.InferenceSession(ONNX_PATH, options, providers=["CPUExecutionProvider"]))
+
+    model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
+    model.eval()
+    if backend == "int8":
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return tokenizer, TorchBackend(model, "int8")
+    device = "cuda:0" if torch.cuda.is_available() else "cpu"
+    return tokenizer, TorchBackend(model.to(device))
+
+
+def backend_namespace(backend: str = BACKEND) -> str:
+    """Cache namespace per backend; fp32 keeps the plain model name so existing caches stay valid"""
+    return MODEL_NAME if backend == "torch" else f"{MODEL_NAME}:{backend}"
+
+
+def headline_key(headline: str, namespace: str = MODEL_NAME) -> str:
+    """Content hash used as the cache key for a single headline"""
+    return hashlib.sha256(f"{namespace}\x00{headline}".encode("utf-8")).hexdigest()
+
+
+class LogitCache:
+    """Disk-backed cache of per-headline logits with least-recently-used eviction"""
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS logits ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_logits_last_used ON logits(last_used)")
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        if not keys:
+            return found
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM logits WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for key, value in rows:
+                    found[key] = np.frombuffer(value, dtype=np.float32)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE logits SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO logits (key, value, last_used) VALUES (?, ?, ?)",
+                [(key, np.asarray(value, dtype=np.float32).tobytes(), now) for key, value in items.items()]
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM logits").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM logits WHERE key IN "
+                "(SELECT key FROM logits ORDER BY last_used ASC LIMIT ?)",
+                (overflow,)
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM logits").fetchone()[0]
+
+
+class SentimentEngine:
+    """Scores headlines in micro-batches and reuses cached logits across calls.
+
+    ``model`` is an inference backend (``TorchBackend``/``OnnxBackend``).
+    """
+
+    def __init__(self, tokenizer, model, cache: LogitCache = None, batch_size: int = BATCH_SIZE,
+                 namespace: str = MODEL_NAME):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.cache = cache
+        self.batch_size = batch_size
+        self.namespace = namespace
+
+    def logits(self, headlines: List[str]) -> np.ndarray:
+        """Return an (n, 3) array of logits, one row per headline"""
+        if not headlines:
+            return np.zeros((0, len(labels)), dtype=np.float32)
+
+        keys = [headline_key(h, self.namespace) for h in headlines]
+        known = self.cache.get_many(list(set(keys))) if self.cache is not None else {}
+
+        missing = {}
+        for key, headline in zip(keys, headlines):
+            if key not in known and key not in missing:
+                missing[key] = headline
+
+        if missing:
+            scored = dict(zip(missing.keys(), self._infer(list(missing.values()))))
+            if self.cache is not None:
+                self.cache.put_many(scored)
+            known.update(scored)
+
+        return np.stack([known[key] for key in keys]).astype(np.float32)
+
+    def _infer(self, headlines: List[str]) -> np.ndarray:
+        outputs = []
+        for i in range(0, len(headlines), self.batch_size):
+            outputs.append(self.model.infer(self.tokenizer, headlines[i:i + self.batch_size]))
+        return np.concatenate(outputs).astype(np.float32)
+
+    def estimate(self, headlines: List[str]) -> Tuple[float, str]:
+        """Day-level sentiment: softmax over the summed headline logits"""
+        if not headlines:
+            return 0, labels[-1]
+        return combine_logits(self.logits(headlines))
+
+
+def combine_logits(logits: np.ndarray) -> Tuple[float, str]:
+    summed = np.asarray(logits, dtype=np.float64).sum(axis=0)
+    exp = np.exp(summed - summed.max())
+    probs = exp / exp.sum()
+    index = int(np.argmax(probs))
+    return float(probs[index]), labels[index]
+
+
+def get_engine() -> SentimentEngine:
+    """The shared engine, loading FinBERT with the configured backend on first use"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            tokenizer, model = load_model(BACKEND)
+            _engine = SentimentEngine(tokenizer, model, LogitCache(), namespace=backend_namespace(BACKEND))
+        return _engine
+
+
+def set_engine(engine: SentimentEngine):
+    """Replace the shared engine (benchmarks install a stub model this way)"""
+    global _engine
+    with _engine_lock:
+        _engine = engine
+
+
 def estimate_sentiment(news):
     if news:
-        tokens = tokenizer(news, return_tensors="pt", padding=True).to(device)
-
-        result = model(tokens["input_ids"], attention_mask=tokens["attention_mask"])[
-            "logits"
-        ]
-        result = torch.nn.functional.softmax(torch.sum(result, 0), dim=-1)
-        probability = result[torch.argmax(result)]
-        sentiment = labels[torch.argmax(result)]
-        return probability, sentiment
+        return get_engine().estimate(list(news))
     else:
         return 0, labels[-1]
 
 
 if __name__ == "__main__":
-    tensor, sentiment = estimate_sentiment(['markets responded negatively to the news!','traders were displeased!'])
-    print(tensor, sentiment)
-    print(torch.cuda.is_available())
\ No newline at end of file
+    import torch
+    probability, sentiment = estimate_sentiment(['markets responded negatively to the news!','traders were displeased!'])
+    print(probability, sentiment)
+    print(torch.cuda.is_available())
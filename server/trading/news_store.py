@@ -0,0 +1,207 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple
+import json
+import os
+import sqlite3
+import threading
+import pandas as pd
+from tracing import span
+
+ARCHIVE_PATH = os.getenv("NEWS_ARCHIVE_PATH", os.path.join("cache", "news_archive.sqlite"))
+NEWS_OFFLINE = os.getenv("NEWS_OFFLINE", "false").lower() in ("1", "true", "yes")
+NEWS_LIMIT = 100000
+
+
+class NewsFetchError(RuntimeError):
+    """Some dates of a requested range could not be fetched, so its headlines would be incomplete"""
+
+    def __init__(self, symbol: str, failures: List[Tuple[datetime, datetime, str]]):
+        self.failures = failures
+        spans = ", ".join(f"{start:%Y-%m-%d}..{end:%Y-%m-%d} ({error})" for start, end, error in failures)
+        super().__init__(f"News fetch failed for {symbol}: {spans}")
+
+
+def _day(value) -> datetime:
+    if isinstance(value, str):
+        value = datetime.strptime(value[:10], "%Y-%m-%d")
+    return datetime(value.year, value.month, value.day)
+
+
+def fetch_articles(api, symbol: str, start: datetime, end: datetime) -> List[dict]:
+    """Fetch every article for ``[start, end)`` from the Alpaca news endpoint in one paginated call"""
+    news = api.get_news(
+        symbol=symbol,
+        start=start.strftime('%Y-%m-%d'),
+        end=end.strftime('%Y-%m-%d'),
+        limit=NEWS_LIMIT
+    )
+    articles = []
+    for ev in news:
+        raw = ev.__dict__["_raw"]
+        articles.append({
+            "id": str(raw.get("id", f"{raw['created_at']}:{raw['headline']}")),
+            "created_at": raw["created_at"],
+            "headline": raw["headline"]
+        })
+    return articles
+
+
+class NewsArchive:
+    """Local (symbol, date) indexed archive of Alpaca headlines.
+
+    Days that have been fetched are recorded in a coverage table, so a range query only
+    goes to the API for the dates that are still missing. In offline mode the archive
+    never touches the network and serves whatever it already holds.
+    """
+
+    def __init__(self, api=None, path: str = ARCHIVE_PATH, offline: bool = NEWS_OFFLINE):
+        self.api = api
+        self.offline = offline or api is None
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS headlines (
+                symbol TEXT NOT NULL,
+                id TEXT NOT NULL,
+                date TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                headline TEXT NOT NULL,
+                PRIMARY KEY (symbol, id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_headlines_symbol_date ON headlines(symbol, date);
+            CREATE TABLE IF NOT EXISTS coverage (
+                symbol TEXT NOT NULL,
+                date TEXT NOT NULL,
+                PRIMARY KEY (symbol, date)
+            );
+        """)
+        self._conn.commit()
+
+    def headlines(self, symbol: str, start, end) -> pd.DataFrame:
+        """Headlines for ``[start, end)``, topping up missing dates unless offline.
+
+        Raises ``NewsFetchError`` when part of the range could not be fetched.
+        """
+        start, end = _day(start), _day(end)
+        if not self.offline:
+            failures = self.top_up(symbol, start, end)
+            if failures:
+                raise NewsFetchError(symbol, failures)
+        return self.query(symbol, start, end)
+
+    def query(self, symbol: str, start, end) -> pd.DataFrame:
+        start, end = _day(start), _day(end)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT date, created_at, headline FROM headlines WHERE symbol = ? AND date >= ? AND date < ? "
+                "ORDER BY created_at",
+                (symbol, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+            ).fetchall()
+        frame = pd.DataFrame(rows, columns=["date", "created_at", "headline"])
+        frame["date"] = pd.to_datetime(frame["date"])
+        return frame
+
+    def missing_ranges(self, symbol: str, start, end) -> List[Tuple[datetime, datetime]]:
+        """Contiguous ``[start, end)`` spans inside the range that have never been fetched"""
+        start, end = _day(start), _day(end)
+        with self._lock:
+            covered = {
+                row[0] for row in self._conn.execute(
+                    "SELECT date FROM coverage WHERE symbol = ? AND date >= ? AND date < ?",
+                    (symbol, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+                )
+            }
+        ranges = []
+        day = start
+        while day < end:
+            if day.strftime('%Y-%m-%d') in covered:
+                day += timedelta(days=1)
+                continue
+            span_start = day
+            while day < end and day.strftime('%Y-%m-%d') not in covered:
+                day += timedelta(days=1)
+            ranges.append((span_start, day))
+        return ranges
+
+    def covered(self, symbol: str, start, end) -> bool:
+        """Whether every date of ``[start, end)`` has been fetched and can no longer change"""
+        return not self.missing_ranges(symbol, start, end)
+
+    def top_up(self, symbol: str, start, end) -> List[Tuple[datetime, datetime, str]]:
+        """Fetch the missing spans; returns ``(start, end, error)`` for each span that failed"""
+        failures = []
+        for span_start, span_end in self.missing_ranges(symbol, start, end):
+            try:
+                with span("news_fetch"):
+                    articles = fetch_articles(self.api, symbol, span_start, span_end)
+            except Exception as e:
+                print(f"News fetch failed for {symbol} {span_start:%Y-%m-%d}..{span_end:%Y-%m-%d}: {e}")
+                failures.append((span_start, span_end, str(e)))
+                continue
+            self.store(symbol, articles, span_start, span_end)
+        return failures
+
+    def store(self, symbol: str, articles: List[dict], start, end):
+        """Insert articles and mark ``[start, end)`` as covered, except days that may still change"""
+        start, end = _day(start), _day(end)
+        rows = []
+        for article in articles:
+            created = pd.Timestamp(article["created_at"])
+            if created.tzinfo is not None:
+                created = created.tz_convert("UTC")
+            rows.append((symbol, article["id"], created.strftime('%Y-%m-%d'),
+                         created.isoformat(), article["headline"]))
+
+        today = _day(datetime.now(timezone.utc))
+        days = []
+        day = start
+        while day < min(end, today):
+            days.append((symbol, day.strftime('%Y-%m-%d')))
+            day += timedelta(days=1)
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO headlines (symbol, id, date, created_at, headline) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.executemany("INSERT OR IGNORE INTO coverage (symbol, date) VALUES (?, ?)", days)
+            self._conn.commit()
+
+
+class _LocalNews:
+    def __init__(self, raw: dict):
+        self._raw = raw
+
+
+class LocalNewsAPI:
+    """Stand-in for the Alpaca REST news endpoint backed by local articles.
+
+    Accepts a list of raw article dicts (``id``, ``symbols``, ``created_at``, ``headline``)
+    or a path to a JSON-lines file of them. Useful for offline development and for
+    exercising the archive without network access.
+    """
+
+    def __init__(self, articles=None, path: str = None):
+        if path is not None:
+            with open(path) as f:
+                articles = [json.loads(line) for line in f if line.strip()]
+        self.articles = list(articles or [])
+        self.calls = []
+
+    def get_news(self, symbol=None, start=None, end=None, limit=10, **kwargs):
+        self.calls.append((symbol, start, end))
+        start = pd.Timestamp(start, tz="UTC") if start else None
+        end = pd.Timestamp(end, tz="UTC") if end else None
+        matches = []
+        for raw in self.articles:
+            created = pd.Timestamp(raw["created_at"])
+            created = created.tz_localize("UTC") if created.tzinfo is None else created.tz_convert("UTC")
+            if symbol and symbol not in raw.get("symbols", [symbol]):
+                continue
+            if (start is not None and created < start) or (end is not None and created >= end):
+                continue
+            matches.append(_LocalNews(raw))
+        return matches[:limit]
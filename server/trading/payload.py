@@ -0,0 +1,149 @@
+import json
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from fastapi.encoders import jsonable_encoder
+
+COMPACT_FORMAT = "compact-v1"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """Indices kept by Largest-Triangle-Three-Buckets downsampling to ``points`` points.
+
+    The first and last points are always kept; every bucket in between keeps the
+    point forming the largest triangle with the previously kept point and the
+    next bucket's average, which preserves peaks and drawdowns that plain
+    striding would drop.
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket i covers [edges[i], edges[i + 1]); the first and last points are buckets of their own
+    edges = np.floor(np.arange(points - 1) * (n - 2) / (points - 2)).astype(np.int64) + 1
+    edges[-1] = n - 1
+    counts = np.diff(np.append(edges, n))
+    mean_x = np.add.reduceat(x, edges) / counts
+    mean_y = np.add.reduceat(y, edges) / counts
+
+    kept = np.empty(points, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        start, end = edges[i], edges[i + 1]
+        area = np.abs((x[a] - mean_x[i + 1]) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (mean_y[i + 1] - y[a]))
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def float32_text(values: np.ndarray) -> List[str]:
+    """Shortest decimal text (7-9 significant digits) that reads back as the same float32"""
+    values = np.asarray(values, dtype=np.float32)
+    text = np.array([f"{v:.7g}" for v in values.astype(np.float64).tolist()], dtype=object)
+    for digits in (8, 9):
+        inexact = np.flatnonzero(text.astype(np.float32) != values)
+        if not len(inexact):
+            break
+        text[inexact] = [f"{v:.{digits}g}" for v in values[inexact].astype(np.float64).tolist()]
+    text[~np.isfinite(values)] = "null"
+    return text.tolist()
+
+
+def portfolio_series(result: Dict) -> pd.Series:
+    """The result's ``portfolio_value`` mapping as a UTC-indexed series (also after a JSON round trip)"""
+    values = (result.get("performance") or {}).get("portfolio_value") or {}
+    # Building the index and values separately is much faster than pd.Series(dict)
+    index = pd.to_datetime(list(values.keys()), utc=True)
+    series = pd.Series(np.fromiter(values.values(), dtype=np.float64, count=len(values)), index=index)
+    return series.sort_index()
+
+
+def _epochs(index: pd.DatetimeIndex) -> np.ndarray:
+    return index.as_unit("s").asi8 if len(index) else np.zeros(0, dtype=np.int64)
+
+
+def _deltas(epochs: np.ndarray) -> Tuple[Optional[int], List[int]]:
+    if not len(epochs):
+        return None, []
+    return int(epochs[0]), np.diff(epochs).tolist()
+
+
+def _downsample(series: pd.Series, points: Optional[int]) -> pd.Series:
+    if not points or len(series) <= points:
+        return series
+    return series.iloc[lttb(_epochs(series.index).astype(np.float64), series.to_numpy(), points)]
+
+
+def _orders_frame(orders: List[Dict]) -> pd.DataFrame:
+    frame = pd.DataFrame(orders or [], columns=["created_at", "side", "quantity", "price"])
+    frame["created_at"] = pd.to_datetime(frame["created_at"], utc=True)
+    return frame
+
+
+def _rest(result: Dict) -> Dict:
+    """Everything but the series and orders, which are encoded separately"""
+    performance = {k: v for k, v in (result.get("performance") or {}).items() if k != "portfolio_value"}
+    rest = {k: v for k, v in result.items() if k not in ("performance", "orders")}
+    return jsonable_encoder({**rest, "performance": performance})
+
+
+def compact_json(result: Dict, points: Optional[int] = None) -> bytes:
+    """Backtest result with the equity curve and orders as parallel arrays.
+
+    Timestamps are epoch seconds, stored as the first value (``t0``) and the
+    deltas between consecutive points (``dt``); values are float32 written with
+    the fewest digits that read back exactly. ``points`` downsamples the curve
+    with LTTB. The JSON is assembled here rather than by ``jsonable_encoder``.
+    """
+    full = portfolio_series(result)
+    series = _downsample(full, points)
+    t0, dt = _deltas(_epochs(series.index))
+    orders = _orders_frame(result.get("orders"))
+    ot0, odt = _deltas(_epochs(pd.DatetimeIndex(orders["created_at"])))
+
+    head = _rest(result)
+    head["format"] = COMPACT_FORMAT
+    performance = head.pop("performance")
+    performance["points_total"] = len(full)
+    portfolio = '{"t0":%s,"dt":%s,"v":[%s]}' % (
+        json.dumps(t0), json.dumps(dt, separators=(",", ":")), ",".join(float32_text(series.to_numpy()))
+    )
+    order_columns = '{"t0":%s,"dt":%s,"side":%s,"quantity":[%s],"price":[%s]}' % (
+        json.dumps(ot0), json.dumps(odt, separators=(",", ":")),
+        json.dumps(orders["side"].tolist(), separators=(",", ":")),
+        ",".join(float32_text(orders["quantity"].to_numpy())),
+        ",".join(float32_text(orders["price"].to_numpy()))
+    )
+    # Splice the pre-rendered arrays into the encoded objects (both always have at least one key)
+    head_text = json.dumps(head, separators=(",", ":"))[:-1]
+    performance_text = json.dumps(performance, separators=(",", ":"))[:-1]
+    return (f'{head_text},"performance":{performance_text},"portfolio_value":{portfolio}}},'
+            f'"orders":{order_columns}}}').encode("utf-8")
+
+
+def arrow_ipc(result: Dict, points: Optional[int] = None) -> bytes:
+    """The equity curve as an Arrow IPC stream of (timestamp, float32 value) rows.
+
+    Statistics and orders ride along as JSON in the schema metadata.
+    """
+    series = _downsample(portfolio_series(result), points)
+    metadata = {
+        "format": COMPACT_FORMAT,
+        "summary": json.dumps(_rest(result), separators=(",", ":")),
+        "orders": json.dumps(jsonable_encoder(result.get("orders") or []), separators=(",", ":")),
+    }
+    table = pa.table(
+        {
+            "timestamp": pa.array(series.index.as_unit("s"), type=pa.timestamp("s", tz="UTC")),
+            "portfolio_value": pa.array(series.to_numpy(dtype=np.float32), type=pa.float32()),
+        }
+    ).replace_schema_metadata(metadata)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
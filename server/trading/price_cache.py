@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta, timezone
+import json
+import os
+import threading
+import uuid
+import pandas as pd
+
+PRICE_CACHE_DIR = os.getenv("PRICE_CACHE_DIR", os.path.join("cache", "prices"))
+PRICE_DATA_DIR = os.getenv("PRICE_DATA_DIR")
+PRICE_OFFLINE = os.getenv("PRICE_OFFLINE", "false").lower() in ("1", "true", "yes")
+COLUMNS = ["open", "high", "low", "close", "volume"]
+
+
+def _day(value) -> datetime:
+    if isinstance(value, str):
+        value = datetime.strptime(value[:10], "%Y-%m-%d")
+    return datetime(value.year, value.month, value.day)
+
+
+def _normalize(frame: pd.DataFrame) -> pd.DataFrame:
+    frame = frame.rename(columns=str.lower)
+    frame = frame[[column for column in COLUMNS if column in frame.columns]].copy()
+    index = pd.DatetimeIndex(frame.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    frame.index = index.normalize()
+    frame.index.name = "date"
+    return frame.astype("float64")
+
+
+class YahooPriceSource:
+    """Daily bars from Yahoo, the same source YahooDataBacktesting uses"""
+
+    def fetch(self, symbol: str, start: datetime, end: datetime) -> pd.DataFrame:
+        import yfinance as yf
+        history = yf.Ticker(symbol).history(start=start, end=end, interval="1d", auto_adjust=False)
+        return _normalize(history)
+
+
+class LocalPriceSource:
+    """Daily bars read from ``<directory>/<SYMBOL>.csv`` (a date column plus OHLCV)"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def fetch(self, symbol: str, start: datetime, end: datetime) -> pd.DataFrame:
+        path = os.path.join(self.directory, f"{symbol}.csv")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No local price data for {symbol} at {path}")
+        frame = pd.read_csv(path, index_col=0, parse_dates=True)
+        frame = _normalize(frame)
+        return frame.loc[(frame.index >= start) & (frame.index < end)]
+
+
+class PriceCache:
+    """Per-symbol Parquet cache of daily OHLCV bars.
+
+    Each symbol keeps one contiguous covered span of calendar days. A request outside
+    that span only fetches the missing leading or trailing edge and merges it in. In
+    offline mode the cache falls back to the local source (``PRICE_DATA_DIR``) and
+    never goes to Yahoo.
+    """
+
+    def __init__(self, directory: str = PRICE_CACHE_DIR, source=None, offline: bool = PRICE_OFFLINE):
+        self.directory = directory
+        self.offline = offline
+        if source is None:
+            if offline or PRICE_DATA_DIR:
+                source = LocalPriceSource(PRICE_DATA_DIR) if PRICE_DATA_DIR else None
+            else:
+                source = YahooPriceSource()
+        self.source = source
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, symbol: str):
+        base = os.path.join(self.directory, symbol.upper())
+        return f"{base}.parquet", f"{base}.json"
+
+    def _load(self, symbol: str):
+        data_path, meta_path = self._paths(symbol)
+        if not os.path.exists(data_path):
+            return pd.DataFrame(columns=COLUMNS, dtype="float64"), None
+        frame = pd.read_parquet(data_path)
+        covered = frame.attrs.pop("covered", None)
+        if covered is None:
+            # Caches written before the span moved into the Parquet file keep it in a sidecar
+            if not os.path.exists(meta_path):
+                return pd.DataFrame(columns=COLUMNS, dtype="float64"), None
+            with open(meta_path) as f:
+                meta = json.load(f)
+            covered = (meta["start"], meta["end"])
+        return frame, (_day(covered[0]), _day(covered[1]))
+
+    def _save(self, symbol: str, frame: pd.DataFrame, span):
+        data_path, meta_path = self._paths(symbol)
+        # The covered span rides in the file's metadata, so bars and span are replaced together.
+        # Temp names are unique because sweep workers in other processes may save the same symbol.
+        frame = frame.copy()
+        frame.attrs["covered"] = [span[0].strftime("%Y-%m-%d"), span[1].strftime("%Y-%m-%d")]
+        tmp = f"{data_path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        frame.to_parquet(tmp)
+        os.replace(tmp, data_path)
+        try:
+            os.remove(meta_path)
+        except FileNotFoundError:
+            pass
+
+    def get(self, symbol: str, start, end) -> pd.DataFrame:
+        """Daily bars for ``[start, end)``, fetching only the uncovered edges"""
+        start, end = _day(start), _day(end)
+        with self._lock:
+            frame, span = self._load(symbol)
+            # Today's bar is still forming, so never treat it as covered
+            limit = min(end, _day(datetime.now(timezone.utc)))
+
+            if span is None:
+                edges = [(start, end)]
+            else:
+                edges = []
+                if start < span[0]:
+                    edges.append((start, span[0]))
+                if end > span[1]:
+                    edges.append((span[1], end))
+
+            if edges:
+                if self.source is None:
+                    raise ValueError(f"Price data for {symbol} {start:%Y-%m-%d}..{end:%Y-%m-%d} "
+                                     "is not cached and no offline source is configured")
+                fetched = [self.source.fetch(symbol, edge_start, edge_end) for edge_start, edge_end in edges]
+                parts = [part for part in [frame, *fetched] if len(part)]
+                frame = pd.concat(parts) if parts else frame
+                frame = frame[~frame.index.duplicated(keep="last")].sort_index()
+                covered = (min(start, span[0]) if span else start, max(limit, span[1]) if span else limit)
+                if covered[1] > covered[0]:
+                    self._save(symbol, frame, covered)
+
+        return frame.loc[(frame.index >= start) & (frame.index < end)]
+
+    def lumibot_data(self, symbol: str, start, end):
+        """The cached bars wrapped as lumibot ``pandas_data`` for PandasDataBacktesting"""
+        from lumibot.entities import Asset, Data
+        # Extra leading days so lumibot can look back before the first iteration
+        frame = self.get(symbol, _day(start) - timedelta(days=10), _day(end) + timedelta(days=1))
+        asset = Asset(symbol=symbol, asset_type="stock")
+        return {asset: Data(asset, frame, timestep="day")}
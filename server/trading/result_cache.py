@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+from fastapi.encoders import jsonable_encoder
+from cancellation import JobCancelled
+
+RESULT_CACHE_PATH = os.getenv("BACKTEST_CACHE_PATH", os.path.join("cache", "backtest_results.sqlite"))
+RESULT_CACHE_TTL = float(os.getenv("BACKTEST_CACHE_TTL", str(7 * 24 * 3600)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("BACKTEST_CACHE_MAX_ENTRIES", "2000"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("BACKTEST_CACHE_MAX_MB", "512")) * 1024 ** 2
+# Bump to invalidate every cached result after a change the source fingerprint cannot see
+STRATEGY_VERSION = os.getenv("BACKTEST_STRATEGY_VERSION", "1")
+# Modules whose code decides a backtest's outcome
+FINGERPRINT_MODULES = ("strategies.py", "service.py", "vector_backtest.py", "sentiment_series.py",
+                       "finbert_utils.py", "news_store.py", "price_cache.py", "walk_forward.py")
+
+_fingerprint = None
+
+
+def strategy_fingerprint() -> str:
+    """Hash of the strategy/simulation source, the sentiment model and its backend"""
+    global _fingerprint
+    if _fingerprint is None:
+        from .finbert_utils import BACKEND, backend_namespace
+        digest = hashlib.sha256(f"{STRATEGY_VERSION}\x00{backend_namespace(BACKEND)}".encode("utf-8"))
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for name in FINGERPRINT_MODULES:
+            with open(os.path.join(directory, name), "rb") as f:
+                digest.update(name.encode("utf-8") + b"\x00" + f.read())
+        _fingerprint = digest.hexdigest()[:16]
+    return _fingerprint
+
+
+def result_key(params: Dict, fingerprint: str) -> str:
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{fingerprint}\x00{canonical}".encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Backtest results keyed by request parameters and the strategy fingerprint.
+
+    Stored as JSON in SQLite (shared by every worker process on the host) with a
+    TTL and least-recently-used eviction by entry count and total size. Identical
+    requests that arrive while a run is in flight in this process wait for that
+    run instead of starting their own.
+    """
+
+    def __init__(self, path: str = RESULT_CACHE_PATH, ttl: float = RESULT_CACHE_TTL,
+                 max_entries: int = RESULT_CACHE_MAX_ENTRIES, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                params TEXT NOT NULL,
+                result TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_results_last_used ON results(last_used);
+        """)
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT result, created_at FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, params: Dict, result: Dict):
+        text = json.dumps(jsonable_encoder(result))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, params, result, size, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, json.dumps(params, sort_keys=True, default=str), text, len(text), now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl,))
+        count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        # Drop least recently used entries until both bounds hold
+        removed = []
+        for key, entry_size in self._conn.execute("SELECT key, size FROM results ORDER BY last_used ASC"):
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            removed.append((key,))
+            count -= 1
+            size -= entry_size
+        self._conn.executemany("DELETE FROM results WHERE key = ?", removed)
+
+    def get_or_compute(self, key: str, params: Dict, compute: Callable[[], Dict],
+                       cacheable: Callable[[Dict], bool] = lambda result: True):
+        """Cached result, else the result of an in-flight identical run, else ``compute()``.
+
+        Returns ``(result, source)`` with source ``"hit"``, ``"coalesced"`` or ``"miss"``.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached, "hit"
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            try:
+                return future.result(), "coalesced"
+            except JobCancelled:
+                # The run we joined was cancelled by its own caller; this one still wants a result
+                return self.get_or_compute(key, params, compute, cacheable)
+        try:
+            # The previous owner may have stored the result between our lookup and taking ownership
+            cached = self.get(key)
+            if cached is not None:
+                future.set_result(cached)
+                return cached, "hit"
+            result = compute()
+            if cacheable(result):
+                self.put(key, params, result)
+            future.set_result(result)
+            return result, "miss"
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
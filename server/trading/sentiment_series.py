@@ -0,0 +1,81 @@
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+import numpy as np
+import pandas as pd
+from .finbert_utils import get_engine, labels
+
+WINDOW_DAYS = 3
+# MLTrader originally scored Alpaca get_news' default page: the 10 newest headlines in the
+# window. 0 scores every headline in the window instead.
+HEADLINES_PER_WINDOW = int(os.getenv("SENTIMENT_HEADLINES_PER_WINDOW", "10"))
+
+
+def build_sentiment_series(headlines: pd.DataFrame, start: datetime, end: datetime,
+                           engine=None, window_days: int = WINDOW_DAYS,
+                           max_headlines: int = HEADLINES_PER_WINDOW) -> pd.DataFrame:
+    """Score all headlines in batches and roll them up into one row per calendar day.
+
+    The row for day ``d`` combines the ``max_headlines`` newest headlines published on
+    the ``window_days`` days before ``d`` (the same window and cap ``MLTrader.get_sentiment``
+    uses live), by summing their logits and taking the softmax, exactly like
+    ``estimate_sentiment``. Headlines are ordered by ``created_at`` when the frame has it.
+    """
+    if engine is None:
+        engine = get_engine()
+
+    days = pd.date_range(pd.Timestamp(start).normalize() - pd.Timedelta(days=window_days),
+                         pd.Timestamp(end).normalize(), freq="D")
+
+    positions = days.get_indexer(headlines["date"]) if len(headlines) else np.zeros(0, dtype=np.int64)
+    inside = positions >= 0
+    headlines, positions = headlines[inside], positions[inside]
+    # Oldest first, so every day's window is one contiguous run of rows ending at its newest headline
+    order = np.lexsort((headlines["created_at"].to_numpy(dtype=str), positions)) \
+        if "created_at" in headlines.columns else np.argsort(positions, kind="stable")
+    positions = positions[order]
+    scores = np.zeros((0, len(labels)), dtype=np.float64)
+    if len(headlines):
+        # Score each distinct headline once, then scatter the logits back onto rows
+        unique, inverse = np.unique(headlines["headline"].to_numpy(dtype=str)[order], return_inverse=True)
+        scores = engine.logits(unique.tolist())[inverse].astype(np.float64)
+    cumulative = np.vstack([np.zeros((1, len(labels))), np.cumsum(scores, axis=0)])
+
+    # Trailing window that excludes the current day: rows dated [d - window_days, d)
+    day_index = np.arange(len(days))
+    hi = np.searchsorted(positions, day_index, side="left")
+    lo = np.searchsorted(positions, day_index - window_days, side="left")
+    if max_headlines:
+        lo = np.maximum(lo, hi - max_headlines)
+    window_logits = cumulative[hi] - cumulative[lo]
+    window_counts = hi - lo
+
+    exp = np.exp(window_logits - window_logits.max(axis=1, keepdims=True))
+    probs = exp / exp.sum(axis=1, keepdims=True)
+    best = probs.argmax(axis=1)
+    has_news = window_counts > 0
+
+    series = pd.DataFrame({
+        "probability": np.where(has_news, probs[np.arange(len(days)), best], 0.0),
+        "sentiment": np.where(has_news, np.asarray(labels)[best], labels[-1]),
+        "headlines": window_counts.astype(np.int64),
+    }, index=days)
+    return series.loc[pd.Timestamp(start).normalize():]
+
+
+def series_lookup(series: pd.DataFrame) -> Dict[str, Tuple[float, str]]:
+    """Flatten a sentiment series into the date-keyed lookup MLTrader replays from"""
+    return {
+        day.strftime('%Y-%m-%d'): (float(probability), sentiment)
+        for day, probability, sentiment in zip(series.index, series["probability"], series["sentiment"])
+    }
+
+
+def precompute_sentiment(archive, symbol: str, start: datetime, end: datetime,
+                         engine=None, window_days: int = WINDOW_DAYS,
+                         max_headlines: int = HEADLINES_PER_WINDOW) -> pd.DataFrame:
+    """Load every headline for the range from the news archive and score them in bulk"""
+    headlines = archive.headlines(symbol, start - timedelta(days=window_days), end)
+    print(f"Fetched {len(headlines)} headlines for {symbol}")
+    return build_sentiment_series(headlines, start, end, engine=engine, window_days=window_days,
+                                  max_headlines=max_headlines)
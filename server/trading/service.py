@@ -1,7 +1,14 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from lumibot.brokers import Alpaca
-from lumibot.backtesting import YahooDataBacktesting
+from lumibot.backtesting import PandasDataBacktesting
+from alpaca_trade_api import REST
 from .strategies import MLTrader
+from .news_store import NewsArchive
+from .sentiment_series import WINDOW_DAYS, precompute_sentiment, series_lookup
+from .vector_backtest import run_vectorized_backtest
+from .walk_forward import run_walk_forward, walk_forward_windows
+from .price_cache import PriceCache
+from .result_cache import ResultCache, result_key, strategy_fingerprint
 import os
 from dotenv import load_dotenv
 import numpy as np
@@ -17,26 +24,168 @@ class TradingService:
             "API_SECRET": os.getenv("API_SECRET"),
             "PAPER": True
         })
-        self.last_results = None
-        
-    def run_backtest(self, symbol, start_date, end_date, cash_at_risk=0.5):
-        print(f"Starting backtest for {symbol} from {start_date} to {end_date}")
+        self.news_api = REST(
+            base_url=os.getenv("BASE_URL"),
+            key_id=os.getenv("API_KEY"),
+            secret_key=os.getenv("API_SECRET")
+        )
+        self.news_archive = NewsArchive(api=self.news_api)
+        self.price_cache = PriceCache()
+        self.result_cache = ResultCache()
+
+    def run_backtest(self, symbol, start_date, end_date, cash_at_risk=0.5, sentiment_mode="precompute",
+                     sentiment_threshold=0.999, engine="lumibot", progress=None):
+        """``_run_backtest`` memoized on its parameters and the strategy fingerprint.
+
+        Ranges that reach today are always re-run, since their news and prices may
+        still change; so are runs that ended in an error or scored incomplete news.
+        """
+        params = {
+            "symbol": symbol,
+            "start_date": start_date,
+            "end_date": end_date,
+            "cash_at_risk": cash_at_risk,
+            "sentiment_mode": sentiment_mode,
+            "sentiment_threshold": sentiment_threshold,
+            "engine": engine,
+        }
+        key = result_key(params, strategy_fingerprint())
+        result, source = self.result_cache.get_or_compute(
+            key,
+            params,
+            lambda: self._run_backtest(**params, progress=progress),
+            cacheable=self._cacheable(symbol, start_date, end_date)
+        )
+        if source != "miss":
+            print(f"Backtest for {symbol} {start_date}..{end_date} served from cache ({source})")
+            result = {**result, "debug_info": {**result.get("debug_info", {}), "cache": source}}
+        return result
+
+    def run_walk_forward(self, symbol, start_date, end_date, window_days=90, step_days=30, mode="rolling",
+                         cash_at_risk=0.5, sentiment_threshold=0.999, progress=None):
+        """Vectorized backtests over rolling or anchored windows of one range.
+
+        Prices and sentiment are loaded and scored once for the whole range and
+        shared by every window; returns per-window statistics and their aggregate.
+        Memoized like ``run_backtest``.
+        """
+        params = {
+            "analysis": "walk_forward",
+            "symbol": symbol,
+            "start_date": start_date,
+            "end_date": end_date,
+            "window_days": window_days,
+            "step_days": step_days,
+            "mode": mode,
+            "cash_at_risk": cash_at_risk,
+            "sentiment_threshold": sentiment_threshold,
+        }
+        result, source = self.result_cache.get_or_compute(
+            result_key(params, strategy_fingerprint()),
+            params,
+            lambda: self._run_walk_forward(**{k: v for k, v in params.items() if k != "analysis"},
+                                           progress=progress),
+            cacheable=self._cacheable(symbol, start_date, end_date)
+        )
+        if source != "miss":
+            print(f"Walk-forward for {symbol} {start_date}..{end_date} served from cache ({source})")
+            result = {**result, "cache": source}
+        return result
+
+    def _cacheable(self, symbol, start_date, end_date):
+        """Result filter for the cache: a settled range, no error, and every headline day fetched"""
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d")
+        settled = end.date() < datetime.now().date()
+        return lambda result: (settled and "error" not in result
+                               and self.news_archive.covered(symbol, start - timedelta(days=WINDOW_DAYS), end))
+
+    def _run_walk_forward(self, symbol, start_date, end_date, window_days, step_days, mode,
+                          cash_at_risk, sentiment_threshold, progress=None):
+        progress = progress or (lambda fraction, message=None: None)
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d")
+        windows = walk_forward_windows(start, end, window_days, step_days, mode)
+        print(f"Starting {mode} walk-forward for {symbol} from {start_date} to {end_date} ({len(windows)} windows)")
+
+        progress(0.05, "Scoring news sentiment")
+        series = precompute_sentiment(self.news_archive, symbol, start, end)
+        progress(0.3, "Loading prices")
+        prices = self.price_cache.get(symbol, start, end)
+        progress(0.4, f"Simulating {len(windows)} windows")
+        result = run_walk_forward(prices, series, windows, cash_at_risk=cash_at_risk,
+                                  sentiment_threshold=sentiment_threshold)
+        return {
+            "symbol": symbol,
+            "mode": mode,
+            "window_days": window_days,
+            "step_days": step_days,
+            **result,
+        }
+
+    def _run_backtest(self, symbol, start_date, end_date, cash_at_risk=0.5, sentiment_mode="precompute",
+                      sentiment_threshold=0.999, engine="lumibot", progress=None):
+        """Run the MLTrader backtest.
+
+        In ``precompute`` mode all headlines for the range are fetched and scored up
+        front, and the strategy replays the resulting date-indexed sentiment series.
+        ``live`` mode keeps the original per-day news fetch and inference.
+        ``engine="vectorized"`` simulates the same rules over daily arrays instead of
+        lumibot's event loop; it needs precomputed sentiment. The lumibot engine stays
+        the reference implementation for cross-checking.
+        ``progress(fraction, message)`` is called between phases when given.
+        """
+        progress = progress or (lambda fraction, message=None: None)
+        print(f"Starting backtest for {symbol} from {start_date} to {end_date} ({sentiment_mode} sentiment)")
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d")
+        parameters = {
+            "symbol": symbol,
+            "cash_at_risk": cash_at_risk,
+            "sentiment_threshold": sentiment_threshold
+        }
+
+        if sentiment_mode == "precompute":
+            progress(0.05, "Scoring news sentiment")
+            series = precompute_sentiment(self.news_archive, symbol, start, end)
+            parameters["sentiment_series"] = series_lookup(series)
+        elif sentiment_mode != "live":
+            raise ValueError(f"Unknown sentiment mode: {sentiment_mode}")
+
+        if engine == "vectorized":
+            if sentiment_mode != "precompute":
+                raise ValueError("The vectorized engine requires precomputed sentiment")
+            progress(0.3, "Simulating strategy")
+            prices = self.price_cache.get(symbol, start, end)
+            return run_vectorized_backtest(
+                prices,
+                series,
+                cash_at_risk=cash_at_risk,
+                sentiment_threshold=sentiment_threshold
+            )
+        elif engine != "lumibot":
+            raise ValueError(f"Unknown backtest engine: {engine}")
         
         strategy = MLTrader(
             name=f'mlstrat_{symbol}',
             broker=self.broker,
-            parameters={"symbol": symbol, "cash_at_risk": cash_at_risk}
+            parameters=parameters
         )
         
-        # Run backtest and get the results
+        # Run backtest and get the results, feeding lumibot cached Yahoo bars
+        progress(0.3, "Simulating strategy")
+        offline_options = {"benchmark_asset": None, "risk_free_rate": 0.0} if self.price_cache.offline else {}
         backtest = strategy.backtest(
-            YahooDataBacktesting,
-            datetime.strptime(start_date, "%Y-%m-%d"),
-            datetime.strptime(end_date, "%Y-%m-%d"),
-            parameters={"symbol": symbol, "cash_at_risk": cash_at_risk}
+            PandasDataBacktesting,
+            start,
+            end,
+            pandas_data=self.price_cache.lumibot_data(symbol, start, end),
+            parameters=parameters,
+            **offline_options
         )
         
         # Extract proper statistics from the backtest results
+        progress(0.95, "Collecting results")
         try:
             # Get the portfolio values over time
             portfolio_values = backtest.get_portfolio_values()
@@ -84,7 +233,6 @@ class TradingService:
                 "error": str(e)
             }
         
-        self.last_results = response
         return response
 
     def _extract_orders(self, backtest):
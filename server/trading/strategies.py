@@ -6,6 +6,9 @@ from datetime import datetime
 from alpaca_trade_api import REST
 from timedelta import Timedelta
 from .finbert_utils import estimate_sentiment 
+from .news_store import NewsArchive
+from .sentiment_series import HEADLINES_PER_WINDOW
+from tracing import span
 import os
 from dotenv import load_dotenv
 
@@ -22,12 +25,17 @@ ALPACA_CREDS = {
 }   
 
 class MLTrader(Strategy):
-    def initialize(self, symbol:str="SPY", cash_at_risk:float=0.5):
+    def initialize(self, symbol:str="SPY", cash_at_risk:float=0.5, sentiment_threshold:float=.999,
+                   sentiment_series:dict=None):
         self.symbol = symbol
         self.sleeptime = "24H"
         self.last_trade = None
         self.cash_at_risk = cash_at_risk
+        self.sentiment_threshold = sentiment_threshold
+        # Precomputed {date: (probability, sentiment)} lookup; None means fetch news live
+        self.sentiment_series = sentiment_series
         self.api = REST(base_url=BASE_URL, key_id=API_KEY, secret_key=API_SECRET)
+        self.news = NewsArchive(api=self.api)
 
     def position_sizing(self):
         cash = self.get_cash()
@@ -42,19 +50,25 @@ class MLTrader(Strategy):
 
     def get_sentiment(self):
         today, three_days_prior = self.get_dates()
-        news = self.api.get_news(symbol=self.symbol, start=three_days_prior, end=today)
-
-        news = [ev.__dict__["_raw"]["headline"] for ev in news]
+        if self.sentiment_series is not None:
+            return self.sentiment_series.get(today, (0, "neutral"))
+        news = self.news.headlines(self.symbol, three_days_prior, today)["headline"]
+        # Newest first page only, like the original get_news call with its default limit
+        news = (news.tail(HEADLINES_PER_WINDOW) if HEADLINES_PER_WINDOW else news).tolist()
         probability, sentiment = estimate_sentiment(news)
         return probability, sentiment
     
     def on_trading_iteration(self):
+        with span("strategy_iteration"):
+            self._trade()
+
+    def _trade(self):
         cash, last_price, quantity = self.position_sizing() 
         order = None
         probability, sentiment = self.get_sentiment()
 
         if cash > last_price: 
-            if sentiment == "positive" and probability > .999: 
+            if sentiment == "positive" and probability > self.sentiment_threshold: 
                 if self.last_trade == "sell": 
                     self.sell_all() 
                 order = self.create_order(
@@ -67,7 +81,7 @@ class MLTrader(Strategy):
                 )
                 self.submit_order(order) 
                 self.last_trade = "buy"
-            elif sentiment == "negative" and probability > .999: 
+            elif sentiment == "negative" and probability > self.sentiment_threshold: 
                 if self.last_trade == "buy": 
                     self.sell_all() 
                 order = self.create_order(
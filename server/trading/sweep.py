@@ -0,0 +1,98 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, Dict, List, Tuple
+
+SWEEP_WORKERS = int(os.getenv("SWEEP_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+MAX_SWEEP_CASES = int(os.getenv("MAX_SWEEP_CASES", "500"))
+
+# Per-process state, populated once by the pool initializer
+_worker_service = None
+_executor = None
+
+
+def _init_worker():
+    """Load FinBERT and build a TradingService once per worker process"""
+    global _worker_service
+    from .finbert_utils import get_engine
+    from .service import TradingService
+    get_engine()
+    _worker_service = TradingService()
+
+
+def _run_case(case: Dict) -> Dict:
+    try:
+        result = _worker_service.run_backtest(**case)
+        return {"params": case, "result": result}
+    except Exception as e:
+        print(f"Sweep case failed {case}: {e}")
+        return {"params": case, "error": str(e)}
+
+
+def sweep_cases(symbols: List[str], date_ranges: List[Tuple[str, str]], cash_at_risk: List[float],
+                sentiment_thresholds: List[float], sentiment_mode: str = "precompute",
+                engine: str = "lumibot") -> List[Dict]:
+    """Expand the parameter grid into one run_backtest kwargs dict per combination"""
+    return [
+        {
+            "symbol": symbol,
+            "start_date": start_date,
+            "end_date": end_date,
+            "cash_at_risk": risk,
+            "sentiment_threshold": threshold,
+            "sentiment_mode": sentiment_mode,
+            "engine": engine,
+        }
+        for symbol, (start_date, end_date), risk, threshold in itertools.product(
+            symbols, date_ranges, cash_at_risk, sentiment_thresholds
+        )
+    ]
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn so workers never inherit a forked copy of torch's thread pools
+        _executor = ProcessPoolExecutor(
+            max_workers=SWEEP_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker
+        )
+    return _executor
+
+
+def reset_executor(broken: ProcessPoolExecutor):
+    """Discard a pool whose worker died, so the next ``get_executor`` call starts a fresh one"""
+    global _executor
+    if _executor is broken:
+        _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+async def _run_on(executor: ProcessPoolExecutor, case: Dict) -> Dict:
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, _run_case, case)
+    except BrokenProcessPool as e:
+        # A worker was killed (e.g. out of memory); every case still queued on this pool fails too
+        print(f"Sweep pool broken while running {case}: {e}")
+        reset_executor(executor)
+        return {"params": case, "error": f"Sweep worker process died: {e}"}
+
+
+async def run_sweep(cases: List[Dict]) -> AsyncIterator[Dict]:
+    """Run every case on the shared process pool and yield results as they finish"""
+    executor = get_executor()
+    futures = [asyncio.ensure_future(_run_on(executor, case)) for case in cases]
+    try:
+        for completed, future in enumerate(asyncio.as_completed(futures), start=1):
+            outcome = await future
+            outcome["completed"] = completed
+            outcome["total"] = len(cases)
+            yield outcome
+    finally:
+        # Client went away: drop the cases that have not started yet
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,186 @@
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from tracing import span
+
+# Matches lumibot's default backtest budget
+INITIAL_CASH = 100000.0
+TAKE_PROFIT = 0.20
+STOP_LOSS = 0.05
+TRADING_DAYS = 252
+
+
+def _first_exit(i: int, side: int, take_profit: float, stop_loss: float,
+                open_: np.ndarray, high: np.ndarray, low: np.ndarray):
+    """Index and fill price of the first bar after ``i`` that touches either bracket leg"""
+    if side > 0:
+        stop_hit = low[i + 1:] <= stop_loss
+        profit_hit = high[i + 1:] >= take_profit
+    else:
+        stop_hit = high[i + 1:] >= stop_loss
+        profit_hit = low[i + 1:] <= take_profit
+    hit = stop_hit | profit_hit
+    if not hit.any():
+        return None, None
+    offset = int(np.argmax(hit))
+    j = i + 1 + offset
+    # When both legs trade on the same bar assume the stop filled first; gaps fill at the open
+    if stop_hit[offset]:
+        price = min(open_[j], stop_loss) if side > 0 else max(open_[j], stop_loss)
+    else:
+        price = max(open_[j], take_profit) if side > 0 else min(open_[j], take_profit)
+    return j, float(price)
+
+
+def simulate(prices: pd.DataFrame, sentiment: pd.DataFrame, cash_at_risk: float = 0.5,
+             sentiment_threshold: float = 0.999, initial_cash: float = INITIAL_CASH,
+             take_profit: float = TAKE_PROFIT, stop_loss: float = STOP_LOSS) -> Dict:
+    """Replay MLTrader's rules over daily arrays.
+
+    Entries are sized and filled at the day's close, like ``position_sizing`` does with
+    ``get_last_price``. Each entry carries its own take-profit/stop-loss bracket, and a
+    signal in the opposite direction closes everything first (``sell_all``). The
+    simulation only steps through signal days; bracket exits are found with a vectorized
+    search over the remaining bars and the equity curve is built with cumulative sums.
+    """
+    dates = pd.DatetimeIndex(prices.index)
+    open_ = prices["open"].to_numpy(dtype=np.float64)
+    high = prices["high"].to_numpy(dtype=np.float64)
+    low = prices["low"].to_numpy(dtype=np.float64)
+    close = prices["close"].to_numpy(dtype=np.float64)
+    n = len(dates)
+
+    aligned = sentiment.reindex(dates)
+    probability = aligned["probability"].fillna(0).to_numpy(dtype=np.float64)
+    label = aligned["sentiment"].fillna("neutral").to_numpy(dtype=object)
+    direction = np.where(
+        probability > sentiment_threshold,
+        np.where(label == "positive", 1, np.where(label == "negative", -1, 0)),
+        0
+    )
+
+    cash_flow = np.zeros(n)
+    share_delta = np.zeros(n)
+    orders: List[Dict] = []
+    open_positions: List[Dict] = []
+    closed_pnl: List[float] = []
+    cash = initial_cash
+    last_trade = None
+
+    def close_position(position, j, price):
+        nonlocal cash
+        cash_flow[j] += position["shares"] * price
+        share_delta[j] -= position["shares"]
+        cash += position["shares"] * price
+        closed_pnl.append(position["shares"] * (price - position["entry_price"]))
+        orders.append(_order(dates[j], "sell" if position["shares"] > 0 else "buy",
+                             abs(position["shares"]), price))
+
+    for i in np.flatnonzero(direction):
+        # Settle brackets that exited before today's iteration
+        for position in [p for p in open_positions if p["exit_index"] is not None and p["exit_index"] <= i]:
+            open_positions.remove(position)
+            close_position(position, position["exit_index"], position["exit_price"])
+
+        last_price = close[i]
+        quantity = round(cash * cash_at_risk / last_price, 0)
+        if not cash > last_price:
+            continue
+        side = int(direction[i])
+        if (side > 0 and last_trade == "sell") or (side < 0 and last_trade == "buy"):
+            for position in open_positions:
+                close_position(position, i, last_price)
+            open_positions = []
+        last_trade = "buy" if side > 0 else "sell"
+        if quantity < 1:
+            continue
+
+        shares = side * quantity
+        cash_flow[i] -= shares * last_price
+        share_delta[i] += shares
+        cash -= shares * last_price
+        orders.append(_order(dates[i], "buy" if side > 0 else "sell", quantity, last_price))
+
+        if side > 0:
+            profit_price, stop_price = last_price * (1 + take_profit), last_price * (1 - stop_loss)
+        else:
+            profit_price, stop_price = last_price * (1 - take_profit), last_price * (1 + stop_loss)
+        exit_index, exit_price = _first_exit(i, side, profit_price, stop_price, open_, high, low)
+        open_positions.append({
+            "shares": shares,
+            "entry_price": last_price,
+            "exit_index": exit_index,
+            "exit_price": exit_price,
+        })
+
+    for position in open_positions:
+        if position["exit_index"] is not None:
+            close_position(position, position["exit_index"], position["exit_price"])
+
+    holdings = np.cumsum(share_delta)
+    equity = initial_cash + np.cumsum(cash_flow) + holdings * close
+    portfolio_values = pd.Series(equity, index=dates, name="portfolio_value")
+    orders.sort(key=lambda order: order["created_at"])
+
+    return {
+        "portfolio_values": portfolio_values,
+        "orders": orders,
+        "trade_pnl": closed_pnl,
+    }
+
+
+def _order(when, side: str, quantity: float, price: float) -> Dict:
+    return {
+        "created_at": pd.Timestamp(when).strftime("%Y-%m-%d %H:%M:%S"),
+        "side": side,
+        "quantity": float(quantity),
+        "price": float(price),
+    }
+
+
+def performance_statistics(portfolio_values: pd.Series, trade_pnl: List[float] = None) -> Dict:
+    """Return, Sharpe and drawdown figures computed from a daily equity curve"""
+    values = portfolio_values.to_numpy(dtype=np.float64)
+    if len(values) < 2 or values[0] == 0:
+        return {"total_return": 0, "annual_return": 0, "sharpe_ratio": 0, "max_drawdown": 0, "win_rate": None}
+
+    returns = np.diff(values) / values[:-1]
+    total_return = values[-1] / values[0] - 1
+    days = max((portfolio_values.index[-1] - portfolio_values.index[0]).days, 1)
+    annual_return = (values[-1] / values[0]) ** (365.25 / days) - 1 if values[-1] > 0 else -1.0
+    std = returns.std(ddof=1) if len(returns) > 1 else 0
+    sharpe_ratio = returns.mean() / std * np.sqrt(TRADING_DAYS) if std > 0 else 0
+    max_drawdown = float(np.max(1 - values / np.maximum.accumulate(values)))
+    win_rate = float(np.mean(np.asarray(trade_pnl) > 0)) if trade_pnl else None
+
+    return {
+        "total_return": float(total_return),
+        "annual_return": float(annual_return),
+        "sharpe_ratio": float(sharpe_ratio),
+        "max_drawdown": max_drawdown,
+        "win_rate": win_rate,
+    }
+
+
+def run_vectorized_backtest(prices: pd.DataFrame, sentiment: pd.DataFrame, cash_at_risk: float = 0.5,
+                            sentiment_threshold: float = 0.999, initial_cash: float = INITIAL_CASH) -> Dict:
+    """Simulate and shape the result like ``TradingService.run_backtest``"""
+    with span("simulate"):
+        simulation = simulate(prices, sentiment, cash_at_risk=cash_at_risk,
+                              sentiment_threshold=sentiment_threshold, initial_cash=initial_cash)
+    portfolio_values = simulation["portfolio_values"]
+    statistics = performance_statistics(portfolio_values, simulation["trade_pnl"])
+
+    return {
+        "performance": {
+            "portfolio_value": portfolio_values.to_dict(),
+            "final_value": float(portfolio_values.iloc[-1]) if len(portfolio_values) else initial_cash,
+            "initial_value": float(portfolio_values.iloc[0]) if len(portfolio_values) else initial_cash,
+        },
+        "statistics": statistics,
+        "orders": simulation["orders"],
+        "debug_info": {
+            "stats_available": list(statistics.keys()),
+            "backtest_type": "vectorized"
+        }
+    }
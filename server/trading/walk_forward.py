@@ -0,0 +1,159 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from tracing import span
+from .vector_backtest import performance_statistics, simulate
+
+WALK_FORWARD_WORKERS = int(os.getenv("WALK_FORWARD_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+# Runs estimated to take longer than this in-process are spread over the warm worker pool
+WALK_FORWARD_PARALLEL_SECONDS = float(os.getenv("WALK_FORWARD_PARALLEL_SECONDS", "0.25"))
+# Measured serial cost of one window and of each daily bar it simulates
+WINDOW_SECONDS = 0.002
+BAR_SECONDS = 0.000002
+MAX_WINDOWS = int(os.getenv("WALK_FORWARD_MAX_WINDOWS", "500"))
+AGGREGATE_METRICS = ("total_return", "annual_return", "sharpe_ratio", "max_drawdown")
+
+_executor = None
+
+
+def walk_forward_windows(start: datetime, end: datetime, window_days: int, step_days: int,
+                         mode: str = "rolling") -> List[Tuple[datetime, datetime]]:
+    """``[start, end)`` windows over the range.
+
+    ``rolling`` windows are ``window_days`` long and advance by ``step_days``;
+    ``anchored`` windows all begin at ``start`` and grow by ``step_days`` from an
+    initial ``window_days``. A final partial window is dropped.
+    """
+    if mode not in ("rolling", "anchored"):
+        raise ValueError(f"Unknown walk-forward mode: {mode}")
+    if window_days < 2 or step_days < 1:
+        raise ValueError("window_days must be at least 2 and step_days at least 1")
+    windows = []
+    window_end = start + timedelta(days=window_days)
+    while window_end <= end:
+        window_start = start if mode == "anchored" else window_end - timedelta(days=window_days)
+        windows.append((window_start, window_end))
+        window_end += timedelta(days=step_days)
+    if not windows:
+        raise ValueError(f"The range is shorter than one {window_days}-day window")
+    if len(windows) > MAX_WINDOWS:
+        raise ValueError(f"{len(windows)} windows requested, the limit is {MAX_WINDOWS}")
+    return windows
+
+
+def _run_window(prices: pd.DataFrame, sentiment: pd.DataFrame, window_start: datetime, window_end: datetime,
+                cash_at_risk: float, sentiment_threshold: float) -> Dict:
+    window_prices = prices.loc[(prices.index >= window_start) & (prices.index < window_end)]
+    entry = {"start_date": window_start.strftime('%Y-%m-%d'), "end_date": window_end.strftime('%Y-%m-%d'),
+             "bars": int(len(window_prices))}
+    if len(window_prices) < 2:
+        return {**entry, "error": "Not enough price bars in the window"}
+    simulation = simulate(window_prices, sentiment, cash_at_risk=cash_at_risk,
+                          sentiment_threshold=sentiment_threshold)
+    values = simulation["portfolio_values"]
+    return {
+        **entry,
+        **performance_statistics(values, simulation["trade_pnl"]),
+        "trades": len(simulation["orders"]),
+        "final_value": float(values.iloc[-1]),
+    }
+
+
+def aggregate_windows(windows: List[Dict]) -> Dict:
+    """Distribution of each metric across the windows that ran"""
+    ok = [w for w in windows if "error" not in w]
+    summary = {"windows": len(windows), "completed": len(ok)}
+    if not ok:
+        return summary
+    for metric in AGGREGATE_METRICS:
+        values = np.array([w[metric] for w in ok], dtype=np.float64)
+        summary[metric] = {
+            "mean": float(values.mean()),
+            "median": float(np.median(values)),
+            "std": float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+            "min": float(values.min()),
+            "max": float(values.max()),
+        }
+    summary["positive_fraction"] = float(np.mean([w["total_return"] > 0 for w in ok]))
+    summary["worst_drawdown"] = summary["max_drawdown"]["max"]
+    return summary
+
+
+def _run_windows(windows: List[Tuple[datetime, datetime]], cash_at_risk: float, sentiment_threshold: float,
+                 prices: pd.DataFrame, sentiment: pd.DataFrame) -> List[Dict]:
+    return [_run_window(prices, sentiment, window_start, window_end, cash_at_risk, sentiment_threshold)
+            for window_start, window_end in windows]
+
+
+def _serial_seconds(prices: pd.DataFrame, windows: List[Tuple[datetime, datetime]]) -> float:
+    """Estimated in-process run time of the windows"""
+    index = pd.DatetimeIndex(prices.index)
+    starts = index.searchsorted(pd.DatetimeIndex([start for start, _ in windows]))
+    ends = index.searchsorted(pd.DatetimeIndex([end for _, end in windows]))
+    return len(windows) * WINDOW_SECONDS + int((ends - starts).sum()) * BAR_SECONDS
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn, like the sweep pool, so workers never inherit a forked copy of torch's thread pools
+        _executor = ProcessPoolExecutor(max_workers=WALK_FORWARD_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def reset_executor(broken: ProcessPoolExecutor):
+    """Discard a pool whose worker died, so the next ``get_executor`` call starts a fresh one"""
+    global _executor
+    if _executor is broken:
+        _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_on_pool(executor: ProcessPoolExecutor, prices: pd.DataFrame, sentiment: pd.DataFrame,
+                 windows: List[Tuple[datetime, datetime]], cash_at_risk: float, sentiment_threshold: float,
+                 workers: int) -> List[Dict]:
+    # Interleaved chunks, so the long windows of an anchored run are spread over every worker
+    chunks = [windows[i::workers * 4] for i in range(workers * 4)]
+    chunks = [chunk for chunk in chunks if chunk]
+    futures = [executor.submit(_run_windows, chunk, cash_at_risk, sentiment_threshold, prices, sentiment)
+               for chunk in chunks]
+    by_window = {}
+    for chunk, future in zip(chunks, futures):
+        by_window.update(zip(chunk, future.result()))
+    return [by_window[window] for window in windows]
+
+
+def run_walk_forward(prices: pd.DataFrame, sentiment: pd.DataFrame, windows: List[Tuple[datetime, datetime]],
+                     cash_at_risk: float = 0.5, sentiment_threshold: float = 0.999,
+                     max_workers: int = WALK_FORWARD_WORKERS) -> Dict:
+    """Simulate every window over the same loaded prices and sentiment series.
+
+    Each window starts from fresh cash. The daily sentiment for a date only depends
+    on the headlines before it, so slicing one series computed for the whole range
+    gives every window exactly what a separate run would have scored.
+
+    ``simulate`` holds the GIL, so runs estimated to take longer than
+    ``WALK_FORWARD_PARALLEL_SECONDS`` in-process are split into chunks on a shared
+    pool of worker processes, which is started on first use and kept warm like the
+    sweep pool; daily prices and sentiment are small enough to send with every chunk.
+    """
+    workers = max(1, min(max_workers, WALK_FORWARD_WORKERS, len(windows)))
+    with span("simulate", "walk_forward"):
+        results = None
+        if workers > 1 and _serial_seconds(prices, windows) > WALK_FORWARD_PARALLEL_SECONDS:
+            executor = get_executor()
+            try:
+                results = _run_on_pool(executor, prices, sentiment, windows, cash_at_risk, sentiment_threshold,
+                                       workers)
+            except BrokenProcessPool as e:
+                print(f"Walk-forward pool broken, running the windows in-process: {e}")
+                reset_executor(executor)
+        if results is None:
+            results = _run_windows(windows, cash_at_risk, sentiment_threshold, prices, sentiment)
+    return {"windows": results, "aggregate": aggregate_windows(results)}